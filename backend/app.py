@@ -1,9 +1,19 @@
 from flask import Flask
-from flask_bcrypt import Bcrypt
 from flask_jwt_extended import JWTManager
 from config import Config
 from models import db
 from cors_config import configure_cors
+from pagination import InvalidCursor
+from commands import register_commands
+from cache import init_cache, get_cache
+from order_numbers import init_order_numbers
+from events import init_events
+from passwords import init_passwords, PasswordHasherBusy
+from identity import init_identity, verify_token
+from routing import init_routing
+from json_provider import init_json
+from metrics import init_metrics, get_metrics, render_metrics, internal_only
+from compression import init_compression
 import os
 
 # Import routes
@@ -12,16 +22,31 @@ from routes.restaurants import restaurants_bp
 from routes.menu import menu_bp
 from routes.orders import orders_bp
 from routes.analytics import analytics_bp
+from routes.events import events_bp
 
 def create_app():
     app = Flask(__name__)
     app.config.from_object(Config)
+    init_json(app)
     
     # Initialize extensions
     db.init_app(app)
-    bcrypt = Bcrypt(app)
     jwt = JWTManager(app)
+    jwt.token_verification_loader(verify_token)
+    
+    @jwt.token_verification_failed_loader
+    def handle_stale_token(jwt_header, jwt_data):
+        return {'error': 'Token is no longer valid, please log in again'}, 401
     configure_cors(app)
+    register_commands(app)
+    init_cache(app)
+    init_order_numbers(app)
+    init_events(app)
+    init_passwords(app)
+    init_identity(app)
+    init_routing(app)
+    init_metrics(app)
+    init_compression(app)
     
     # Register blueprints
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
@@ -29,18 +54,38 @@ def create_app():
     app.register_blueprint(menu_bp, url_prefix='/api')
     app.register_blueprint(orders_bp, url_prefix='/api/orders')
     app.register_blueprint(analytics_bp, url_prefix='/api/analytics')
+    app.register_blueprint(events_bp, url_prefix='/api/events')
+    
+    @app.errorhandler(InvalidCursor)
+    def handle_invalid_cursor(error):
+        return {'error': str(error)}, 400
+    
+    @app.errorhandler(PasswordHasherBusy)
+    def handle_password_hasher_busy(error):
+        return {'error': 'Server busy, please retry'}, 503, {'Retry-After': '1'}
     
     # Health check endpoint
     @app.route('/api/health', methods=['GET'])
     def health_check():
         return {'status': 'healthy', 'message': 'SavorySync API is running'}, 200
     
+    # Prometheus scrape endpoint (see metrics.py)
+    @app.route('/api/metrics', methods=['GET'])
+    @internal_only
+    def metrics():
+        if get_metrics() is None:
+            return {'error': 'Metrics are disabled'}, 404
+        return render_metrics(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+    
+    @app.route('/api/cache/stats', methods=['GET'])
+    @internal_only
+    def cache_stats():
+        return get_cache().stats(), 200
+    
     return app
 
 if __name__ == '__main__':
+    # Development server only; see gunicorn.conf.py for production.
+    # Create the tables first with `flask --app app init-db`.
     app = create_app()
-    
-    with app.app_context():
-        db.create_all()
-    
-    app.run(debug=True, host='0.0.0.0', port=5000) 
\ No newline at end of file
+    app.run(debug=os.getenv('FLASK_DEBUG') == '1', host='0.0.0.0', port=5000) 
\ No newline at end of file
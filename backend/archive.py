@@ -0,0 +1,173 @@
+"""
+Hot/cold storage for orders
+
+Almost every read is about the last few weeks, so finished orders are
+moved out of ``order`` / ``order_item`` into ``order_archive`` /
+``order_item_archive`` once they are older than ``ARCHIVE_AFTER_DAYS``.
+That keeps the hot tables, and the indexes every listing and analytics
+query walks, at the size of the recent working set.
+
+Archiving (``flask --app app archive-orders``) walks ``order`` by
+primary key from the oldest row and moves delivered and cancelled orders
+with their lines, keeping their ids. The orders holding the highest
+``order`` and ``order_item`` ids always stay: SQLite without AUTOINCREMENT
+(and MySQL before 8.0, after a restart) hands out ``max(id) + 1``, which
+would otherwise reuse the id of an archived row. Each batch of ``ARCHIVE_BATCH_SIZE``
+orders is its own transaction, followed by a pause of
+``ARCHIVE_PAUSE_SECONDS``, so it can run next to live traffic. It stops at
+the first order younger than the cutoff: ids grow with creation time.
+
+Reads use the archive's horizon, the newest ``created_at`` it holds (one
+index probe). Order listings merge archived rows in only once the hot
+rows run out or reach back past it, and analytics ranges that start
+after it never touch the archive.
+
+Archived orders are final: status updates and ratings only see
+``order``. Sales rollups keep counting them, and
+``backfill-sales-rollups`` reads both tables.
+
+Separate tables rather than MySQL range partitions: partitioned InnoDB
+tables support no foreign keys, and the partitioning column would have
+to be part of the primary key and of the ``order_number`` unique key.
+"""
+
+import heapq
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import delete, func, insert, select
+from models import db, Order, OrderItem, ArchivedOrder, ArchivedOrderItem
+from pagination import page_limit, page_candidates, finish_page, iterate_rows
+
+ARCHIVABLE_STATUSES = ('delivered', 'cancelled')
+
+# Newest first; ids are never reused (see above), so the key is unique across both
+ORDER_SORT = (Order.created_at, Order.id)
+ARCHIVE_SORT = (ArchivedOrder.created_at, ArchivedOrder.id)
+
+
+def _copy_select(source, target):
+    """Column names of ``target`` and a select of the same columns from ``source``"""
+    names = [column.name for column in target.__table__.columns]
+    return names, select(*[source.__table__.c[name] for name in names])
+
+
+def _move_orders(order_ids):
+    order_columns, order_rows = _copy_select(Order, ArchivedOrder)
+    line_columns, line_rows = _copy_select(OrderItem, ArchivedOrderItem)
+    db.session.execute(insert(ArchivedOrder.__table__).from_select(
+        order_columns, order_rows.where(Order.id.in_(order_ids))
+    ))
+    db.session.execute(insert(ArchivedOrderItem.__table__).from_select(
+        line_columns, line_rows.where(OrderItem.order_id.in_(order_ids))
+    ))
+    db.session.execute(delete(OrderItem.__table__).where(OrderItem.order_id.in_(order_ids)))
+    db.session.execute(delete(Order.__table__).where(Order.id.in_(order_ids)))
+
+
+def _highest_id_orders():
+    """Ids of the orders holding the highest order id and the highest line id"""
+    newest_line = db.session.query(func.max(OrderItem.id)).scalar_subquery()
+    return {
+        db.session.query(func.max(Order.id)).scalar(),
+        db.session.query(OrderItem.order_id).filter(OrderItem.id == newest_line).scalar()
+    } - {None}
+
+
+def archive_orders(older_than_days=None, batch_size=None, pause=None, report=print):
+    """Move finished orders older than ``older_than_days`` to the archive; returns how many"""
+    config = current_app.config
+    if older_than_days is None:
+        older_than_days = config.get('ARCHIVE_AFTER_DAYS', 90)
+    if batch_size is None:
+        batch_size = config.get('ARCHIVE_BATCH_SIZE', 1000)
+    if pause is None:
+        pause = config.get('ARCHIVE_PAUSE_SECONDS', 0.5)
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    keep = _highest_id_orders()
+
+    moved = 0
+    last_id = 0
+    while True:
+        rows = db.session.query(Order.id, Order.status, Order.created_at).filter(
+            Order.id > last_id
+        ).order_by(Order.id).limit(batch_size).all()
+        reached_cutoff = not rows
+        candidates = []
+        for order_id, status, created_at in rows:
+            if created_at is not None and created_at >= cutoff:
+                reached_cutoff = True
+                break
+            if status in ARCHIVABLE_STATUSES and order_id not in keep:
+                candidates.append(order_id)
+
+        if candidates:
+            # Re-check under a row lock: a status may have changed since the scan
+            order_ids = [order_id for (order_id,) in db.session.query(Order.id).filter(
+                Order.id.in_(candidates),
+                Order.status.in_(ARCHIVABLE_STATUSES),
+                Order.created_at < cutoff
+            ).with_for_update()]
+            if order_ids:
+                _move_orders(order_ids)
+            moved += len(order_ids)
+        db.session.commit()
+
+        if reached_cutoff:
+            break
+        last_id = rows[-1].id
+        if candidates:
+            report(f'{moved} orders archived')
+            if pause:
+                time.sleep(pause)
+
+    return moved
+
+
+def archive_horizon():
+    """Newest ``created_at`` in the archive, or None while it is empty"""
+    return db.session.query(func.max(ArchivedOrder.created_at)).scalar()
+
+
+def _reaches_archive(rows, wanted):
+    """Whether archived orders could belong among ``wanted`` newest-first rows"""
+    horizon = archive_horizon()
+    return horizon is not None and (len(rows) < wanted or rows[-1].created_at <= horizon)
+
+
+def _sort_key(order):
+    return order.created_at, order.id
+
+
+def paginate_orders(orders_query, archived_query):
+    """``paginate`` newest first across ``order`` and ``order_archive``"""
+    limit = page_limit()
+    rows = page_candidates(orders_query, ORDER_SORT, limit, descending=True)
+    if _reaches_archive(rows, limit + 1):
+        archived = page_candidates(archived_query, ARCHIVE_SORT, limit, descending=True)
+        rows = sorted(rows + archived, key=_sort_key, reverse=True)[:limit + 1]
+    return finish_page(rows, ORDER_SORT, limit)
+
+
+def latest_orders(orders_query, archived_query, limit):
+    """The ``limit`` newest orders across both tables"""
+    rows = orders_query.order_by(Order.created_at.desc(), Order.id.desc()).limit(limit).all()
+    if _reaches_archive(rows, limit):
+        archived = archived_query.order_by(ArchivedOrder.created_at.desc(), ArchivedOrder.id.desc()).limit(limit).all()
+        rows = sorted(rows + archived, key=_sort_key, reverse=True)[:limit]
+    return rows
+
+
+def iterate_orders(orders_query, archived_query):
+    """Every order newest first, as ``iterate_rows``, merging in the archive if it has any"""
+    rows = iterate_rows(orders_query, ORDER_SORT, descending=True)
+    if archive_horizon() is None:
+        return rows
+    archived = iterate_rows(archived_query, ARCHIVE_SORT, descending=True)
+    return heapq.merge(rows, archived, key=_sort_key, reverse=True)
+
+
+def archive_covers(since):
+    """Whether orders created at or after ``since`` may be in the archive"""
+    horizon = archive_horizon()
+    return horizon is not None and horizon >= since
@@ -0,0 +1,62 @@
+"""
+Shared setup for benchmarks: a throwaway SQLite app and timing helpers
+"""
+
+import os
+import statistics
+import tempfile
+import time
+
+
+def create_bench_app(database_url=None, **config):
+    """Create the Flask app against a fresh database and create its tables"""
+    if database_url is None:
+        handle, path = tempfile.mkstemp(prefix='savory_bench_', suffix='.db')
+        os.close(handle)
+        database_url = f'sqlite:///{path}'
+    os.environ['DATABASE_URL'] = database_url
+
+    from app import create_app
+    from models import db
+
+    app = create_app()
+    app.config.update(TESTING=True, **config)
+    with app.app_context():
+        db.create_all(bind_key=None)
+    return app
+
+
+def auth_header(app, user_id):
+    """Bearer header for a user without going through the login route"""
+    from flask_jwt_extended import create_access_token
+
+    with app.app_context():
+        token = create_access_token(identity=user_id)
+    return {'Authorization': f'Bearer {token}'}
+
+
+def time_calls(func, repeat):
+    """Call ``func`` ``repeat`` times and return latencies in milliseconds"""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+def summarize(samples):
+    """p50/p95/p99/max of a list of millisecond samples"""
+    ordered = sorted(samples)
+
+    def percentile(p):
+        return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+    return {
+        'count': len(ordered),
+        'mean_ms': round(statistics.fmean(ordered), 2),
+        'p50_ms': round(percentile(50), 2),
+        'p95_ms': round(percentile(95), 2),
+        'p99_ms': round(percentile(99), 2),
+        'max_ms': round(ordered[-1], 2)
+    }
@@ -0,0 +1,381 @@
+"""
+Benchmark every API endpoint under realistic load mixes
+
+    python -m benchmarks.endpoints --profiles browse search checkout seller --output after.json
+    python -m benchmarks.endpoints --baseline before.json --threshold 0.2
+
+Boots ``create_app()`` against a database filled by ``seeding.seed_dataset``
+(a throwaway SQLite file by default, or a scratch ``--database-url``), then
+drives each load profile from ``--concurrency`` threads:
+
+- ``browse``: restaurant list, restaurant pages and menus
+- ``search``: text, cuisine and dietary search
+- ``checkout``: sign up, log in, place orders, order history, ratings
+- ``seller``: dashboard polling (orders, analytics), status and menu updates
+- ``mixed``: all of the above at once
+
+For every endpoint it reports p50/p95/p99 latency, the number of SQL
+statements per request and errors, plus each profile's throughput. Results
+are printed and can be saved as JSON; with ``--baseline`` the run is
+compared against an earlier result and exits with status 1 when an
+endpoint's p95 or a profile's throughput is worse by more than
+``--threshold``, or an endpoint runs more queries per request than before.
+
+Server-sent event streams (``/api/events``) are long-lived and not
+measured here.
+"""
+
+import argparse
+import itertools
+import json
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from sqlalchemy import event, func
+
+from benchmarks.common import create_bench_app, summarize
+
+PROFILES = ('browse', 'search', 'checkout', 'seller', 'mixed')
+SEARCH_TERMS = ('pizza', 'spicy', 'noodles', 'curry bowl', 'garlic', 'tacos', 'ramen', 'grilled chicken', 'su')
+CUISINE_FILTERS = ('italian', 'thai', 'mexican', 'indian')
+DIETARY_FILTERS = ('vegan', 'gluten-free', 'halal', 'keto')
+STATUSES = ('preparing', 'ready', 'delivered')
+
+
+def load_fixtures(app, sample):
+    """Ids and tokens the scenarios draw from, taken from the seeded data"""
+    from models import db, User, Restaurant, MenuItem, Order, DailySales
+    from identity import create_user_token
+    from seeding import SEED_PASSWORD
+
+    with app.app_context():
+        restaurant_ids = [restaurant_id for (restaurant_id,) in
+                          db.session.query(Restaurant.id).filter(Restaurant.active == True)]
+        menus = defaultdict(list)
+        for item_id, restaurant_id in db.session.query(MenuItem.id, MenuItem.restaurant_id).filter(
+            MenuItem.active == True, MenuItem.restaurant_id.in_(restaurant_ids[:sample])
+        ):
+            menus[restaurant_id].append(item_id)
+
+        customers = []
+        for user in User.query.filter_by(role='customer').order_by(User.id).limit(sample):
+            delivered = [order_id for (order_id,) in db.session.query(Order.id).filter_by(
+                customer_id=user.id, status='delivered').limit(20)]
+            customers.append({'email': user.email, 'delivered': delivered,
+                              'headers': {'Authorization': f'Bearer {create_user_token(user)}'}})
+
+        # The busiest restaurants' owners poll their dashboards the most
+        busiest = db.session.query(DailySales.restaurant_id).group_by(DailySales.restaurant_id).order_by(
+            func.sum(DailySales.order_count).desc()).limit(max(1, sample // 10)).all()
+        sellers = []
+        for (restaurant_id,) in busiest:
+            restaurant = db.session.get(Restaurant, restaurant_id)
+            sellers.append({
+                'restaurant_id': restaurant_id,
+                'menu': [item_id for (item_id,) in db.session.query(MenuItem.id).filter_by(
+                    restaurant_id=restaurant_id, active=True)],
+                'orders': [order_id for (order_id,) in db.session.query(Order.id).filter_by(
+                    restaurant_id=restaurant_id).order_by(Order.id.desc()).limit(50)],
+                'headers': {'Authorization': f'Bearer {create_user_token(restaurant.owner)}'}
+            })
+
+    return {'restaurant_ids': restaurant_ids, 'menus': {key: value for key, value in menus.items() if value},
+            'customers': customers, 'sellers': sellers, 'password': SEED_PASSWORD,
+            'signups': itertools.count()}
+
+
+def browse_calls(rng, fixtures):
+    restaurant_id = rng.choice(fixtures['restaurant_ids'][:200])
+    return rng.choices([
+        ('GET /api/restaurants/', 'GET', '/api/restaurants/?limit=20', None, None),
+        ('GET /api/restaurants/<id>', 'GET', f'/api/restaurants/{restaurant_id}', None, None),
+        ('GET /api/restaurants/<id>/menu', 'GET', f'/api/restaurants/{restaurant_id}/menu', None, None),
+    ], weights=(3, 4, 3))[0]
+
+
+def search_calls(rng, fixtures):
+    return rng.choices([
+        ('GET /api/restaurants/search', 'GET', f'/api/restaurants/search?q={rng.choice(SEARCH_TERMS)}', None, None),
+        ('GET /api/restaurants/search', 'GET', f'/api/restaurants/search?category={rng.choice(CUISINE_FILTERS)}',
+         None, None),
+        ('GET /api/restaurants/search', 'GET', f'/api/restaurants/search?dietary={rng.choice(DIETARY_FILTERS)}',
+         None, None),
+    ], weights=(5, 2, 2))[0]
+
+
+def checkout_calls(rng, fixtures):
+    customer = rng.choice(fixtures['customers'])
+    restaurant_id = rng.choice(list(fixtures['menus']))
+    menu = fixtures['menus'][restaurant_id]
+    order = {'restaurant_id': restaurant_id, 'delivery_address': '1 Bench Street', 'items': [
+        {'menu_item_id': item_id, 'quantity': rng.randint(1, 3)} for item_id in rng.sample(menu, min(len(menu), 3))
+    ]}
+    calls = [
+        ('POST /api/orders/', 'POST', '/api/orders/', order, customer['headers']),
+        ('GET /api/orders/', 'GET', '/api/orders/?limit=20', None, customer['headers']),
+        ('GET /api/orders/previous', 'GET', '/api/orders/previous', None, customer['headers']),
+        ('POST /api/auth/login', 'POST', '/api/auth/login',
+         {'email': customer['email'], 'password': fixtures['password']}, None),
+        ('POST /api/auth/register', 'POST', '/api/auth/register', {
+            'email': f'bench-signup-{next(fixtures["signups"])}@example.com', 'password': fixtures['password'],
+            'name': 'Bench Signup', 'role': 'customer'
+        }, None),
+    ]
+    weights = [5, 3, 2, 2, 1]
+    if customer['delivered']:
+        calls.append(('PUT /api/orders/<id>/rating', 'PUT', f'/api/orders/{rng.choice(customer["delivered"])}/rating',
+                      {'rating': rng.randint(1, 5)}, customer['headers']))
+        weights.append(1)
+    return rng.choices(calls, weights=weights)[0]
+
+
+def seller_calls(rng, fixtures):
+    seller = rng.choice(fixtures['sellers'])
+    headers = seller['headers']
+    restaurant_id = seller['restaurant_id']
+    calls = [
+        ('GET /api/orders/', 'GET', '/api/orders/?limit=50', None, headers),
+        ('GET /api/analytics/sales', 'GET', '/api/analytics/sales', None, headers),
+        ('GET /api/analytics/timeseries', 'GET', '/api/analytics/timeseries?bucket=day', None, headers),
+        ('POST /api/restaurants/<id>/menu', 'POST', f'/api/restaurants/{restaurant_id}/menu',
+         {'name': 'Bench Special', 'price': round(rng.uniform(5, 30), 2), 'category': 'Specials',
+          'dietary_tags': ['vegan']}, headers),
+    ]
+    weights = [6, 4, 3, 1]
+    if seller['orders']:
+        calls.append(('PUT /api/orders/<id>/status', 'PUT', f'/api/orders/{rng.choice(seller["orders"])}/status',
+                      {'status': rng.choice(STATUSES)}, headers))
+        weights.append(2)
+    if seller['menu']:
+        item_id = rng.choice(seller['menu'])
+        calls.append(('PUT /api/menu-items/<id>', 'PUT', f'/api/menu-items/{item_id}',
+                      {'price': round(rng.uniform(5, 30), 2)}, headers))
+        weights.append(1)
+    return rng.choices(calls, weights=weights)[0]
+
+
+SCENARIOS = {'browse': browse_calls, 'search': search_calls, 'checkout': checkout_calls, 'seller': seller_calls}
+
+
+def mixed_calls(rng, fixtures):
+    # Roughly production: mostly browsing, a steady trickle of checkouts
+    profile = rng.choices(('browse', 'search', 'checkout', 'seller'), weights=(55, 20, 15, 10))[0]
+    return SCENARIOS[profile](rng, fixtures)
+
+
+SCENARIOS['mixed'] = mixed_calls
+
+
+class QueryCounter:
+    """Counts SQL statements per thread across all engines"""
+
+    def __init__(self, engines):
+        self.engines = engines
+        self.local = threading.local()
+
+    def _count(self, *args):
+        self.local.count = getattr(self.local, 'count', 0) + 1
+
+    def reset(self):
+        self.local.count = 0
+
+    def value(self):
+        return getattr(self.local, 'count', 0)
+
+    def __enter__(self):
+        for engine in self.engines:
+            event.listen(engine, 'before_cursor_execute', self._count)
+        return self
+
+    def __exit__(self, *exc):
+        for engine in self.engines:
+            event.remove(engine, 'before_cursor_execute', self._count)
+
+
+def run_profile(app, fixtures, counter, profile, requests, concurrency, seed):
+    """Issue ``requests`` calls of a profile; returns its result dict"""
+    scenario = SCENARIOS[profile]
+    samples = defaultdict(list)
+    queries = defaultdict(list)
+    errors = defaultdict(int)
+    lock = threading.Lock()
+
+    def worker(index):
+        rng = random.Random(seed * 1000 + index)
+        client = app.test_client()
+        for _ in range(requests // concurrency + (index < requests % concurrency)):
+            label, method, path, body, headers = scenario(rng, fixtures)
+            counter.reset()
+            started = time.perf_counter()
+            response = client.open(path, method=method, json=body, headers=headers)
+            elapsed = (time.perf_counter() - started) * 1000
+            with lock:
+                samples[label].append(elapsed)
+                queries[label].append(counter.value())
+                if response.status_code >= 400:
+                    errors[label] += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        list(executor.map(worker, range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    return {
+        'requests': requests,
+        'throughput_rps': round(requests / elapsed, 1),
+        'errors': sum(errors.values()),
+        'endpoints': {label: dict(
+            summarize(samples[label]),
+            queries_per_request=round(sum(queries[label]) / len(queries[label]), 2),
+            max_queries=max(queries[label]),
+            errors=errors[label]
+        ) for label in sorted(samples)}
+    }
+
+
+def median_result(runs):
+    """Combine repeated runs of a profile, taking the median of every metric"""
+    if len(runs) == 1:
+        return runs[0]
+    combined = {key: statistics.median(run[key] for run in runs) for key in ('requests', 'throughput_rps', 'errors')}
+    combined['runs'] = len(runs)
+    combined['endpoints'] = {}
+    for label in sorted({label for run in runs for label in run['endpoints']}):
+        endpoints = [run['endpoints'][label] for run in runs if label in run['endpoints']]
+        combined['endpoints'][label] = {key: statistics.median(endpoint[key] for endpoint in endpoints)
+                                        for key in endpoints[0]}
+    return combined
+
+
+def compare(results, baseline, threshold, min_samples, min_delta_ms):
+    """Regressions of ``results`` against ``baseline``, as printable lines.
+
+    Latency is only compared for endpoints with ``min_samples`` requests in
+    both runs, and a p95 must also grow by ``min_delta_ms``: a p95 over a
+    dozen samples, or a few milliseconds of thread scheduling, is noise.
+    """
+    regressions = []
+    for profile, result in results['profiles'].items():
+        before = baseline.get('profiles', {}).get(profile)
+        if before is None:
+            continue
+        if result['throughput_rps'] < before['throughput_rps'] * (1 - threshold):
+            regressions.append(f"{profile}: throughput {before['throughput_rps']} -> {result['throughput_rps']} req/s")
+        for label, endpoint in result['endpoints'].items():
+            previous = before['endpoints'].get(label)
+            if previous is None:
+                continue
+            sampled = min(endpoint['count'], previous['count']) >= min_samples
+            slower = endpoint['p95_ms'] > max(previous['p95_ms'] * (1 + threshold), previous['p95_ms'] + min_delta_ms)
+            if sampled and slower:
+                regressions.append(f"{profile} {label}: p95 {previous['p95_ms']} -> {endpoint['p95_ms']} ms")
+            # Query counts are near-deterministic: any real increase is an N+1 creeping in
+            if endpoint['queries_per_request'] > previous['queries_per_request'] + 0.5:
+                regressions.append(f"{profile} {label}: queries/request "
+                                   f"{previous['queries_per_request']} -> {endpoint['queries_per_request']}")
+    return regressions
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_profile(profile, result):
+    print(f"{profile}: {result['throughput_rps']} req/s, {result['errors']} errors")
+    for label, endpoint in result['endpoints'].items():
+        print(f"  {label:34} n={endpoint['count']:<5} p50={endpoint['p50_ms']:>7}ms p95={endpoint['p95_ms']:>7}ms "
+              f"p99={endpoint['p99_ms']:>7}ms queries={endpoint['queries_per_request']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--profiles', nargs='+', choices=PROFILES, default=list(PROFILES))
+    parser.add_argument('--requests', type=int, default=2000, help='Requests per profile')
+    parser.add_argument('--repeat', type=int, default=1, help='Runs per profile; metrics are their medians')
+    parser.add_argument('--warmup', type=int, default=200, help='Unmeasured requests per profile first')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--database-url', help='Scratch database to seed (default: temporary SQLite)')
+    parser.add_argument('--restaurants', type=int, default=300)
+    parser.add_argument('--customers', type=int, default=5000)
+    parser.add_argument('--orders', type=int, default=100000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='Write results to this JSON file')
+    parser.add_argument('--baseline', help='Earlier JSON results to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2, help='Allowed relative slowdown')
+    parser.add_argument('--min-samples', type=int, default=100, help='Requests needed to compare an endpoint p95')
+    parser.add_argument('--min-delta-ms', type=float, default=10, help='Smallest p95 increase counted as a regression')
+    args = parser.parse_args(argv)
+
+    from models import db
+    from passwords import init_passwords
+    from seeding import seed_dataset
+
+    # Cheap, inline hashing: measure the endpoints, not bcrypt (see benchmarks.login)
+    app = create_bench_app(args.database_url, BCRYPT_LOG_ROUNDS=4, PASSWORD_HASH_WORKERS=0)
+    init_passwords(app)
+    with app.app_context():
+        if db.engine.dialect.name == 'sqlite':
+            # Readers would otherwise stall behind every commit; MySQL has no such lock
+            with db.engine.connect() as connection:
+                connection.exec_driver_sql('PRAGMA journal_mode=WAL')
+        seed_dataset(args.restaurants, 40, args.customers, args.orders, days=90, seed=args.seed,
+                     report=lambda message: None)
+        engines = list(db.engines.values())
+        dialect = db.engine.dialect.name
+    fixtures = load_fixtures(app, sample=200)
+
+    results = {
+        'meta': {
+            'started_at': datetime.utcnow().isoformat(timespec='seconds'),
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'database': dialect,
+            'dataset': {'restaurants': args.restaurants, 'customers': args.customers,
+                        'orders': args.orders, 'seed': args.seed},
+            'concurrency': args.concurrency,
+            'requests': args.requests,
+            'repeat': args.repeat
+        },
+        'profiles': {}
+    }
+    with QueryCounter(engines) as counter:
+        for profile in args.profiles:
+            if args.warmup:
+                run_profile(app, fixtures, counter, profile, args.warmup, args.concurrency, args.seed + 1)
+            result = median_result([
+                run_profile(app, fixtures, counter, profile, args.requests, args.concurrency, args.seed + run)
+                for run in range(args.repeat)
+            ])
+            results['profiles'][profile] = result
+            print_profile(profile, result)
+
+    if args.output:
+        with open(args.output, 'w') as handle:
+            json.dump(results, handle, indent=2)
+        print(f'Results written to {args.output}')
+
+    if args.baseline:
+        with open(args.baseline) as handle:
+            regressions = compare(results, json.load(handle), args.threshold, args.min_samples, args.min_delta_ms)
+        for regression in regressions:
+            print(f'REGRESSION {regression}')
+        if regressions:
+            return 1
+        print(f'No regressions beyond {args.threshold:.0%} against {args.baseline}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,113 @@
+"""
+Benchmark login throughput against the number of password hashing workers
+
+    python -m benchmarks.login --workers 0 1 2 4 --concurrency 16 --logins 200
+
+Worker count 0 hashes inline on the request thread (the previous
+behaviour). While the logins run, a separate thread polls /api/health to
+show whether other requests stay responsive during the spike.
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import create_bench_app, summarize
+
+PASSWORD = 'correct horse battery staple'
+
+
+def seed_users(app, count, rounds):
+    from models import db, User
+    from passwords import hash_password_sync
+
+    # Users share one hash; bcrypt cost is the same whichever hash is checked
+    password_hash = hash_password_sync(PASSWORD, rounds)
+    with app.app_context():
+        db.session.execute(User.__table__.insert(), [{
+            'email': f'bench-{index}@example.com',
+            'password_hash': password_hash,
+            'name': f'Bench User {index}',
+            'role': 'customer'
+        } for index in range(count)])
+        db.session.commit()
+
+
+def run(app, logins, concurrency, users):
+    """Run ``logins`` logins from ``concurrency`` threads while polling /api/health"""
+    client = app.test_client()
+    statuses = []
+    samples = []
+    health_samples = []
+    done = threading.Event()
+
+    def login(index):
+        started = time.perf_counter()
+        response = client.post('/api/auth/login', json={
+            'email': f'bench-{index % users}@example.com', 'password': PASSWORD
+        })
+        samples.append((time.perf_counter() - started) * 1000)
+        statuses.append(response.status_code)
+
+    def poll_health():
+        while not done.is_set():
+            started = time.perf_counter()
+            client.get('/api/health')
+            health_samples.append((time.perf_counter() - started) * 1000)
+            time.sleep(0.05)
+
+    poller = threading.Thread(target=poll_health)
+    poller.start()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        list(executor.map(login, range(logins)))
+    elapsed = time.perf_counter() - started
+    done.set()
+    poller.join()
+
+    return {
+        'logins_per_s': round(statuses.count(200) / elapsed, 1),
+        'rejected': statuses.count(503),
+        'failed': len(statuses) - statuses.count(200) - statuses.count(503),
+        'login': summarize(samples),
+        'health': summarize(health_samples)
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    cores = os.cpu_count() or 1
+    parser.add_argument('--workers', type=int, nargs='+',
+                        default=sorted({0, 1, max(1, cores // 2), cores}), help='Pool sizes to compare')
+    parser.add_argument('--concurrency', type=int, default=16, help='Concurrent login requests')
+    parser.add_argument('--logins', type=int, default=200)
+    parser.add_argument('--rounds', type=int, default=12, help='bcrypt cost')
+    parser.add_argument('--max-pending', type=int, default=0, help='0 = four per worker')
+    args = parser.parse_args(argv)
+
+    from passwords import init_passwords
+
+    app = create_bench_app(BCRYPT_LOG_ROUNDS=args.rounds)
+    seed_users(app, args.concurrency, args.rounds)
+
+    print(f'cores={cores} rounds={args.rounds} concurrency={args.concurrency}')
+    for workers in args.workers:
+        app.config.update(PASSWORD_HASH_WORKERS=workers, PASSWORD_HASH_MAX_PENDING=args.max_pending)
+        init_passwords(app)
+        hasher = app.extensions['password_hasher']
+        try:
+            # Start the pool outside the measurement
+            if workers:
+                hasher.hash(PASSWORD)
+            result = run(app, args.logins, args.concurrency, args.concurrency)
+        finally:
+            hasher.shutdown()
+        print(f'workers={workers}: {result}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,94 @@
+"""
+Stress order number generation: concurrent order creation from many processes
+
+    python -m benchmarks.order_numbers --processes 8 --orders 500
+
+Every process runs its own app against one shared SQLite database and
+posts orders as fast as it can. Fails if any order is rejected, any number
+repeats, or one process's numbers do not sort in creation order.
+``tests/test_order_numbers.py`` runs a smaller round of the same check.
+"""
+
+import argparse
+import multiprocessing
+import sys
+import time
+
+from benchmarks.common import create_bench_app, auth_header
+
+
+def create_orders(database_url, worker_id, customer_id, restaurant_id, menu_item_id, count, start_at):
+    """Child process: post ``count`` orders, return the status codes"""
+    app = create_bench_app(database_url, ORDER_WORKER_ID=worker_id)
+    # create_app read the worker id before the override above
+    from order_numbers import init_order_numbers
+    init_order_numbers(app)
+
+    headers = auth_header(app, customer_id)
+    client = app.test_client()
+    payload = {'restaurant_id': restaurant_id, 'items': [{'menu_item_id': menu_item_id, 'quantity': 1}]}
+
+    # Start together so the processes really overlap
+    time.sleep(max(0.0, start_at - time.time()))
+    return [client.post('/api/orders/', json=payload, headers=headers).status_code for _ in range(count)]
+
+
+def run_stress(app, processes, orders, start_delay=5):
+    """Post ``orders`` orders from each of ``processes`` processes; returns the counts to check"""
+    from benchmarks.orders import seed_catalog
+    from models import db, Order
+    from order_numbers import parse_order_number
+
+    database_url = app.config['SQLALCHEMY_DATABASE_URI']
+    customer_id, restaurant_id, menu = seed_catalog(app, seed=1)
+
+    start_at = time.time() + start_delay
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(processes) as pool:
+        results = pool.starmap(create_orders, [
+            (database_url, worker_id, customer_id, restaurant_id, menu[0][0], orders, start_at)
+            for worker_id in range(processes)
+        ])
+    elapsed = time.time() - start_at
+
+    statuses = [status for codes in results for status in codes]
+    with app.app_context():
+        rows = db.session.query(Order.id, Order.order_number).order_by(Order.id).all()
+    numbers = [number for _, number in rows]
+
+    # Within one worker, insertion (id) order must match number order
+    by_worker = {}
+    for _, number in rows:
+        by_worker.setdefault(parse_order_number(number)[1], []).append(number)
+
+    return {
+        'orders': len(statuses),
+        'stored': len(numbers),
+        'elapsed': elapsed,
+        'rejected': len(statuses) - statuses.count(201),
+        'duplicates': len(numbers) - len(set(numbers)),
+        'workers': len(by_worker),
+        'unordered_workers': sum(1 for worker_numbers in by_worker.values() if worker_numbers != sorted(worker_numbers))
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--processes', type=int, default=8)
+    parser.add_argument('--orders', type=int, default=500, help='Orders per process')
+    args = parser.parse_args(argv)
+
+    result = run_stress(create_bench_app(), args.processes, args.orders)
+    print(f"processes={args.processes} orders={result['orders']} in {result['elapsed']:.1f}s "
+          f"({result['orders'] / result['elapsed']:.0f} orders/s): rejected={result['rejected']} "
+          f"duplicates={result['duplicates']} workers={result['workers']} "
+          f"unordered_workers={result['unordered_workers']}")
+
+    if result['rejected'] or result['duplicates'] or result['unordered_workers'] or result['stored'] != result['orders']:
+        print('FAIL')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,144 @@
+"""
+Benchmark POST /api/orders throughput against the previous per-line ORM path
+
+    python -m benchmarks.orders --orders 500 --lines 5 50
+"""
+
+import argparse
+import itertools
+import random
+import sys
+import time
+
+from benchmarks.common import create_bench_app, auth_header, summarize
+
+MENU_SIZE = 200
+
+
+def seed_catalog(app, seed):
+    """Insert a seller, a customer and one restaurant with a menu"""
+    from models import db, User, Restaurant, MenuItem
+
+    rng = random.Random(seed)
+    with app.app_context():
+        seller = User(email='bench-seller@example.com', password_hash='x', name='Bench Seller', role='seller')
+        customer = User(email='bench-customer@example.com', password_hash='x', name='Bench Customer', role='customer')
+        db.session.add_all([seller, customer])
+        db.session.flush()
+        restaurant = Restaurant(name='Bench Bistro', owner_id=seller.id, delivery_fee=2.99)
+        db.session.add(restaurant)
+        db.session.flush()
+        db.session.execute(MenuItem.__table__.insert(), [{
+            'restaurant_id': restaurant.id,
+            'name': f'Dish {index}',
+            'price': round(rng.uniform(4, 40), 2),
+            'active': True
+        } for index in range(MENU_SIZE)])
+        db.session.commit()
+        menu = [(item_id, price) for item_id, price in db.session.query(MenuItem.id, MenuItem.price)]
+        return customer.id, restaurant.id, menu
+
+
+def register_legacy_route(app, numbers):
+    """Mount the previous create_order implementation at /bench/legacy-orders"""
+    from flask import request, jsonify
+    from flask_jwt_extended import jwt_required, get_jwt_identity
+    from models import db, Order, OrderItem
+    from rollups import record_new_order
+
+    @jwt_required()
+    def legacy_create_order():
+        current_user_id = get_jwt_identity()
+        data = request.get_json()
+
+        subtotal = sum(item['price'] * item['quantity'] for item in data['items'])
+        delivery_fee = data.get('delivery_fee', 0.0)
+        tax = subtotal * 0.08
+        order = Order(
+            order_number=next(numbers),
+            customer_id=current_user_id,
+            restaurant_id=data['restaurant_id'],
+            total_amount=subtotal + delivery_fee + tax,
+            delivery_address=data.get('delivery_address'),
+            delivery_fee=delivery_fee,
+            tax=tax,
+            subtotal=subtotal,
+            notes=data.get('notes')
+        )
+        db.session.add(order)
+        db.session.flush()
+
+        for item_data in data['items']:
+            db.session.add(OrderItem(
+                order_id=order.id,
+                menu_item_id=item_data['menu_item_id'],
+                quantity=item_data['quantity'],
+                unit_price=item_data['price'],
+                total_price=item_data['price'] * item_data['quantity'],
+                customizations=item_data.get('customizations', [])
+            ))
+
+        record_new_order(order, [(item['menu_item_id'], item['quantity']) for item in data['items']])
+        db.session.commit()
+
+        return jsonify({'order': {'id': order.id, 'order_number': order.order_number,
+                                  'total_amount': order.total_amount, 'status': order.status}}), 201
+
+    app.add_url_rule('/bench/legacy-orders', 'legacy_create_order', legacy_create_order, methods=['POST'])
+
+
+def make_payloads(restaurant_id, menu, count, lines, seed):
+    rng = random.Random(seed)
+    return [{
+        'restaurant_id': restaurant_id,
+        'delivery_address': '1 Bench Street',
+        'delivery_fee': 2.99,
+        'items': [
+            {'menu_item_id': item_id, 'price': price, 'quantity': rng.randrange(1, 4)}
+            for item_id, price in rng.sample(menu, lines)
+        ]
+    } for _ in range(count)]
+
+
+def run(client, url, payloads, headers):
+    """POST every payload; return (orders per second, latency samples)"""
+    samples = []
+    started = time.perf_counter()
+    for payload in payloads:
+        call_started = time.perf_counter()
+        response = client.post(url, json=payload, headers=headers)
+        samples.append((time.perf_counter() - call_started) * 1000)
+        assert response.status_code == 201, response.get_json()
+    return len(payloads) / (time.perf_counter() - started), samples
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--orders', type=int, default=500)
+    parser.add_argument('--lines', type=int, nargs='+', default=[5, 50], help='Lines per order, one run each')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args(argv)
+
+    app = create_bench_app()
+    customer_id, restaurant_id, menu = seed_catalog(app, args.seed)
+    headers = auth_header(app, customer_id)
+
+    # The previous second-resolution order numbers collide in a tight
+    # loop, so the legacy route numbers its orders from a counter
+    numbers = (f'BENCH-{index}' for index in itertools.count())
+    register_legacy_route(app, numbers)
+
+    client = app.test_client()
+    for lines in args.lines:
+        payloads = make_payloads(restaurant_id, menu, args.orders, min(lines, MENU_SIZE), args.seed)
+        results = {}
+        for name, url in (('legacy', '/bench/legacy-orders'), ('bulk', '/api/orders/')):
+            rate, samples = run(client, url, payloads, headers)
+            results[name] = rate
+            print(f'{name} lines={lines}: {rate:.0f} orders/s {summarize(samples)}')
+        print(f"bulk lines={lines}: {results['bulk'] / results['legacy']:.1f}x legacy throughput")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
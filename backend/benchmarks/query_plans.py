@@ -0,0 +1,95 @@
+"""
+Check that every route's queries use an index
+
+    python -m benchmarks.query_plans [--database-url mysql+pymysql://...]
+
+Seeds a catalog and order history at production-like proportions, then
+runs the check in ``query_plans.py`` on every route it lists. Exits with
+status 1 if any statement reads a whole table. Runs on a throwaway
+SQLite database by default; a ``--database-url`` must point at a scratch
+database, as it is seeded.
+"""
+
+import argparse
+import sys
+from datetime import datetime, timedelta
+
+from benchmarks.common import create_bench_app
+
+RESTAURANTS = 40
+MENU_SIZE = 30
+ORDERS = 4000
+PASSWORD = 'query plans'
+
+
+def seed(app):
+    """Sellers with one restaurant each, a customer, menus and orders; returns ids"""
+    from models import db, User, Restaurant, MenuItem, Order, OrderItem
+    from passwords import hash_password_sync
+    from search import rebuild_search_index
+    from rollups import backfill_rollups
+
+    with app.app_context():
+        password_hash = hash_password_sync(PASSWORD, app.config['BCRYPT_LOG_ROUNDS'])
+        db.session.execute(User.__table__.insert(), [{
+            'email': f'plan-{index}@example.com', 'password_hash': password_hash,
+            'name': f'Plan User {index}', 'role': 'customer' if index == 0 else 'seller'
+        } for index in range(RESTAURANTS + 1)])
+        user_ids = [user_id for (user_id,) in db.session.query(User.id).order_by(User.id)]
+        customer_id, seller_ids = user_ids[0], user_ids[1:]
+
+        db.session.execute(Restaurant.__table__.insert(), [{
+            'name': f'Plan Kitchen {index}', 'cuisine': ('Italian', 'Thai', 'Mexican')[index % 3],
+            'owner_id': seller_id, 'delivery_fee': 2.5, 'active': index % 10 != 0
+        } for index, seller_id in enumerate(seller_ids)])
+        restaurant_ids = [restaurant_id for (restaurant_id,) in db.session.query(Restaurant.id).order_by(Restaurant.id)]
+
+        db.session.execute(MenuItem.__table__.insert(), [{
+            'restaurant_id': restaurant_id, 'name': f'Dish {index}', 'price': 5 + index % 20,
+            'category': 'Main', 'dietary_tags': ['vegan'] if index % 4 == 0 else [], 'active': index % 7 != 0
+        } for restaurant_id in restaurant_ids for index in range(MENU_SIZE)])
+        menu = db.session.query(MenuItem.id, MenuItem.restaurant_id, MenuItem.active).all()
+
+        started = datetime.utcnow() - timedelta(days=90)
+        db.session.execute(Order.__table__.insert(), [{
+            'order_number': f'PLAN-{index}', 'customer_id': customer_id if index % 5 == 0 else seller_ids[index % len(seller_ids)],
+            'restaurant_id': restaurant_ids[index % len(restaurant_ids)], 'status': 'delivered',
+            'total_amount': 20.0, 'subtotal': 17.5, 'created_at': started + timedelta(minutes=30 * index)
+        } for index in range(ORDERS)])
+        order_ids = [order_id for (order_id,) in db.session.query(Order.id)]
+        db.session.execute(OrderItem.__table__.insert(), [{
+            'order_id': order_id, 'menu_item_id': menu[(order_id * 3 + line) % len(menu)].id,
+            'quantity': 1, 'unit_price': 5.0, 'total_price': 5.0
+        } for order_id in order_ids for line in range(3)])
+        db.session.commit()
+
+        rebuild_search_index()
+        backfill_rollups()
+        if db.engine.dialect.name == 'sqlite':
+            db.session.execute(db.text('ANALYZE'))
+            db.session.commit()
+
+        restaurant_id = restaurant_ids[1]
+        menu_item_id = next(item.id for item in menu if item.restaurant_id == restaurant_id and item.active)
+        return customer_id, 'plan-0@example.com', PASSWORD, seller_ids[1], restaurant_id, menu_item_id
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--database-url', help='Scratch database to seed (default: temporary SQLite)')
+    args = parser.parse_args(argv)
+
+    app = create_bench_app(args.database_url, BCRYPT_LOG_ROUNDS=4, PASSWORD_HASH_WORKERS=0)
+    from query_plans import route_calls, check_query_plans
+
+    calls = route_calls(*seed(app))
+    checked, failures = check_query_plans(app, calls)
+    for label, scans, statement in failures:
+        print(f'FULL SCAN in {label}: {"; ".join(scans)}\n    {" ".join(statement.split())}')
+
+    print(f'{checked} statements from {len(calls)} routes checked, {len(failures)} with full scans')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
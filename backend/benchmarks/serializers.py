@@ -0,0 +1,115 @@
+"""
+Benchmark menu serialization: ORM objects vs column projection
+
+    python -m benchmarks.serializers --items 10000
+"""
+
+import argparse
+import random
+import sys
+
+from benchmarks.common import create_bench_app, time_calls, summarize
+
+CATEGORIES = ('Starters', 'Mains', 'Sides', 'Desserts', 'Drinks')
+
+
+def seed_menu(app, items, seed):
+    """Insert one restaurant with ``items`` menu items"""
+    from models import db, User, Restaurant, MenuItem
+
+    rng = random.Random(seed)
+    with app.app_context():
+        seller = User(email='bench-seller@example.com', password_hash='x', name='Bench Seller', role='seller')
+        db.session.add(seller)
+        db.session.flush()
+        restaurant = Restaurant(name='Bench Bistro', owner_id=seller.id)
+        db.session.add(restaurant)
+        db.session.commit()
+
+        rows = [{
+            'restaurant_id': restaurant.id,
+            'name': f'Dish {index}',
+            'description': 'A generous plate of something seasonal, cooked to order.',
+            'price': round(rng.uniform(4, 40), 2),
+            'category': rng.choice(CATEGORIES),
+            'image': '🍕',
+            'dietary_tags': rng.sample(['vegetarian', 'vegan', 'gluten-free', 'halal'], 2),
+            'allergens': rng.sample(['nuts', 'dairy', 'gluten', 'soy', 'egg'], 3),
+            'nutritional_info': {'calories': rng.randrange(200, 1200), 'protein': rng.randrange(5, 60),
+                                 'carbs': rng.randrange(10, 120), 'fat': rng.randrange(2, 60)},
+            'spice_level': rng.randrange(4),
+            'is_popular': rng.random() < 0.1,
+            'preparation_time': rng.randrange(5, 45),
+            'active': True
+        } for index in range(items)]
+        db.session.execute(MenuItem.__table__.insert(), rows)
+        db.session.commit()
+        return restaurant.id
+
+
+def orm_menu(restaurant_id):
+    """The previous path: hydrate MenuItem objects and build dicts by hand"""
+    from models import MenuItem
+
+    menu_items = MenuItem.query.filter_by(restaurant_id=restaurant_id, active=True).all()
+    return [{
+        'id': item.id,
+        'name': item.name,
+        'description': item.description,
+        'price': item.price,
+        'category': item.category,
+        'image': item.image,
+        'dietaryTags': item.dietary_tags or [],
+        'allergens': item.allergens or [],
+        'nutritionalInfo': item.nutritional_info or {},
+        'spiceLevel': item.spice_level,
+        'isPopular': item.is_popular,
+        'preparationTime': item.preparation_time
+    } for item in menu_items]
+
+
+def projected_menu(restaurant_id, shape):
+    from models import MenuItem
+    from serializers import menu_item_rows, serialize_menu_items
+
+    rows = menu_item_rows(shape).filter(MenuItem.restaurant_id == restaurant_id, MenuItem.active == True).all()
+    return serialize_menu_items(rows, shape)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--items', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args(argv)
+
+    from models import db
+
+    app = create_bench_app()
+    restaurant_id = seed_menu(app, args.items, args.seed)
+
+    cases = {
+        'orm': lambda: orm_menu(restaurant_id),
+        'projection detail': lambda: projected_menu(restaurant_id, 'detail'),
+        'projection card': lambda: projected_menu(restaurant_id, 'card')
+    }
+
+    results = {}
+    with app.app_context():
+        for name, build in cases.items():
+            def run():
+                build()
+                # Start every call from an empty identity map, as a request would
+                db.session.remove()
+
+            results[name] = summarize(time_calls(run, args.repeat))
+            print(f'{name} items={args.items}: {results[name]}')
+
+    baseline = results['orm']['p50_ms']
+    for name in list(cases)[1:]:
+        print(f"{name}: {baseline / results[name]['p50_ms']:.1f}x faster than orm at p50")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
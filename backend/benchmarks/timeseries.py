@@ -0,0 +1,89 @@
+"""
+Benchmark /api/analytics/timeseries over a year of orders for one busy restaurant
+
+    python -m benchmarks.timeseries --orders-per-day 500 --budget-ms 500
+"""
+
+import argparse
+import random
+import sys
+from datetime import datetime, timedelta
+
+from benchmarks.common import create_bench_app, auth_header, time_calls, summarize
+
+
+def seed_year(app, orders_per_day, seed):
+    """Insert one seller, one restaurant and a year of orders"""
+    from models import db, User, Restaurant, Order
+
+    rng = random.Random(seed)
+    with app.app_context():
+        seller = User(email='bench-seller@example.com', password_hash='x', name='Bench Seller', role='seller')
+        customer = User(email='bench-customer@example.com', password_hash='x', name='Bench Customer', role='customer')
+        db.session.add_all([seller, customer])
+        db.session.flush()
+        restaurant = Restaurant(name='Bench Bistro', owner_id=seller.id)
+        db.session.add(restaurant)
+        db.session.commit()
+
+        start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=365)
+        rows = []
+        sequence = 0
+        for day in range(365):
+            for _ in range(orders_per_day):
+                # Lunch and dinner peaks
+                hour = min(23, max(0, int(rng.gauss(rng.choice((12.5, 19.0)), 1.5))))
+                amount = round(rng.lognormvariate(3.0, 0.5), 2)
+                sequence += 1
+                rows.append({
+                    'order_number': f'B{sequence}',
+                    'customer_id': customer.id,
+                    'restaurant_id': restaurant.id,
+                    'status': 'delivered',
+                    'total_amount': amount,
+                    'subtotal': amount,
+                    'created_at': start + timedelta(days=day, hours=hour, seconds=rng.randrange(3600))
+                })
+            if len(rows) >= 50000:
+                db.session.execute(Order.__table__.insert(), rows)
+                rows = []
+        if rows:
+            db.session.execute(Order.__table__.insert(), rows)
+        db.session.commit()
+        return seller.id, start.date()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--orders-per-day', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--budget-ms', type=float, default=500.0, help='Fail if p95 latency exceeds this')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args(argv)
+
+    app = create_bench_app()
+    seller_id, start_day = seed_year(app, args.orders_per_day, args.seed)
+    headers = auth_header(app, seller_id)
+    client = app.test_client()
+
+    failed = False
+    for bucket in ('day', 'hour'):
+        query = {'start': start_day.isoformat(), 'bucket': bucket}
+        response = client.get('/api/analytics/timeseries', query_string=query, headers=headers)
+        assert response.status_code == 200, response.get_json()
+
+        stats = summarize(time_calls(
+            lambda: client.get('/api/analytics/timeseries', query_string=query, headers=headers),
+            args.repeat
+        ))
+        print(f"timeseries bucket={bucket} orders={args.orders_per_day * 365}: {stats}")
+        failed = failed or stats['p95_ms'] > args.budget_ms
+
+    if failed:
+        print(f'FAIL: p95 above {args.budget_ms} ms budget')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
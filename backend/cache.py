@@ -0,0 +1,251 @@
+"""
+Versioned read-through cache for restaurant and menu payloads
+
+Entries are keyed by restaurant, a per-restaurant version counter and the
+request variant. Writes bump the version after they commit, so readers
+build a fresh key and stale entries are never served; old entries simply
+age out of the LRU (or expire in the shared backend). The restaurant list
+lives in its own namespace, bumped together with any restaurant.
+
+Each entry carries a strong ETag (content hash) and the time it was built,
+so conditional GETs are answered with a 304 straight from the cache. It
+also carries the body precompressed with each configured encoding, so a
+hit is served without compressing anything.
+
+Backends, selected with ``CACHE_BACKEND``:
+
+- ``memory`` (default): in-process LRU bounded by ``CACHE_MAX_BYTES``.
+  Versions are per process, so use it with a single worker.
+- ``redis``: shared between workers and hosts via ``CACHE_REDIS_URL``.
+- ``none``: disable caching.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from datetime import datetime, timezone
+from flask import current_app, request
+from routing import use_primary
+from json_provider import JSONArray, encode_json_array
+from compression import compress_payload, encode_response
+
+# ``compressed`` maps an encoding to ``body`` compressed with it (see compression.py)
+CachedPayload = namedtuple('CachedPayload', ['etag', 'built_at', 'body', 'compressed'])
+
+LIST_NAMESPACE = 'restaurants'
+
+# Part of every key, so entries packed in an older layout are never read
+ENTRY_FORMAT = 'f2'
+
+
+class MemoryCache:
+    """Thread-safe LRU of encoded payloads with size-based eviction"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous)
+            self._entries[key] = value
+            self.size += len(value)
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def get_version(self, namespace):
+        return self._versions.get(namespace, 0)
+
+    def bump_version(self, namespace):
+        with self._lock:
+            self._versions[namespace] = self._versions.get(namespace, 0) + 1
+
+    def stats(self):
+        return {'entries': len(self._entries), 'bytes': self.size, 'max_bytes': self.max_bytes}
+
+
+class RedisCache:
+    """Cache shared between workers through Redis"""
+
+    def __init__(self, url, ttl):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("CACHE_BACKEND='redis' requires the 'redis' package")
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+
+    def get(self, key):
+        return self.client.get(key)
+
+    def set(self, key, value):
+        self.client.set(key, value, ex=self.ttl)
+
+    def get_version(self, namespace):
+        return int(self.client.get(f'{namespace}:version') or 0)
+
+    def bump_version(self, namespace):
+        self.client.incr(f'{namespace}:version')
+
+    def stats(self):
+        return {'backend_keys': self.client.dbsize()}
+
+
+class PayloadCache:
+    """Read-through facade over a backend that also counts hits and misses"""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    def fetch(self, namespace, name, variant, build):
+        """Return a ``CachedPayload``, calling ``build()`` on a miss"""
+        if self.backend is None:
+            return make_payload(build(), precompress=False)
+
+        version = self.backend.get_version(namespace)
+        key = f'{namespace}:v{version}:{name}:{variant}:{ENTRY_FORMAT}'
+
+        raw = self.backend.get(key)
+        if raw is not None:
+            self.hits += 1
+            return unpack(raw)
+
+        self.misses += 1
+        # Build from the primary: a lagging replica read here would be
+        # cached under the new version and outlive the lag
+        with use_primary():
+            payload = make_payload(build())
+        self.backend.set(key, pack(payload))
+        return payload
+
+    def bump(self, namespace):
+        if self.backend is not None:
+            self.backend.bump_version(namespace)
+
+    def stats(self):
+        total = self.hits + self.misses
+        stats = {
+            'backend': type(self.backend).__name__ if self.backend else None,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / total, 4) if total else None
+        }
+        if self.backend is not None:
+            stats.update(self.backend.stats())
+        return stats
+
+
+def make_payload(data, precompress=True):
+    """Serialize ``data`` exactly as ``jsonify`` would and fingerprint it.
+
+    With ``precompress``, also compress it for the entry (worth it only if stored).
+    """
+    if isinstance(data, JSONArray):
+        body = encode_json_array(data)
+    else:
+        body = (current_app.json.dumps(data) + '\n').encode('utf-8')
+    return CachedPayload(hashlib.sha256(body).hexdigest()[:32], int(time.time()), body,
+                         compress_payload(body) if precompress else {})
+
+
+def pack(payload):
+    """Entry as bytes for the backend.
+
+    ``etag\\nbuilt_at\\nlayout\\n`` followed by the body and each compressed
+    variant, where ``layout`` lists their sizes: ``identity:1200,gzip:310``.
+    """
+    parts = [('identity', payload.body)] + list(payload.compressed.items())
+    layout = ','.join(f'{encoding}:{len(data)}' for encoding, data in parts)
+    header = f'{payload.etag}\n{payload.built_at}\n{layout}\n'.encode('ascii')
+    return header + b''.join(data for _, data in parts)
+
+
+def unpack(raw):
+    etag, built_at, layout, data = raw.split(b'\n', 3)
+    parts = {}
+    offset = 0
+    for entry in layout.decode('ascii').split(','):
+        encoding, size = entry.split(':')
+        parts[encoding] = data[offset:offset + int(size)]
+        offset += int(size)
+    body = parts.pop('identity')
+    return CachedPayload(etag.decode('ascii'), int(built_at), body, parts)
+
+
+def init_cache(app):
+    """Create the configured cache backend for the application"""
+    backend_name = app.config.get('CACHE_BACKEND', 'memory')
+    if backend_name == 'memory':
+        backend = MemoryCache(app.config.get('CACHE_MAX_BYTES', 64 * 1024 * 1024))
+    elif backend_name == 'redis':
+        backend = RedisCache(app.config['CACHE_REDIS_URL'], app.config.get('CACHE_TTL', 3600))
+    elif backend_name == 'none':
+        backend = None
+    else:
+        raise ValueError(f'Unknown CACHE_BACKEND: {backend_name}')
+    app.extensions['payload_cache'] = PayloadCache(backend)
+
+
+def get_cache():
+    return current_app.extensions['payload_cache']
+
+
+def restaurant_namespace(restaurant_id):
+    return f'restaurant:{restaurant_id}'
+
+
+def request_variant():
+    """Canonical form of the query string, so equivalent URLs share an entry"""
+    return '&'.join(f'{key}={value}' for key, value in sorted(request.args.items(multi=True)))
+
+
+def conditional_response(payload):
+    """JSON response with validators; 304 when the client's copy is current.
+
+    ``If-None-Match`` takes precedence over ``If-Modified-Since``.
+    """
+    response = current_app.response_class(mimetype='application/json')
+    encode_response(response, payload.body, payload.etag, payload.compressed)
+    response.last_modified = datetime.fromtimestamp(payload.built_at, timezone.utc)
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
+def cached_payload(namespace, name, build):
+    """Read-through fetch of a payload as a conditional JSON response"""
+    return conditional_response(get_cache().fetch(namespace, name, request_variant(), build))
+
+
+def cached_restaurant_payload(restaurant_id, name, build):
+    """Read-through fetch of one restaurant-scoped payload"""
+    return cached_payload(restaurant_namespace(restaurant_id), name, build)
+
+
+def cached_restaurant_list(name, build):
+    """Read-through fetch of a payload covering all restaurants"""
+    return cached_payload(LIST_NAMESPACE, name, build)
+
+
+def invalidate_restaurant(restaurant_id):
+    """Bump a restaurant's version and the list's; call after the write has committed"""
+    cache = get_cache()
+    cache.bump(restaurant_namespace(restaurant_id))
+    cache.bump(LIST_NAMESPACE)
@@ -0,0 +1,78 @@
+"""
+Flask CLI commands for SavorySync maintenance tasks
+"""
+
+import click
+from models import db
+from migrations import run_migrations
+from search import rebuild_search_index
+from dietary import rebuild_dietary_index
+from rollups import backfill_rollups
+from seeding import seed_dataset
+from archive import archive_orders
+
+
+def register_commands(app):
+    """Register maintenance commands on the Flask CLI"""
+
+    @app.cli.command('init-db')
+    def init_db_command():
+        """Create any missing tables on the primary database"""
+        db.create_all(bind_key=None)
+        # New tables already have the migrated schema; just record it
+        run_migrations()
+        click.echo('Database tables created')
+
+    @app.cli.command('migrate')
+    def migrate_command():
+        """Apply pending schema migrations to an existing database"""
+        ran = run_migrations()
+        for version, description in ran:
+            click.echo(f'Applied {version}: {description}')
+        if not ran:
+            click.echo('Schema is up to date')
+
+    @app.cli.command('rebuild-search-index')
+    @click.option('--batch-size', default=1000, show_default=True, help='Rows loaded per batch')
+    def rebuild_search_index_command(batch_size):
+        """Rebuild the restaurant and menu search index from the database"""
+        count = rebuild_search_index(batch_size=batch_size)
+        click.echo(f'Indexed {count} restaurants and menu items')
+
+    @app.cli.command('rebuild-dietary-index')
+    def rebuild_dietary_index_command():
+        """Recompute dietary tag bitmasks for all menu items and restaurants"""
+        count = rebuild_dietary_index()
+        click.echo(f'Rebuilt dietary masks for {count} restaurants')
+
+    @app.cli.command('backfill-sales-rollups')
+    @click.option('--restaurant-id', 'restaurant_ids', type=int, multiple=True, help='Limit to these restaurants')
+    def backfill_sales_rollups_command(restaurant_ids):
+        """Rebuild daily sales rollups from existing orders"""
+        count = backfill_rollups(list(restaurant_ids) or None)
+        click.echo(f'Backfilled sales rollups for {count} restaurants')
+
+    @app.cli.command('archive-orders')
+    @click.option('--older-than-days', type=int, help='Defaults to ARCHIVE_AFTER_DAYS')
+    @click.option('--batch-size', type=int, help='Orders per transaction; defaults to ARCHIVE_BATCH_SIZE')
+    @click.option('--pause', type=float, help='Seconds between batches; defaults to ARCHIVE_PAUSE_SECONDS')
+    def archive_orders_command(older_than_days, batch_size, pause):
+        """Move delivered and cancelled orders past the retention age to the archive tables"""
+        count = archive_orders(older_than_days, batch_size, pause, report=click.echo)
+        click.echo(f'Archived {count} orders')
+
+    @app.cli.command('seed-data')
+    @click.option('--restaurants', default=2000, show_default=True)
+    @click.option('--menu-items', default=150, show_default=True, help='Mean menu size per restaurant')
+    @click.option('--customers', default=200000, show_default=True)
+    @click.option('--orders', default=1000000, show_default=True)
+    @click.option('--days', default=365, show_default=True, help='Length of the order history')
+    @click.option('--seed', default=42, show_default=True, help='Same seed and sizes, same data')
+    @click.option('--batch-size', default=20000, show_default=True, help='Rows per INSERT batch')
+    def seed_data_command(restaurants, menu_items, customers, orders, days, seed, batch_size):
+        """Load a synthetic, production-shaped dataset for performance work"""
+        try:
+            counts = seed_dataset(restaurants, menu_items, customers, orders, days, seed, batch_size, report=click.echo)
+        except ValueError as error:
+            raise click.UsageError(str(error))
+        click.echo(', '.join(f'{count} {table}' for table, count in counts.items()))
@@ -0,0 +1,109 @@
+"""
+Content-Encoding negotiation for ``/api/*`` responses
+
+Encodings are offered in the order of ``COMPRESSION_ENCODINGS`` (``br``
+needs the optional ``brotli`` package) and picked against the client's
+``Accept-Encoding``, q-values included. Bodies under
+``COMPRESSION_MIN_BYTES`` go out as they are: below about a packet the
+saving does not pay for the work.
+
+Ordinary responses are compressed in an ``after_request`` hook at a
+fast level. Cached catalog payloads are compressed once, harder, when
+they are built and stored with the entry (see ``cache.py``), so a cache
+hit sends stored bytes. Streamed responses are left alone.
+
+A compressed response gets its own ETag (``<etag>-<encoding>``), as the
+bytes differ from the identity representation.
+"""
+
+import gzip
+import importlib.util
+from flask import current_app, request
+
+COMPRESSIBLE_MIMETYPES = ('application/json', 'text/plain', 'text/html')
+
+# Per-request work has to stay cheap; cached payloads are compressed once
+DYNAMIC_LEVELS = {'gzip': 6, 'br': 4}
+CACHED_LEVELS = {'gzip': 9, 'br': 9}
+
+
+def compress(data, encoding, level):
+    if encoding == 'gzip':
+        # Fixed mtime so the same payload always compresses to the same bytes
+        return gzip.compress(data, compresslevel=level, mtime=0)
+    if encoding == 'br':
+        import brotli
+        return brotli.compress(data, quality=level)
+    raise ValueError(f'Unknown encoding: {encoding}')
+
+
+def compress_payload(body):
+    """``{encoding: bytes}`` for each configured encoding, empty for small bodies"""
+    settings = current_app.extensions.get('compression')
+    if settings is None or len(body) < settings['min_bytes']:
+        return {}
+    return {encoding: compress(body, encoding, CACHED_LEVELS[encoding]) for encoding in settings['encodings']}
+
+
+def negotiate_encoding(size):
+    """Encoding to send a body of ``size`` bytes with, or None for identity"""
+    settings = current_app.extensions.get('compression')
+    if settings is None or size < settings['min_bytes']:
+        return None
+    return request.accept_encodings.best_match(settings['encodings'])
+
+
+def encode_response(response, body, etag=None, compressed=None):
+    """Set ``body`` on ``response``, compressed if the client accepts it.
+
+    ``compressed`` holds precompressed variants of ``body`` by encoding;
+    anything missing is compressed now.
+    """
+    encoding = negotiate_encoding(len(body))
+    if current_app.extensions.get('compression') is not None:
+        response.vary.add('Accept-Encoding')
+    if encoding is not None:
+        variant = (compressed or {}).get(encoding)
+        if variant is None:
+            variant = compress(body, encoding, DYNAMIC_LEVELS[encoding])
+        body = variant
+        response.content_encoding = encoding
+        if etag is not None:
+            etag = f'{etag}-{encoding}'
+    response.set_data(body)
+    if etag is not None:
+        response.set_etag(etag)
+    return response
+
+
+def _compress_response(response):
+    if (not request.path.startswith('/api/') or response.direct_passthrough or response.is_streamed
+            or response.content_encoding or response.mimetype not in COMPRESSIBLE_MIMETYPES
+            or not 200 <= response.status_code < 300 or response.status_code == 204):
+        return response
+    etag, weak = response.get_etag()
+    body = response.get_data()
+    encode_response(response, body)
+    if etag is not None and response.content_encoding:
+        response.set_etag(f'{etag}-{response.content_encoding}', weak)
+    return response
+
+
+def init_compression(app):
+    """Read the encodings to offer and hook response compression.
+
+    Call after ``init_metrics`` so compression counts towards request latency.
+    """
+    encodings = [name.strip() for name in app.config.get('COMPRESSION_ENCODINGS', 'gzip').split(',') if name.strip()]
+    if not encodings or encodings == ['none']:
+        return
+    for encoding in encodings:
+        if encoding not in DYNAMIC_LEVELS:
+            raise ValueError(f'Unknown COMPRESSION_ENCODINGS entry: {encoding}')
+        if encoding == 'br' and importlib.util.find_spec('brotli') is None:
+            raise RuntimeError("COMPRESSION_ENCODINGS with 'br' requires the 'brotli' package")
+    app.extensions['compression'] = {
+        'encodings': encodings,
+        'min_bytes': app.config.get('COMPRESSION_MIN_BYTES', 1024)
+    }
+    app.after_request(_compress_response)
@@ -0,0 +1,139 @@
+"""
+Dietary tag bitmasks for restaurants and menu items
+
+Each known dietary tag owns one bit. Menu items store the mask of their
+own tags and each restaurant stores the union over its active items, so
+dietary filtering is a single bitwise predicate on the restaurant row.
+Tags outside ``DIETARY_TAGS`` have no bit; filtering on them falls back to
+looking for the tag in the active menu items' JSON ``dietary_tags``.
+"""
+
+from sqlalchemy import Boolean, update
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement
+from models import db, MenuItem, Restaurant
+
+# Order is persisted in stored masks: only ever append new tags.
+DIETARY_TAGS = (
+    'vegetarian',
+    'vegan',
+    'gluten-free',
+    'dairy-free',
+    'nut-free',
+    'low-calorie',
+    'high-protein',
+    'keto',
+    'halal',
+    'kosher'
+)
+
+TAG_BITS = {tag: 1 << position for position, tag in enumerate(DIETARY_TAGS)}
+
+
+def tags_to_mask(tags):
+    """Fold a list of tags into a bitmask, ignoring unknown tags"""
+    mask = 0
+    for tag in tags or []:
+        mask |= TAG_BITS.get(tag, 0)
+    return mask
+
+
+class json_array_contains(FunctionElement):
+    """SQL expression: a JSON array column contains a string"""
+    type = Boolean()
+    inherit_cache = True
+    name = 'json_array_contains'
+
+
+@compiles(json_array_contains, 'sqlite')
+def _json_array_contains_sqlite(element, compiler, **kw):
+    column, value = (compiler.process(clause, **kw) for clause in element.clauses)
+    return f'EXISTS (SELECT 1 FROM json_each({column}) WHERE json_each.value = {value})'
+
+
+@compiles(json_array_contains, 'mysql')
+def _json_array_contains_mysql(element, compiler, **kw):
+    column, value = (compiler.process(clause, **kw) for clause in element.clauses)
+    return f'JSON_CONTAINS({column}, JSON_QUOTE({value}))'
+
+
+@compiles(json_array_contains, 'postgresql')
+def _json_array_contains_postgresql(element, compiler, **kw):
+    column, value = (compiler.process(clause, **kw) for clause in element.clauses)
+    return f'jsonb_exists(CAST({column} AS JSONB), {value})'
+
+
+def mask_to_tags(mask):
+    """Expand a bitmask back into its tag names"""
+    return [tag for tag in DIETARY_TAGS if (mask or 0) & TAG_BITS[tag]]
+
+
+def matches_any(column, tags):
+    """SQL predicate: ``column`` shares at least one bit with ``tags``"""
+    return column.op('&')(tags_to_mask(tags)) != 0
+
+
+def offers_any(tags):
+    """SQL predicate on restaurants: an active menu item has at least one of ``tags``"""
+    known = [tag for tag in tags if tag in TAG_BITS]
+    unknown = sorted({tag for tag in tags if tag not in TAG_BITS})
+    conditions = []
+    if known:
+        conditions.append(matches_any(Restaurant.dietary_mask, known))
+    if unknown:
+        # No bit to test: look inside the JSON tags (a menu_item scan, only for these)
+        conditions.append(Restaurant.id.in_(
+            db.select(MenuItem.restaurant_id).where(
+                MenuItem.active == True,
+                db.or_(*[json_array_contains(MenuItem.dietary_tags, tag) for tag in unknown])
+            )
+        ))
+    return db.or_(*conditions)
+
+
+def refresh_restaurant_mask(restaurant_id):
+    """Recompute a restaurant's mask from its active menu items"""
+    mask = 0
+    for (item_mask,) in db.session.query(MenuItem.dietary_mask).filter_by(
+        restaurant_id=restaurant_id, active=True
+    ):
+        mask |= item_mask or 0
+
+    db.session.query(Restaurant).filter_by(id=restaurant_id).update(
+        {Restaurant.dietary_mask: mask}, synchronize_session=False
+    )
+    return mask
+
+
+def update_dietary_index(menu_item):
+    """Sync a menu item's mask and its restaurant's union after a write"""
+    menu_item.dietary_mask = tags_to_mask(menu_item.dietary_tags)
+    db.session.flush()
+    refresh_restaurant_mask(menu_item.restaurant_id)
+
+
+def rebuild_dietary_index(batch_size=1000):
+    """Recompute every menu item and restaurant mask from the JSON tags"""
+    count = rebuild_dietary_masks(batch_size)
+    db.session.commit()
+    return count
+
+
+def rebuild_dietary_masks(batch_size=1000):
+    """``rebuild_dietary_index`` in the caller's transaction; reads only ids and tags"""
+    last_id = 0
+    while True:
+        rows = db.session.query(MenuItem.id, MenuItem.dietary_tags).filter(
+            MenuItem.id > last_id
+        ).order_by(MenuItem.id).limit(batch_size).all()
+        if not rows:
+            break
+        db.session.execute(update(MenuItem), [
+            {'id': item_id, 'dietary_mask': tags_to_mask(tags)} for item_id, tags in rows
+        ])
+        last_id = rows[-1].id
+
+    restaurant_ids = [restaurant_id for (restaurant_id,) in db.session.query(Restaurant.id)]
+    for restaurant_id in restaurant_ids:
+        refresh_restaurant_mask(restaurant_id)
+    return len(restaurant_ids)
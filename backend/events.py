@@ -0,0 +1,202 @@
+"""
+Order events pushed to dashboards over server-sent events
+
+Writers publish to a channel per restaurant and per customer after their
+transaction commits; ``/api/events`` streams read from it. Each channel
+keeps a bounded backlog with increasing event ids, so a reconnecting
+client sending ``Last-Event-ID`` gets what it missed. If its id has already
+fallen out of the backlog it receives a ``resync`` event and should
+re-fetch ``GET /api/orders`` once.
+
+Backends, selected with ``EVENTS_BACKEND``:
+
+- ``memory`` (default): in-process channels. Only subscribers in the
+  publishing worker see an event, so use it with a single worker.
+- ``redis``: one Redis stream per channel via ``EVENTS_REDIS_URL``, shared
+  by all workers and hosts.
+
+An open stream occupies a server thread for as long as the client stays
+connected, so each worker serves at most ``EVENTS_MAX_STREAMS`` at a time
+and turns further ones away (see ``open_stream_slot``).
+"""
+
+import json
+import threading
+import time
+from collections import deque
+from flask import current_app
+
+RESYNC = 'resync'
+
+
+class MemoryEvents:
+    """In-process channels: a bounded deque per channel plus a condition to wake readers"""
+
+    def __init__(self, backlog):
+        self.backlog = backlog
+        self._channels = {}
+        self._last_ids = {}
+        self._condition = threading.Condition()
+
+    def publish(self, channel, event, data):
+        with self._condition:
+            event_id = self._last_ids.get(channel, 0) + 1
+            self._last_ids[channel] = event_id
+            self._channels.setdefault(channel, deque(maxlen=self.backlog)).append((str(event_id), event, data))
+            self._condition.notify_all()
+
+    def latest_id(self, channel):
+        return str(self._last_ids.get(channel, 0))
+
+    def read(self, channel, last_id, timeout):
+        """Events after ``last_id``, waiting up to ``timeout`` seconds for one"""
+        try:
+            last = int(last_id)
+        except ValueError:
+            return [(self.latest_id(channel), RESYNC, None)]
+
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            if last > self._last_ids.get(channel, 0):
+                # An id from before a restart
+                return [(self.latest_id(channel), RESYNC, None)]
+            while self._last_ids.get(channel, 0) <= last:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return []
+                self._condition.wait(remaining)
+
+            events = self._channels[channel]
+            if int(events[0][0]) > last + 1:
+                return [(self.latest_id(channel), RESYNC, None)]
+            return [entry for entry in events if int(entry[0]) > last]
+
+
+class RedisEvents:
+    """Channels shared between workers as capped Redis streams"""
+
+    def __init__(self, url, backlog):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("EVENTS_BACKEND='redis' requires the 'redis' package")
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+        self.response_error = redis.exceptions.ResponseError
+        self.backlog = backlog
+
+    def publish(self, channel, event, data):
+        self.client.xadd(f'events:{channel}', {'event': event, 'data': json.dumps(data)},
+                         maxlen=self.backlog, approximate=True)
+
+    def latest_id(self, channel):
+        entries = self.client.xrevrange(f'events:{channel}', count=1)
+        return entries[0][0] if entries else '0-0'
+
+    def read(self, channel, last_id, timeout):
+        key = f'events:{channel}'
+        try:
+            response = self.client.xread({key: last_id}, block=int(timeout * 1000), count=self.backlog)
+        except self.response_error:
+            # Not a stream id
+            return [(self.latest_id(channel), RESYNC, None)]
+        if not response:
+            return []
+
+        entries = response[0][1]
+        if last_id != '0-0':
+            first = self.client.xrange(key, count=1)
+            if first and _stream_id(first[0][0]) > _stream_id(last_id) and entries[0][0] == first[0][0]:
+                # Trimmed past the client's position
+                return [(self.latest_id(channel), RESYNC, None)]
+        return [(event_id, fields['event'], json.loads(fields['data'])) for event_id, fields in entries]
+
+
+def _stream_id(value):
+    millis, _, sequence = value.partition('-')
+    return int(millis), int(sequence or 0)
+
+
+def init_events(app):
+    """Create the configured event backend for the application"""
+    backend_name = app.config.get('EVENTS_BACKEND', 'memory')
+    backlog = app.config.get('EVENTS_BACKLOG', 1000)
+    if backend_name == 'memory':
+        backend = MemoryEvents(backlog)
+    elif backend_name == 'redis':
+        backend = RedisEvents(app.config['EVENTS_REDIS_URL'], backlog)
+    else:
+        raise ValueError(f'Unknown EVENTS_BACKEND: {backend_name}')
+    app.extensions['events'] = backend
+    app.extensions['event_stream_slots'] = threading.BoundedSemaphore(app.config.get('EVENTS_MAX_STREAMS', 2))
+
+
+def get_events():
+    return current_app.extensions['events']
+
+
+def open_stream_slot():
+    """Take one of this worker's stream slots; returns the function that frees it, or None if all are taken"""
+    slots = current_app.extensions['event_stream_slots']
+    return slots.release if slots.acquire(blocking=False) else None
+
+
+def restaurant_channel(restaurant_id):
+    return f'restaurant:{restaurant_id}'
+
+
+def customer_channel(customer_id):
+    return f'customer:{customer_id}'
+
+
+def order_event_data(order):
+    return {
+        'id': order.id,
+        'order_number': order.order_number,
+        'restaurant_id': order.restaurant_id,
+        'customer_id': order.customer_id,
+        'status': order.status,
+        'total': order.total_amount,
+        'time': order.created_at.strftime('%Y-%m-%d %H:%M')
+    }
+
+
+def publish_order_event(event, data):
+    """Publish an order event to its restaurant and customer; call after the write has committed"""
+    events = get_events()
+    events.publish(restaurant_channel(data['restaurant_id']), event, data)
+    events.publish(customer_channel(data['customer_id']), event, data)
+
+
+def format_event(event_id, event, data):
+    """One SSE message"""
+    return f'id: {event_id}\nevent: {event}\ndata: {json.dumps(data)}\n\n'
+
+
+def stream_channel(channel, last_event_id=None):
+    """Generator of SSE text for a channel, starting after ``last_event_id``.
+
+    Without ``last_event_id`` the stream starts at the newest event. A
+    comment line is sent every ``EVENTS_HEARTBEAT`` seconds of silence so
+    proxies keep the connection open and dead clients are noticed.
+
+    Everything it needs from the app is read here, so the generator runs
+    without an application or request context (and holds no database
+    connection).
+    """
+    events = get_events()
+    heartbeat = current_app.config.get('EVENTS_HEARTBEAT', 15)
+    retry_ms = current_app.config.get('EVENTS_RETRY_MS', 3000)
+    last_id = last_event_id or events.latest_id(channel)
+    return _stream(events, channel, last_id, heartbeat, retry_ms)
+
+
+def _stream(events, channel, last_id, heartbeat, retry_ms):
+    yield f'retry: {retry_ms}\n\n'
+    while True:
+        batch = events.read(channel, last_id, heartbeat)
+        if not batch:
+            yield ': heartbeat\n\n'
+            continue
+        for event_id, event, data in batch:
+            yield format_event(event_id, event, data)
+            last_id = event_id
@@ -0,0 +1,58 @@
+"""
+Gunicorn settings for production
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+- Preforks ``WEB_WORKERS`` workers (default: 2 x CPU + 1), each with
+  ``WEB_THREADS`` threads so open event streams don't block a worker.
+  The ``memory`` cache and event backends only work within one process:
+  with either of them the default is a single worker, and asking for
+  more refuses to start.
+- The app is created once in the master (``preload_app``) and shared
+  copy-on-write; each worker then resets inherited database connections,
+  claims its own order number worker id and warms its pools and caches.
+- Workers are recycled after ``WEB_MAX_REQUESTS`` requests (with jitter so
+  they don't all restart together) to bound memory growth.
+- ``kill -HUP <master>`` gracefully replaces all workers (in-flight requests
+  finish first). Because the app is preloaded, deploying new code needs
+  ``kill -USR2 <master>`` to start a new master, then ``kill -QUIT`` the old one.
+
+Create the tables beforehand with ``flask --app app init-db``; nothing is
+created at boot.
+"""
+
+import multiprocessing
+import os
+from config import Config
+
+# Cache versions and event channels that don't leave the process
+PER_PROCESS_BACKENDS = [
+    setting for setting in ('CACHE_BACKEND', 'EVENTS_BACKEND') if getattr(Config, setting) == 'memory'
+]
+
+bind = os.getenv('WEB_BIND', '0.0.0.0:5000')
+workers = int(os.getenv('WEB_WORKERS', 1 if PER_PROCESS_BACKENDS else multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.getenv('WEB_THREADS', 4))
+worker_class = 'gthread'
+preload_app = True
+max_requests = int(os.getenv('WEB_MAX_REQUESTS', 10000))
+max_requests_jitter = int(os.getenv('WEB_MAX_REQUESTS_JITTER', max_requests // 10))
+timeout = int(os.getenv('WEB_TIMEOUT', 30))
+graceful_timeout = int(os.getenv('WEB_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.getenv('WEB_KEEPALIVE', 5))
+accesslog = os.getenv('WEB_ACCESS_LOG', '-')
+
+
+def on_starting(server):
+    # Other workers would serve stale catalog payloads and miss order events
+    if server.cfg.workers > 1 and PER_PROCESS_BACKENDS:
+        message = (f'{server.cfg.workers} workers need shared backends; '
+                   f"set {' and '.join(PER_PROCESS_BACKENDS)} to 'redis' or run a single worker")
+        server.log.error(message)
+        raise RuntimeError(message)
+
+
+def post_worker_init(worker):
+    # Runs in each new worker before it accepts connections
+    from warmup import warm_worker
+    warm_worker(worker.wsgi)
@@ -0,0 +1,177 @@
+"""
+Who the caller is and what they own, without a query per request
+
+Access tokens carry the user's ``role``, ``name`` and ``restaurant_id``
+(their first restaurant, for sellers) as claims, so the common checks are
+answered from the token alone. Anything the claims can't answer (a seller
+who created a restaurant after logging in, further restaurants, tokens
+issued before the claims existed) goes through a per-process TTL cache
+of user to role and owned restaurants. Creating a restaurant invalidates
+its owner's entry.
+
+A cached "not an owner" answer is confirmed against the database before
+access is denied, so a stale entry in another worker can only cost a
+query, never wrongly refuse an owner.
+
+Claims are checked against the cache on every request (free on a hit):
+a token whose user no longer exists, or whose ``role`` or
+``restaurant_id`` claim the user no longer has, is rejected with 401
+once the cache has caught up, i.e. within ``IDENTITY_CACHE_TTL``. The
+mismatch is confirmed against the database first, as above.
+
+Event streams take their token in the URL, where access logs record it,
+so they are given stream tokens instead: short-lived (``EVENTS_TOKEN_EXPIRES``)
+and, through ``verify_token``, rejected by every other endpoint.
+"""
+
+import threading
+import time
+from collections import namedtuple
+from flask import current_app, request
+from flask_jwt_extended import create_access_token, get_jwt, get_jwt_identity
+from models import db, User, Restaurant
+
+CachedIdentity = namedtuple('CachedIdentity', ['role', 'name', 'restaurant_ids', 'expires_at'])
+
+
+class IdentityCache:
+    """Thread-safe TTL map of user id to ``CachedIdentity``"""
+
+    def __init__(self, ttl, max_entries):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id, refresh=False):
+        """Cached identity for a user, loading it on a miss; None if the user doesn't exist"""
+        if not refresh:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry.expires_at > time.monotonic():
+                return entry
+
+        user = db.session.query(User.role, User.name).filter(User.id == user_id).first()
+        if user is None:
+            return None
+        restaurant_ids = tuple(restaurant_id for (restaurant_id,) in db.session.query(Restaurant.id)
+                               .filter(Restaurant.owner_id == user_id).order_by(Restaurant.id))
+        entry = CachedIdentity(user.role, user.name, restaurant_ids, time.monotonic() + self.ttl)
+
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                self._entries.clear()
+            self._entries[user_id] = entry
+        return entry
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+
+def init_identity(app):
+    """Create the identity cache for the application"""
+    app.extensions['identity_cache'] = IdentityCache(
+        app.config.get('IDENTITY_CACHE_TTL', 300),
+        app.config.get('IDENTITY_CACHE_MAX_ENTRIES', 100000)
+    )
+
+
+def get_identity_cache():
+    return current_app.extensions['identity_cache']
+
+
+def create_user_token(user):
+    """Access token for a user with role, name and restaurant claims"""
+    identity = get_identity_cache().get(user.id, refresh=True)
+    return create_access_token(identity=user.id, additional_claims={
+        'role': user.role,
+        'name': user.name,
+        'restaurant_id': identity.restaurant_ids[0] if identity.restaurant_ids else None
+    })
+
+
+STREAM_TOKEN_SCOPE = 'events'
+
+
+def create_stream_token():
+    """Stream token for the caller, with the same identity claims as theirs"""
+    claims = {key: get_jwt().get(key) for key in ('role', 'name', 'restaurant_id')}
+    return create_access_token(
+        identity=get_jwt_identity(),
+        additional_claims={**claims, 'scope': STREAM_TOKEN_SCOPE},
+        expires_delta=current_app.config.get('EVENTS_TOKEN_EXPIRES')
+    )
+
+
+def is_stream_token():
+    return get_jwt().get('scope') == STREAM_TOKEN_SCOPE
+
+
+def _claims_hold(identity, jwt_data):
+    if identity is None:
+        return False
+    role = jwt_data.get('role')
+    restaurant_id = jwt_data.get('restaurant_id')
+    return (role is None or role == identity.role) and (restaurant_id is None or restaurant_id in identity.restaurant_ids)
+
+
+def verify_token(jwt_header, jwt_data):
+    """JWT verification hook: stream tokens only work on the event endpoints,
+    and the user must still exist and match the token's claims"""
+    if jwt_data.get('scope') == STREAM_TOKEN_SCOPE and request.blueprint != 'events':
+        return False
+    cache = get_identity_cache()
+    user_id = jwt_data[current_app.config.get('JWT_IDENTITY_CLAIM', 'sub')]
+    return _claims_hold(cache.get(user_id), jwt_data) or _claims_hold(cache.get(user_id, refresh=True), jwt_data)
+
+
+def _cached_identity():
+    return get_identity_cache().get(get_jwt_identity())
+
+
+def current_role():
+    role = get_jwt().get('role')
+    if role is None:
+        identity = _cached_identity()
+        role = identity.role if identity else None
+    return role
+
+
+def current_user_name():
+    name = get_jwt().get('name')
+    if name is None:
+        identity = _cached_identity()
+        name = identity.name if identity else None
+    return name
+
+
+def current_restaurant_id():
+    """The caller's (first) restaurant id, or None if they have none"""
+    restaurant_id = get_jwt().get('restaurant_id')
+    if restaurant_id is not None:
+        return restaurant_id
+
+    cache = get_identity_cache()
+    identity = cache.get(get_jwt_identity())
+    if identity is not None and not identity.restaurant_ids and identity.role == 'seller':
+        # Confirm before reporting a seller has no restaurant
+        identity = cache.get(get_jwt_identity(), refresh=True)
+    return identity.restaurant_ids[0] if identity and identity.restaurant_ids else None
+
+
+def owns_restaurant(restaurant_id):
+    """Whether the caller owns a restaurant; no query unless the answer looks like no"""
+    if restaurant_id == get_jwt().get('restaurant_id'):
+        return True
+
+    cache = get_identity_cache()
+    identity = cache.get(get_jwt_identity())
+    if identity is not None and restaurant_id in identity.restaurant_ids:
+        return True
+    identity = cache.get(get_jwt_identity(), refresh=True)
+    return identity is not None and restaurant_id in identity.restaurant_ids
+
+
+def invalidate_identity(user_id):
+    """Drop a user's cached identity; call after their restaurants change"""
+    get_identity_cache().invalidate(user_id)
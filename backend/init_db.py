@@ -5,6 +5,7 @@ Database initialization script for SavorySync
 
 from app import create_app
 from models import db
+from migrations import run_migrations
 
 def init_database():
     """Initialize the database and create all tables"""
@@ -12,7 +13,8 @@ def init_database():
     
     with app.app_context():
         # Create all tables
-        db.create_all()
+        db.create_all(bind_key=None)  # Never the replica
+        run_migrations()  # Records them; new tables already match
         print("Database tables created successfully!")
         
         # You can add sample data here if needed
@@ -0,0 +1,105 @@
+"""
+JSON encoding for responses, and streamed arrays for large listings
+
+Providers, selected with ``JSON_PROVIDER``:
+
+- ``orjson`` (default): the ``orjson`` encoder, several times faster than
+  the standard library on the dicts the routes return. Output matches
+  Flask's (sorted keys, RFC 822 dates, ``Decimal`` as a string) except
+  that non-ASCII text is written as UTF-8 rather than ``\\u`` escapes.
+- ``default``: Flask's provider, based on the standard ``json`` module.
+
+``jsonify`` and the payload cache both go through ``app.json``, so the
+choice applies everywhere.
+
+A ``JSONArray`` is an iterable of rows plus the function that turns one
+row into a dict. It is encoded element by element, so a listing never
+exists as a list of dicts next to its encoded form: ``stream_json_array``
+sends it as it is produced, and ``encode_json_array`` builds the body
+the payload cache stores.
+"""
+
+from collections import namedtuple
+from flask import current_app, stream_with_context
+from flask.json.provider import DefaultJSONProvider
+
+JSONArray = namedtuple('JSONArray', ['rows', 'serialize'])
+
+# Encoded elements are sent in chunks of about this size
+STREAM_CHUNK_BYTES = 64 * 1024
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by ``orjson``"""
+
+    def __init__(self, app):
+        try:
+            import orjson
+        except ImportError:
+            raise RuntimeError("JSON_PROVIDER='orjson' requires the 'orjson' package")
+        super().__init__(app)
+        self._orjson = orjson
+        # Dates are handed to Flask's ``default`` so they render as before
+        self._options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            self._options |= orjson.OPT_SORT_KEYS
+
+    def dumps(self, obj, **kwargs):
+        # ``separators`` is ignored: orjson output is always compact
+        options = self._options
+        if kwargs.get('indent'):
+            options |= self._orjson.OPT_INDENT_2
+        return self._orjson.dumps(obj, default=self.default, option=options).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return self._orjson.loads(s)
+
+
+def init_json(app):
+    """Install the configured JSON provider; call before anything wraps ``app.json``"""
+    provider_name = app.config.get('JSON_PROVIDER', 'orjson')
+    if provider_name == 'orjson':
+        app.json = OrjsonProvider(app)
+    elif provider_name != 'default':
+        raise ValueError(f'Unknown JSON_PROVIDER: {provider_name}')
+
+
+def iter_json_array(array):
+    """Yield ``array`` as UTF-8 JSON in chunks of about ``STREAM_CHUNK_BYTES``"""
+    provider = current_app.json
+    # Same layout as ``jsonify``: compact unless debugging
+    if (provider.compact is None and current_app.debug) or provider.compact is False:
+        dump_args = {'indent': 2}
+    else:
+        dump_args = {'separators': (',', ':')}
+    chunk = ['[']
+    size = 0
+    separator = ''
+    for row in array.rows:
+        encoded = provider.dumps(array.serialize(row), **dump_args)
+        chunk.append(separator)
+        chunk.append(encoded)
+        separator = ','
+        size += len(encoded)
+        if size >= STREAM_CHUNK_BYTES:
+            yield ''.join(chunk).encode('utf-8')
+            chunk = []
+            size = 0
+    chunk.append(']\n')
+    yield ''.join(chunk).encode('utf-8')
+
+
+def encode_json_array(array):
+    """The whole of ``array`` as a UTF-8 JSON body"""
+    return b''.join(iter_json_array(array))
+
+
+def stream_json_array(array):
+    """Response that encodes ``array`` while it is sent.
+
+    The request context, and with it the database session, stays open
+    until the last row has been written.
+    """
+    return current_app.response_class(
+        stream_with_context(iter_json_array(array)), mimetype=current_app.json.mimetype
+    )
@@ -0,0 +1,483 @@
+"""
+Bulk menu import and batched price/availability updates for sellers
+
+An import is a JSON array of objects or a CSV file with a header row,
+one menu item per row, keyed by the seller's ``sku``. The body is parsed
+as it is read from the request stream. Every row is validated, and
+matched against the restaurant's existing SKUs, before anything is
+written; a single invalid row rejects the whole import. Valid imports
+are written in batches of ``MENU_IMPORT_BATCH_SIZE`` rows with
+multi-row INSERT and UPDATE statements, in the caller's transaction.
+
+Both operations return a per-row report: ``row`` (1-based), the item's
+``sku`` and ``id``, a ``status`` and, for rejected rows, ``errors``.
+
+In CSV, empty cells are left out, list columns (``dietary_tags``,
+``allergens``) are separated with ``|`` and ``nutritional_info`` is JSON.
+"""
+
+import csv
+import io
+import json
+import math
+import re
+from flask import current_app
+from sqlalchemy import insert, update
+from models import db, MenuItem
+from dietary import tags_to_mask, refresh_restaurant_mask
+from search import index_menu_items
+
+READ_CHUNK_CHARS = 64 * 1024
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+# Values a new item gets when the import leaves them out, as in create_menu_item
+CREATE_DEFAULTS = {
+    'description': None,
+    'category': None,
+    'image': '🍕',
+    'dietary_tags': [],
+    'allergens': [],
+    'nutritional_info': {},
+    'spice_level': None,
+    'preparation_time': None,
+    'is_popular': False,
+    'active': True
+}
+REQUIRED_ON_CREATE = ('name', 'price')
+
+
+class InvalidImport(ValueError):
+    """Raised when an import or bulk update body cannot be read at all"""
+
+
+def is_sku_conflict(error):
+    """Whether an ``IntegrityError`` is a clash on the per-restaurant SKU key"""
+    message = str(error.orig)
+    # MySQL names the key, SQLite and PostgreSQL the columns
+    return 'uq_menu_item_restaurant_sku' in message or 'menu_item.sku' in message or '(restaurant_id, sku)' in message
+
+
+def _string(max_length=None):
+    def check(value):
+        if not isinstance(value, str):
+            raise ValueError('must be a string')
+        if max_length is not None and len(value) > max_length:
+            raise ValueError(f'must be at most {max_length} characters')
+        return value
+    return check
+
+
+def _price(value):
+    # NaN compares false with everything, so check finiteness first
+    if not isinstance(value, (int, float)) or isinstance(value, bool) or not (math.isfinite(value) and value >= 0):
+        raise ValueError('must be a non-negative number')
+    return float(value)
+
+
+def _minutes(value):
+    if not isinstance(value, int) or isinstance(value, bool) or value < 0:
+        raise ValueError('must be a non-negative integer')
+    return value
+
+
+def _boolean(value):
+    if not isinstance(value, bool):
+        raise ValueError('must be true or false')
+    return value
+
+
+def _string_list(value):
+    if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+        raise ValueError('must be a list of strings')
+    return value
+
+
+def _object(value):
+    if not isinstance(value, dict):
+        raise ValueError('must be an object')
+    return value
+
+
+FIELDS = {
+    'name': _string(100),
+    'description': _string(),
+    'price': _price,
+    'category': _string(50),
+    'image': _string(255),
+    'dietary_tags': _string_list,
+    'allergens': _string_list,
+    'nutritional_info': _object,
+    'spice_level': _string(20),
+    'preparation_time': _minutes,
+    'is_popular': _boolean,
+    'active': _boolean
+}
+SKU = _string(64)
+
+
+def _csv_boolean(text):
+    lowered = text.strip().lower()
+    if lowered in ('1', 'true', 'yes'):
+        return True
+    if lowered in ('0', 'false', 'no'):
+        return False
+    raise ValueError('must be true or false')
+
+
+def _csv_list(text):
+    return [item.strip() for item in text.split('|') if item.strip()]
+
+
+def _csv_number(text):
+    try:
+        return float(text)
+    except ValueError:
+        raise ValueError('must be a number')
+
+
+def _csv_integer(text):
+    try:
+        return int(text)
+    except ValueError:
+        raise ValueError('must be an integer')
+
+
+def _csv_json(text):
+    try:
+        return json.loads(text)
+    except ValueError:
+        raise ValueError('must be valid JSON')
+
+
+# CSV cells arrive as text; these turn them into what the JSON form carries
+CSV_CONVERTERS = {
+    'price': _csv_number,
+    'preparation_time': _csv_integer,
+    'is_popular': _csv_boolean,
+    'active': _csv_boolean,
+    'dietary_tags': _csv_list,
+    'allergens': _csv_list,
+    'nutritional_info': _csv_json
+}
+
+
+def _csv_rows(stream):
+    reader = csv.DictReader(io.TextIOWrapper(stream, encoding='utf-8-sig', newline=''))
+    try:
+        for record in reader:
+            row = {}
+            for field, text in record.items():
+                if field is None:
+                    row[None] = text
+                elif text is not None and text != '':
+                    row[field.strip()] = text
+            yield row
+    except (csv.Error, UnicodeDecodeError) as error:
+        raise InvalidImport(f'Invalid CSV at line {reader.line_num}: {error}')
+
+
+def _json_rows(stream):
+    """Elements of a JSON array, decoded one at a time as the body arrives"""
+    decoder = json.JSONDecoder()
+    reader = io.TextIOWrapper(stream, encoding='utf-8-sig')
+    buffer, position, eof = '', 0, False
+
+    def refill():
+        nonlocal buffer, position, eof
+        try:
+            chunk = reader.read(READ_CHUNK_CHARS)
+        except UnicodeDecodeError as error:
+            raise InvalidImport(f'Invalid JSON: {error}')
+        buffer, position, eof = buffer[position:] + chunk, 0, not chunk
+
+    def next_character():
+        """Skip whitespace; the next character, or '' at the end of the body"""
+        nonlocal position
+        while True:
+            position = WHITESPACE.match(buffer, position).end()
+            if position < len(buffer) or eof:
+                return buffer[position:position + 1]
+            refill()
+
+    if next_character() != '[':
+        raise InvalidImport('Send a JSON array of menu items')
+    position += 1
+    if next_character() == ']':
+        position += 1
+    else:
+        while True:
+            if not next_character():
+                raise InvalidImport('Invalid JSON: unexpected end of body')
+            while True:
+                try:
+                    value, end = decoder.raw_decode(buffer, position)
+                    # A value ending with the buffer may go on in the next chunk
+                    if end < len(buffer) or eof:
+                        break
+                except json.JSONDecodeError as error:
+                    if eof:
+                        raise InvalidImport(f'Invalid JSON: {error.msg}')
+                refill()
+            position = end
+            yield value
+
+            character = next_character()
+            position += 1
+            if character == ']':
+                break
+            if character != ',':
+                raise InvalidImport(f"Invalid JSON: expected ',' or ']', found {character or 'end of body'!r}")
+    if next_character():
+        raise InvalidImport('Invalid JSON: data after the array')
+
+
+def read_menu_rows(stream, mimetype):
+    """Rows of an import body, parsed while it is read"""
+    if mimetype == 'text/csv':
+        return _csv_rows(stream)
+    if mimetype == 'application/json':
+        return _json_rows(stream)
+    raise InvalidImport('Send the menu as application/json or text/csv')
+
+
+def validate_row(raw, from_csv=False):
+    """Check one import row; returns ``(sku, values, errors)``"""
+    if not isinstance(raw, dict):
+        return None, {}, ['Each row must be an object']
+    errors = []
+    if None in raw:
+        errors.append('Row has more cells than the header')
+
+    sku = raw.get('sku')
+    if isinstance(sku, str):
+        sku = sku.strip()
+    if sku is None or sku == '':
+        errors.append('sku is required')
+        sku = None
+    else:
+        try:
+            sku = SKU(sku)
+        except ValueError as error:
+            errors.append(f'sku {error}')
+            sku = None
+
+    values = {}
+    for field, value in raw.items():
+        if field in (None, 'sku'):
+            continue
+        if field not in FIELDS:
+            errors.append(f'Unknown field: {field}')
+            continue
+        try:
+            if from_csv and field in CSV_CONVERTERS:
+                value = CSV_CONVERTERS[field](value)
+            values[field] = FIELDS[field](value)
+        except ValueError as error:
+            errors.append(f'{field} {error}')
+    return sku, values, errors
+
+
+def _batches(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _ids_by_sku(restaurant_id, skus, batch_size):
+    found = {}
+    for batch in _batches(skus, batch_size):
+        found.update(db.session.query(MenuItem.sku, MenuItem.id).filter(
+            MenuItem.restaurant_id == restaurant_id, MenuItem.sku.in_(batch)
+        ))
+    return found
+
+
+def _reindex(item_ids, batch_size):
+    """Refresh the search index for written items, one batch of objects at a time"""
+    for batch in _batches(item_ids, batch_size):
+        index_menu_items(MenuItem.query.filter(MenuItem.id.in_(batch)).all())
+        db.session.expunge_all()
+
+
+def _max_rows_exceeded(number):
+    maximum = current_app.config.get('MENU_IMPORT_MAX_ROWS', 5000)
+    return number > maximum and f'At most {maximum} rows per request'
+
+
+def _rejected(report):
+    """Mark the valid rows of a rejected request as not written"""
+    for entry in report:
+        if entry['status'] is None:
+            entry['status'] = 'skipped'
+    return sum(1 for entry in report if entry['status'] == 'error')
+
+
+def import_menu(restaurant_id, stream, mimetype):
+    """Validate and upsert the rows of an import body by SKU.
+
+    Returns ``(report, summary)``; ``summary`` counts ``created``,
+    ``updated`` and ``errors``. Nothing is written when ``errors`` is
+    non-zero. The caller commits.
+    """
+    batch_size = current_app.config.get('MENU_IMPORT_BATCH_SIZE', 500)
+    from_csv = mimetype == 'text/csv'
+    report, valid, rows_by_sku = [], [], {}
+
+    for number, raw in enumerate(read_menu_rows(stream, mimetype), 1):
+        too_many = _max_rows_exceeded(number)
+        if too_many:
+            raise InvalidImport(too_many)
+        sku, values, errors = validate_row(raw, from_csv)
+        if sku is not None and sku in rows_by_sku:
+            errors.append(f'Duplicate sku, also on row {rows_by_sku[sku]}')
+        elif sku is not None:
+            rows_by_sku[sku] = number
+        report.append({'row': number, 'sku': sku, 'id': None, 'status': 'error' if errors else None, 'errors': errors})
+        if not errors:
+            valid.append((report[-1], sku, values))
+    if not report:
+        raise InvalidImport('No rows to import')
+
+    existing = _ids_by_sku(restaurant_id, [sku for _, sku, _ in valid], batch_size)
+    creates, updates = [], []
+    for entry, sku, values in valid:
+        if sku in existing:
+            entry['id'] = existing[sku]
+            updates.append((entry, values))
+            continue
+        missing = [field for field in REQUIRED_ON_CREATE if field not in values]
+        if missing:
+            entry['status'] = 'error'
+            entry['errors'].append(f"New items need {' and '.join(missing)}")
+        else:
+            creates.append((entry, values))
+
+    errors = _rejected(report) if any(entry['status'] == 'error' for entry in report) else 0
+    if errors:
+        return report, {'created': 0, 'updated': 0, 'errors': errors}
+
+    for batch in _batches(creates, batch_size):
+        db.session.execute(insert(MenuItem), [
+            dict(CREATE_DEFAULTS, **values, sku=entry['sku'], restaurant_id=restaurant_id,
+                 dietary_mask=tags_to_mask(values.get('dietary_tags')))
+            for entry, values in batch
+        ])
+    for batch in _batches(updates, batch_size):
+        db.session.execute(update(MenuItem), [
+            dict(values, id=entry['id'], **(
+                {'dietary_mask': tags_to_mask(values['dietary_tags'])} if 'dietary_tags' in values else {}
+            ))
+            for entry, values in batch
+        ])
+
+    created_ids = _ids_by_sku(restaurant_id, [entry['sku'] for entry, _ in creates], batch_size)
+    for entry, _ in creates:
+        entry['id'] = created_ids[entry['sku']]
+        entry['status'] = 'created'
+    for entry, _ in updates:
+        entry['status'] = 'updated'
+
+    _reindex([entry['id'] for entry in report], batch_size)
+    refresh_restaurant_mask(restaurant_id)
+    return report, {'created': len(creates), 'updated': len(updates), 'errors': 0}
+
+
+def _item_update(raw):
+    """Check one bulk update entry; returns ``(key, changes, errors)``"""
+    if not isinstance(raw, dict):
+        return None, {}, ['Each item must be an object']
+    errors = []
+    if ('id' in raw) == ('sku' in raw):
+        errors.append('Give exactly one of id or sku')
+    key = None
+    if 'id' in raw:
+        if isinstance(raw['id'], int) and not isinstance(raw['id'], bool):
+            key = ('id', raw['id'])
+        else:
+            errors.append('id must be an integer')
+    elif 'sku' in raw:
+        try:
+            key = ('sku', SKU(raw['sku']))
+        except ValueError as error:
+            errors.append(f'sku {error}')
+
+    changes = {}
+    for field, value in raw.items():
+        if field in ('id', 'sku'):
+            continue
+        if field not in ('price', 'active'):
+            errors.append(f'Only price and active can be bulk updated, not {field}')
+            continue
+        try:
+            changes[field] = FIELDS[field](value)
+        except ValueError as error:
+            errors.append(f'{field} {error}')
+    if not changes and not errors:
+        errors.append('Nothing to update: give price and/or active')
+    return key, changes, errors
+
+
+def bulk_update_menu(restaurant_id, items):
+    """Set ``price`` and/or ``active`` on many items, addressed by id or sku.
+
+    Returns ``(report, summary)`` like ``import_menu``; nothing is written
+    when any entry is invalid or names an item the restaurant doesn't have.
+    The caller commits.
+    """
+    if not isinstance(items, list) or not items:
+        raise InvalidImport('items must be a non-empty list')
+    too_many = _max_rows_exceeded(len(items))
+    if too_many:
+        raise InvalidImport(too_many)
+    batch_size = current_app.config.get('MENU_IMPORT_BATCH_SIZE', 500)
+
+    report, parsed = [], []
+    for number, raw in enumerate(items, 1):
+        key, changes, errors = _item_update(raw)
+        kind, value = key or (None, None)
+        entry = {'row': number, 'sku': value if kind == 'sku' else None, 'id': value if kind == 'id' else None,
+                 'status': 'error' if errors else None, 'errors': errors}
+        report.append(entry)
+        if not errors:
+            parsed.append((entry, key, changes))
+
+    # Resolve ids and SKUs against this restaurant's items only
+    ids = [value for _, (kind, value), _ in parsed if kind == 'id']
+    skus = [value for _, (kind, value), _ in parsed if kind == 'sku']
+    by_id = {}
+    for batch in _batches(ids, batch_size):
+        by_id.update(db.session.query(MenuItem.id, MenuItem.sku).filter(
+            MenuItem.restaurant_id == restaurant_id, MenuItem.id.in_(batch)
+        ))
+    by_sku = _ids_by_sku(restaurant_id, skus, batch_size)
+
+    targets = {}
+    for entry, (kind, value), changes in parsed:
+        if kind == 'id' and value in by_id:
+            entry['id'], entry['sku'] = value, by_id[value]
+        elif kind == 'sku' and value in by_sku:
+            entry['id'], entry['sku'] = by_sku[value], value
+        else:
+            entry['status'] = 'error'
+            entry['errors'].append(f'No menu item with {kind} {value!r} in this restaurant')
+            continue
+        if entry['id'] in targets:
+            entry['status'] = 'error'
+            entry['errors'].append(f"Item also updated on row {targets[entry['id']]}")
+            continue
+        targets[entry['id']] = entry['row']
+
+    errors = _rejected(report) if any(entry['status'] == 'error' for entry in report) else 0
+    if errors:
+        return report, {'updated': 0, 'errors': errors}
+
+    for batch in _batches(parsed, batch_size):
+        db.session.execute(update(MenuItem), [dict(changes, id=entry['id']) for entry, _, changes in batch])
+    for entry in report:
+        entry['status'] = 'updated'
+
+    # Availability changes what search and the dietary filter can see
+    toggled = [entry['id'] for entry, _, changes in parsed if 'active' in changes]
+    if toggled:
+        _reindex(toggled, batch_size)
+        refresh_restaurant_mask(restaurant_id)
+    return report, {'updated': len(parsed), 'errors': 0}
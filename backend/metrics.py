@@ -0,0 +1,365 @@
+"""
+Per-request SQL, serialization and latency metrics
+
+SQLAlchemy engine events time every statement and Flask request hooks
+attribute them to the endpoint (``url_rule``) that ran them. For each
+request the following are recorded in histograms labelled by method and
+endpoint: total latency, number of statements, time spent in the
+database and time spent encoding JSON (``app.json.dumps``, which both
+``jsonify`` and the payload cache go through). Everything is exposed in
+the Prometheus text format on ``/api/metrics``.
+
+Two kinds of problem are also logged as they happen:
+
+- N+1 queries: a request that runs the same statement shape (the SQL
+  with ``IN`` lists collapsed) more than ``N_PLUS_ONE_THRESHOLD`` times;
+- slow statements: anything over ``SLOW_QUERY_MS``, logged with the
+  database's EXPLAIN output once the response is ready.
+
+Streamed responses are recorded when the stream closes, so statements
+run while the body is sent count towards their request.
+
+Metrics live in the process. Under Gunicorn each worker keeps its own,
+labelled with its ``worker`` pid, so sum across workers when querying.
+The app is created in the master, so a registry that finds itself in a
+new process (after a fork) drops what it inherited and takes the new pid.
+``/api/metrics`` and ``/api/cache/stats`` only answer clients within
+``METRICS_ALLOWED_NETWORKS``.
+"""
+
+import ipaddress
+import os
+import re
+import threading
+import time
+from collections import Counter
+from functools import wraps
+from flask import current_app, g, has_request_context, jsonify, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# A parenthesised list of bind parameters, in any DB-API paramstyle
+_PARAMETER = r'(?:\?|%s|%\(\w+\)s|:\w+)'
+IN_LIST = re.compile(rf'\(\s*{_PARAMETER}(?:\s*,\s*{_PARAMETER})+\s*\)')
+
+
+def statement_shape(statement):
+    """A statement with whitespace normalised and ``IN`` lists collapsed"""
+    return ' '.join(IN_LIST.sub('(...)', statement).split())
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _render_labels(labels):
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels) + '}' if labels else ''
+
+
+class Counters:
+    """A family of monotonically increasing counters keyed by label tuples"""
+
+    kind = 'counter'
+
+    def __init__(self, name, description):
+        self.name = name
+        self.description = description
+        self.values = {}
+
+    def inc(self, labels, amount=1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self):
+        for labels, value in self.values.items():
+            yield self.name, labels, value
+
+
+class Histogram:
+    """Cumulative-bucket histogram family, as Prometheus expects"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, description, buckets):
+        self.name = name
+        self.description = description
+        self.buckets = buckets
+        self.values = {}
+
+    def observe(self, labels, value):
+        entry = self.values.get(labels)
+        if entry is None:
+            entry = self.values[labels] = [[0] * len(self.buckets), 0, 0.0]
+        counts = entry[0]
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[index] += 1
+        entry[1] += 1
+        entry[2] += value
+
+    def samples(self):
+        for labels, (counts, count, total) in self.values.items():
+            for bound, bucket_count in zip(self.buckets, counts):
+                yield f'{self.name}_bucket', labels + (('le', bound),), bucket_count
+            yield f'{self.name}_bucket', labels + (('le', '+Inf'),), count
+            yield f'{self.name}_count', labels, count
+            yield f'{self.name}_sum', labels, round(total, 6)
+
+
+class RequestMetrics:
+    """Everything recorded while one request is handled"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.serialization_time = 0.0
+        self.shapes = Counter()
+        self.slow = []
+        self.done = False
+
+
+class MetricsRegistry:
+    """Process-wide metric families; every update takes one lock"""
+
+    def __init__(self, slow_query_seconds, n_plus_one_threshold, explain_slow):
+        self.slow_query_seconds = slow_query_seconds
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.explain_slow = explain_slow
+        self.worker = str(os.getpid())
+        self._lock = threading.Lock()
+        self.requests = Counters('savory_http_requests_total', 'Requests handled')
+        self.latency = Histogram('savory_http_request_duration_seconds', 'Request latency', LATENCY_BUCKETS)
+        self.queries = Histogram('savory_db_queries_per_request', 'SQL statements per request', QUERY_BUCKETS)
+        self.db_time = Histogram('savory_db_time_seconds', 'Database time per request', LATENCY_BUCKETS)
+        self.serialization = Histogram('savory_serialization_seconds', 'JSON encoding time per request',
+                                       LATENCY_BUCKETS)
+        self.n_plus_one = Counters('savory_n_plus_one_total', 'Requests repeating one statement shape too often')
+        self.slow_queries = Counters('savory_slow_queries_total', 'Statements slower than SLOW_QUERY_MS')
+        self.families = (self.requests, self.latency, self.queries, self.db_time, self.serialization,
+                         self.n_plus_one, self.slow_queries)
+
+    def _check_worker(self):
+        # Call with the lock held
+        pid = str(os.getpid())
+        if pid != self.worker:
+            self.worker = pid
+            for family in self.families:
+                family.values.clear()
+
+    def record(self, method, endpoint, status, state):
+        with self._lock:
+            self._check_worker()
+            labels = (('worker', self.worker), ('method', method), ('endpoint', endpoint))
+            self.requests.inc(labels + (('status', status),))
+            self.latency.observe(labels, time.perf_counter() - state.started)
+            self.queries.observe(labels, state.queries)
+            self.db_time.observe(labels, state.db_time)
+            self.serialization.observe(labels, state.serialization_time)
+            if state.slow:
+                self.slow_queries.inc(labels, len(state.slow))
+
+        repeated = [(shape, count) for shape, count in state.shapes.items() if count > self.n_plus_one_threshold]
+        if repeated:
+            with self._lock:
+                self.n_plus_one.inc(labels)
+            for shape, count in repeated:
+                current_app.logger.warning('Possible N+1 in %s %s: %d x %s', method, endpoint, count, shape)
+
+    def render(self, extra=()):
+        """Prometheus text exposition of every family, plus ``(name, kind, description, value)`` extras"""
+        lines = []
+        with self._lock:
+            self._check_worker()
+            for family in self.families:
+                lines.append(f'# HELP {family.name} {family.description}')
+                lines.append(f'# TYPE {family.name} {family.kind}')
+                for name, labels, value in family.samples():
+                    lines.append(f'{name}{_render_labels(labels)} {value}')
+        for name, kind, description, value in extra:
+            lines.append(f'# HELP {name} {description}')
+            lines.append(f'# TYPE {name} {kind}')
+            lines.append(f'{name}{_render_labels((("worker", self.worker),))} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+def _request_state():
+    if not has_request_context():
+        return None
+    state = g.get('request_metrics')
+    return state if state is not None and not state.done else None
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get('query_started')
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    state = _request_state()
+    if state is None:
+        return
+    state.queries += 1
+    state.db_time += elapsed
+    state.shapes[statement_shape(statement)] += 1
+    registry = current_app.extensions['metrics']
+    if elapsed >= registry.slow_query_seconds:
+        state.slow.append((conn.engine, statement, parameters, executemany, elapsed))
+
+
+def _handle_error(context):
+    # The statement raised: after_cursor_execute won't run to pop its start time
+    if context.connection is not None:
+        started = context.connection.info.get('query_started')
+        if started:
+            started.pop()
+
+
+def explain(engine, statement, parameters):
+    """The database's plan for a statement, one line per step"""
+    dialect = engine.dialect.name
+    prefix = 'EXPLAIN QUERY PLAN' if dialect == 'sqlite' else 'EXPLAIN'
+    with engine.connect() as connection:
+        result = connection.exec_driver_sql(f'{prefix} {statement}', parameters)
+        if dialect == 'sqlite':
+            return [row[-1] for row in result]
+        columns = list(result.keys())
+        return [', '.join(f'{column}={value}' for column, value in zip(columns, row) if value is not None)
+                for row in result]
+
+
+def log_slow_statements(method, endpoint, state, explain_plans):
+    for engine, statement, parameters, executemany, elapsed in state.slow:
+        plan = ''
+        # EXPLAIN is only safe to repeat for reads
+        if explain_plans and not executemany and statement.lstrip().upper().startswith('SELECT'):
+            try:
+                plan = '\n    ' + '\n    '.join(explain(engine, statement, parameters))
+            except Exception as error:
+                plan = f'\n    (EXPLAIN failed: {error})'
+        current_app.logger.warning('Slow query (%.0f ms) in %s %s: %s%s', elapsed * 1000, method, endpoint,
+                                   ' '.join(statement.split()), plan)
+
+
+def _start_request():
+    g.request_metrics = RequestMetrics()
+
+
+def _record(method, endpoint, status, state):
+    state.done = True
+    registry = current_app.extensions['metrics']
+    registry.record(method, endpoint, status, state)
+    if state.slow:
+        log_slow_statements(method, endpoint, state, registry.explain_slow)
+
+
+def _finish_request(status):
+    state = _request_state()
+    if state is None:
+        return
+    endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    _record(request.method, endpoint, status, state)
+
+
+def _finish_stream(response):
+    """Record once the body has been sent; the request context is gone by then"""
+    state = _request_state()
+    if state is None:
+        return
+    app = current_app._get_current_object()
+    method = request.method
+    endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+
+    def close():
+        with app.app_context():
+            _record(method, endpoint, response.status_code, state)
+
+    response.call_on_close(close)
+
+
+def _after_request(response):
+    if response.is_streamed:
+        _finish_stream(response)
+    else:
+        _finish_request(response.status_code)
+    return response
+
+
+def _teardown_request(error):
+    # Only still pending when the view raised: an unhandled error
+    if error is not None:
+        _finish_request(500)
+
+
+def _timed_dumps(dumps):
+    def timed(obj, **kwargs):
+        started = time.perf_counter()
+        try:
+            return dumps(obj, **kwargs)
+        finally:
+            state = _request_state()
+            if state is not None:
+                state.serialization_time += time.perf_counter() - started
+    return timed
+
+
+def init_metrics(app):
+    """Hook request and engine events; call after the JSON provider is set"""
+    if not app.config.get('METRICS_ENABLED', True):
+        return
+    app.extensions['metrics'] = MetricsRegistry(
+        slow_query_seconds=app.config.get('SLOW_QUERY_MS', 200) / 1000,
+        n_plus_one_threshold=app.config.get('N_PLUS_ONE_THRESHOLD', 10),
+        explain_slow=app.config.get('EXPLAIN_SLOW_QUERIES', True)
+    )
+    # Class-level listeners cover the primary and the replica engines
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(Engine, 'handle_error', _handle_error)
+    app.before_request(_start_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+    app.json.dumps = _timed_dumps(app.json.dumps)
+
+
+def allowed_networks(value):
+    """Parse a comma-separated list of addresses and CIDR networks"""
+    return [ipaddress.ip_network(item.strip(), strict=False) for item in value.split(',') if item.strip()]
+
+
+def internal_only(view):
+    """Answer 403 unless the client address is in ``METRICS_ALLOWED_NETWORKS``"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        networks = allowed_networks(current_app.config.get('METRICS_ALLOWED_NETWORKS', '127.0.0.1,::1'))
+        try:
+            address = ipaddress.ip_address(request.remote_addr or '')
+        except ValueError:
+            address = None
+        if address is None or not any(address in network for network in networks):
+            return jsonify({'error': 'Forbidden'}), 403
+        return view(*args, **kwargs)
+
+    return wrapper
+
+
+def get_metrics():
+    return current_app.extensions.get('metrics')
+
+
+def render_metrics():
+    """Text for ``/api/metrics``, including cache and password hasher gauges"""
+    cache = current_app.extensions['payload_cache']
+    hasher = current_app.extensions['password_hasher']
+    return get_metrics().render([
+        ('savory_cache_hits_total', 'counter', 'Payload cache hits', cache.hits),
+        ('savory_cache_misses_total', 'counter', 'Payload cache misses', cache.misses),
+        ('savory_password_hash_pending', 'gauge', 'Password operations in flight', hasher.pending),
+        ('savory_password_hash_rejected_total', 'counter', 'Password operations rejected as busy', hasher.rejected),
+    ])
@@ -0,0 +1,120 @@
+"""
+Schema migrations for existing databases
+
+``db.create_all()`` creates missing tables but never changes a table that
+already exists, so schema changes to existing tables are listed here in
+order and applied with ``flask --app app migrate``. Applied versions are
+recorded in ``schema_migration``.
+
+Each step is idempotent: it checks the live schema before changing it. A
+fresh database gets the current schema from ``create_all()`` (or
+``setup_database.py``), and ``init-db`` then just records every step as
+applied.
+"""
+
+from sqlalchemy import inspect
+from sqlalchemy.schema import CreateColumn
+from models import db, Restaurant, MenuItem, Order, ArchivedOrder, ArchivedOrderItem, SchemaMigration
+from dietary import rebuild_dietary_masks
+
+
+def create_missing_indexes(connection, indexes, unique=False):
+    """Create each ``(table, name, columns)`` index that doesn't exist yet"""
+    inspector = inspect(connection)
+    quote = connection.dialect.identifier_preparer.quote
+    kind = 'UNIQUE INDEX' if unique else 'INDEX'
+    for table, name, columns in indexes:
+        if name in {index['name'] for index in inspector.get_indexes(table)}:
+            continue
+        connection.exec_driver_sql(
+            f'CREATE {kind} {quote(name)} ON {quote(table)} ({", ".join(quote(column) for column in columns)})'
+        )
+
+
+def add_missing_columns(connection, columns):
+    """Add each model ``Column`` whose table doesn't have it yet.
+
+    NOT NULL columns need a ``server_default`` to fill existing rows.
+    """
+    inspector = inspect(connection)
+    quote = connection.dialect.identifier_preparer.quote
+    for column in columns:
+        table = column.table.name
+        if column.name in {existing['name'] for existing in inspector.get_columns(table)}:
+            continue
+        if not column.nullable and column.server_default is None:
+            raise ValueError(f'{table}.{column.name} is NOT NULL without a server_default')
+        connection.exec_driver_sql(
+            f'ALTER TABLE {quote(table)} ADD COLUMN {CreateColumn(column).compile(dialect=connection.dialect)}'
+        )
+
+
+def rating_and_dietary_columns(connection):
+    # Rating aggregates and order ratings (see ratings.py) and dietary
+    # masks (see dietary.py) were added to the models before migrations
+    # existed; masks are then computed from the stored dietary_tags.
+    add_missing_columns(connection, [
+        Restaurant.__table__.c.rating_count,
+        Restaurant.__table__.c.rating_sum,
+        Restaurant.__table__.c.dietary_mask,
+        MenuItem.__table__.c.dietary_mask,
+        Order.__table__.c.rating,
+        Order.__table__.c.rated_at,
+    ])
+    rebuild_dietary_masks()
+
+
+def hot_path_indexes(connection):
+    # Order listings and analytics filter by one party and a created_at
+    # range; the primary key is implicitly the last index column, which
+    # also serves the (created_at, id) keyset order.
+    create_missing_indexes(connection, [
+        ('order', 'ix_order_restaurant_created', ('restaurant_id', 'created_at')),
+        ('order', 'ix_order_customer_created', ('customer_id', 'created_at')),
+        ('order_item', 'ix_order_item_order', ('order_id',)),
+        ('menu_item', 'ix_menu_item_restaurant_active', ('restaurant_id', 'active')),
+        ('restaurant', 'ix_restaurant_owner', ('owner_id',)),
+        ('restaurant', 'ix_restaurant_active', ('active',)),
+    ])
+
+
+def menu_item_sku(connection):
+    # Bulk menu imports upsert by the seller's SKU within a restaurant
+    add_missing_columns(connection, [MenuItem.__table__.c.sku])
+    create_missing_indexes(connection, [
+        ('menu_item', 'uq_menu_item_restaurant_sku', ('restaurant_id', 'sku')),
+    ], unique=True)
+
+
+def order_archive(connection):
+    # Cold tables for finished orders (see archive.py); created with their indexes
+    for model in (ArchivedOrder, ArchivedOrderItem):
+        model.__table__.create(connection, checkfirst=True)
+
+
+# (version, description, step), in the order they must run
+MIGRATIONS = [
+    ('0000', 'Rating and dietary mask columns, masks backfilled from dietary tags', rating_and_dietary_columns),
+    ('0001', 'Indexes for the order, order line, menu and owner lookups', hot_path_indexes),
+    ('0002', 'Seller SKU on menu items, unique per restaurant', menu_item_sku),
+    ('0003', 'Archive tables for old orders', order_archive),
+]
+
+
+def applied_versions():
+    SchemaMigration.__table__.create(db.engine, checkfirst=True)
+    return {version for (version,) in db.session.query(SchemaMigration.version)}
+
+
+def run_migrations():
+    """Apply pending migrations on the primary database; returns ``(version, description)`` pairs"""
+    applied = applied_versions()
+    ran = []
+    for version, description, step in MIGRATIONS:
+        if version in applied:
+            continue
+        step(db.session.connection())
+        db.session.add(SchemaMigration(version=version, description=description))
+        db.session.commit()
+        ran.append((version, description))
+    return ran
@@ -1,7 +1,8 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
+from routing import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -25,16 +26,25 @@ class Restaurant(db.Model):
     address = db.Column(db.Text)
     phone = db.Column(db.String(20))
     rating = db.Column(db.Float, default=0.0)
+    rating_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # maintained by ratings.record_rating
+    rating_sum = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     delivery_fee = db.Column(db.Float, default=0.0)
     delivery_time = db.Column(db.String(20))
     featured = db.Column(db.Boolean, default=False)
     active = db.Column(db.Boolean, default=True)
+    dietary_mask = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # union of active menu items, see dietary.py
     owner_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Relationships
     menu_items = db.relationship('MenuItem', backref='restaurant', lazy=True)
     orders = db.relationship('Order', backref='restaurant', lazy=True)
+    
+    # Added to existing databases by migrations.py
+    __table_args__ = (
+        db.Index('ix_restaurant_owner', 'owner_id'),
+        db.Index('ix_restaurant_active', 'active'),
+    )
 
 class MenuItem(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -44,14 +54,21 @@ class MenuItem(db.Model):
     category = db.Column(db.String(50))
     image = db.Column(db.String(255))
     dietary_tags = db.Column(db.JSON)  # Store as JSON array
+    dietary_mask = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # bitmask of dietary_tags
     allergens = db.Column(db.JSON)  # Store as JSON array
     nutritional_info = db.Column(db.JSON)  # Store nutritional info as JSON
     spice_level = db.Column(db.String(20))
     preparation_time = db.Column(db.Integer)  # minutes
     is_popular = db.Column(db.Boolean, default=False)
     active = db.Column(db.Boolean, default=True)
+    sku = db.Column(db.String(64))  # seller's own code, unique per restaurant; used by bulk imports
     restaurant_id = db.Column(db.Integer, db.ForeignKey('restaurant.id'), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        db.Index('ix_menu_item_restaurant_active', 'restaurant_id', 'active'),
+        db.Index('uq_menu_item_restaurant_sku', 'restaurant_id', 'sku', unique=True),
+    )
 
 class Order(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -65,11 +82,19 @@ class Order(db.Model):
     tax = db.Column(db.Float, default=0.0)
     subtotal = db.Column(db.Float, nullable=False)
     notes = db.Column(db.Text)
+    rating = db.Column(db.Integer)  # 1-5, set by the customer once delivered
+    rated_at = db.Column(db.DateTime)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relationships
     order_items = db.relationship('OrderItem', backref='order', lazy=True)
+    
+    # Order listings and analytics filter by one party and a time range
+    __table_args__ = (
+        db.Index('ix_order_restaurant_created', 'restaurant_id', 'created_at'),
+        db.Index('ix_order_customer_created', 'customer_id', 'created_at'),
+    )
 
 class OrderItem(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -81,4 +106,90 @@ class OrderItem(db.Model):
     customizations = db.Column(db.JSON)  # Store customizations as JSON
     
     # Relationship
-    menu_item = db.relationship('MenuItem') 
\ No newline at end of file
+    menu_item = db.relationship('MenuItem') 
+    
+    __table_args__ = (
+        db.Index('ix_order_item_order', 'order_id'),
+    )
+
+class ArchivedOrder(db.Model):
+    """A delivered or cancelled order moved out of ``order`` by archive.py; same columns"""
+    __tablename__ = 'order_archive'
+    
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    order_number = db.Column(db.String(20), nullable=False)
+    customer_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    restaurant_id = db.Column(db.Integer, db.ForeignKey('restaurant.id'), nullable=False)
+    status = db.Column(db.String(20))
+    total_amount = db.Column(db.Float, nullable=False)
+    delivery_address = db.Column(db.Text)
+    delivery_fee = db.Column(db.Float)
+    tax = db.Column(db.Float)
+    subtotal = db.Column(db.Float, nullable=False)
+    notes = db.Column(db.Text)
+    rating = db.Column(db.Integer)
+    rated_at = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime)
+    
+    order_items = db.relationship('ArchivedOrderItem', lazy=True)
+    restaurant = db.relationship('Restaurant')
+    
+    __table_args__ = (
+        db.Index('ix_order_archive_restaurant_created', 'restaurant_id', 'created_at'),
+        db.Index('ix_order_archive_customer_created', 'customer_id', 'created_at'),
+        db.Index('ix_order_archive_created', 'created_at'),
+    )
+
+class ArchivedOrderItem(db.Model):
+    """A line of an archived order; same columns as ``order_item``"""
+    __tablename__ = 'order_item_archive'
+    
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    order_id = db.Column(db.Integer, db.ForeignKey('order_archive.id'), nullable=False)
+    menu_item_id = db.Column(db.Integer, db.ForeignKey('menu_item.id'), nullable=False)
+    quantity = db.Column(db.Integer, nullable=False)
+    unit_price = db.Column(db.Float, nullable=False)
+    total_price = db.Column(db.Float, nullable=False)
+    customizations = db.Column(db.JSON)
+    
+    menu_item = db.relationship('MenuItem')
+    
+    __table_args__ = (
+        db.Index('ix_order_item_archive_order', 'order_id'),
+    )
+
+class DailySales(db.Model):
+    """Per-restaurant, per-day revenue rollup maintained by rollups.py"""
+    restaurant_id = db.Column(db.Integer, db.ForeignKey('restaurant.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    revenue = db.Column(db.Float, nullable=False, default=0.0)
+    order_count = db.Column(db.Integer, nullable=False, default=0)
+
+class DailyItemSales(db.Model):
+    """Per-restaurant, per-day, per-menu-item sales rollup maintained by rollups.py"""
+    restaurant_id = db.Column(db.Integer, db.ForeignKey('restaurant.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    menu_item_id = db.Column(db.Integer, db.ForeignKey('menu_item.id'), primary_key=True)
+    quantity = db.Column(db.Integer, nullable=False, default=0)
+    line_count = db.Column(db.Integer, nullable=False, default=0)
+
+class SearchTerm(db.Model):
+    """Inverted index row: one search term of a restaurant or menu item"""
+    id = db.Column(db.Integer, primary_key=True)
+    term = db.Column(db.String(50), nullable=False)
+    entity_type = db.Column(db.String(20), nullable=False)  # 'restaurant' or 'menu_item'
+    entity_id = db.Column(db.Integer, nullable=False)
+    restaurant_id = db.Column(db.Integer, nullable=False)
+    weight = db.Column(db.Integer, nullable=False, default=1)
+    
+    __table_args__ = (
+        db.Index('ix_search_term_term', 'term', 'restaurant_id', 'weight'),
+        db.Index('ix_search_term_entity', 'entity_type', 'entity_id'),
+    )
+
+class SchemaMigration(db.Model):
+    """A schema migration applied to this database, see migrations.py"""
+    version = db.Column(db.String(50), primary_key=True)
+    description = db.Column(db.String(255), nullable=False)
+    applied_at = db.Column(db.DateTime, default=datetime.utcnow)
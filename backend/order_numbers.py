@@ -0,0 +1,131 @@
+"""
+Snowflake-style order numbers
+
+Each number packs, most significant first, the milliseconds since
+``EPOCH`` (41 bits, good until 2093), a worker id (10 bits) and a
+per-millisecond sequence (12 bits) into 64 bits, rendered as
+``ORD-`` plus 16 fixed-width hex digits: 20 characters, fitting
+``order.order_number``. Numbers are generated in memory without touching
+the database, are unique as long as no two live processes share a worker
+id, and sort (as strings) in creation order.
+
+The worker id comes from ``ORDER_WORKER_ID``. Under the Gunicorn launcher
+each worker instead claims a free id from ``ORDER_WORKER_ID_BASE`` onwards
+through a lock file (see ``claim_worker_id``); give every host its own
+base. When neither applies the id is derived from the process id, which is
+only a best effort: two live processes can share the low bits of their pids.
+"""
+
+import fcntl
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from flask import current_app
+
+PREFIX = 'ORD-'
+EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+EPOCH_MS = int(EPOCH.timestamp() * 1000)
+
+WORKER_BITS = 10
+SEQUENCE_BITS = 12
+MAX_WORKER_ID = (1 << WORKER_BITS) - 1
+MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+
+
+def _now_ms():
+    return time.time_ns() // 1_000_000 - EPOCH_MS
+
+
+class OrderNumberGenerator:
+    """Thread-safe generator of time-ordered, worker-tagged order numbers"""
+
+    def __init__(self, worker_id=None):
+        if worker_id is not None and not 0 <= worker_id <= MAX_WORKER_ID:
+            raise ValueError(f'ORDER_WORKER_ID must be between 0 and {MAX_WORKER_ID}')
+        self.configured_worker_id = worker_id
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.pid = os.getpid()
+        if self.configured_worker_id is None:
+            self.worker_id = self.pid & MAX_WORKER_ID
+        else:
+            self.worker_id = self.configured_worker_id
+        self.last_ms = -1
+        self.sequence = 0
+
+    def next_id(self):
+        """Next 64-bit id"""
+        with self._lock:
+            # A forked child starts with the parent's state; derive its own
+            if os.getpid() != self.pid:
+                self._reset()
+
+            # Never step back in time, even if the wall clock does
+            now = max(_now_ms(), self.last_ms)
+            if now == self.last_ms:
+                self.sequence = (self.sequence + 1) & MAX_SEQUENCE
+                if self.sequence == 0:
+                    # Sequence exhausted for this millisecond: wait for the next
+                    while now <= self.last_ms:
+                        now = _now_ms()
+            else:
+                self.sequence = 0
+            self.last_ms = now
+
+            return (now << (WORKER_BITS + SEQUENCE_BITS)) | (self.worker_id << SEQUENCE_BITS) | self.sequence
+
+    def next_number(self):
+        return format_order_number(self.next_id())
+
+
+def format_order_number(order_id):
+    return f'{PREFIX}{order_id:016X}'
+
+
+def parse_order_number(order_number):
+    """Decode an order number into ``(created_at, worker_id, sequence)``"""
+    if not order_number.startswith(PREFIX) or len(order_number) != len(PREFIX) + 16:
+        raise ValueError(f'Not a generated order number: {order_number}')
+    order_id = int(order_number[len(PREFIX):], 16)
+    millis = order_id >> (WORKER_BITS + SEQUENCE_BITS)
+    created_at = datetime.fromtimestamp((EPOCH_MS + millis) / 1000, timezone.utc)
+    return created_at, (order_id >> SEQUENCE_BITS) & MAX_WORKER_ID, order_id & MAX_SEQUENCE
+
+
+_claimed_slot = None
+
+
+def claim_worker_id(lock_dir, first, count):
+    """Claim a worker id no other live process on this host holds.
+
+    Takes an exclusive ``flock`` on ``order-worker-<id>.lock`` for the first
+    free id in ``[first, first + count)``. The lock is held until the
+    process exits, when the kernel releases it, so ids are reused safely as
+    workers are recycled.
+    """
+    global _claimed_slot
+    os.makedirs(lock_dir, exist_ok=True)
+    for worker_id in range(first, min(first + count, MAX_WORKER_ID + 1)):
+        handle = open(os.path.join(lock_dir, f'order-worker-{worker_id}.lock'), 'w')
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            handle.close()
+            continue
+        _claimed_slot = handle
+        return worker_id
+    raise RuntimeError(f'No free order worker id in {first}..{first + count - 1}')
+
+
+def init_order_numbers(app, worker_id=None):
+    """Create the order number generator for the application"""
+    if worker_id is None:
+        worker_id = app.config.get('ORDER_WORKER_ID')
+    app.extensions['order_numbers'] = OrderNumberGenerator(None if worker_id in (None, '') else int(worker_id))
+
+
+def next_order_number():
+    return current_app.extensions['order_numbers'].next_number()
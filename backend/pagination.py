@@ -0,0 +1,113 @@
+"""
+Keyset (cursor) pagination helpers for SavorySync list endpoints
+"""
+
+import base64
+import json
+from datetime import datetime
+from flask import current_app, request
+from sqlalchemy import and_, or_, DateTime
+
+
+class InvalidCursor(ValueError):
+    """Raised when a client sends a malformed or tampered cursor"""
+
+
+def encode_cursor(values):
+    """Encode the sort key of the last row of a page as an opaque token"""
+    payload = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, columns):
+    """Decode a cursor token back into values matching the sort columns"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise InvalidCursor('Invalid cursor')
+        return [
+            datetime.fromisoformat(value) if isinstance(column.type, DateTime) else value
+            for column, value in zip(columns, values)
+        ]
+    except (ValueError, TypeError, UnicodeError):
+        raise InvalidCursor('Invalid cursor')
+
+
+def legacy_requested():
+    """True when the caller asked for the old, unpaginated list response"""
+    return request.args.get('legacy', '').lower() in ('1', 'true', 'yes')
+
+
+def page_limit():
+    """Read and clamp the ``limit`` query parameter"""
+    default = current_app.config.get('PAGE_SIZE_DEFAULT', 50)
+    maximum = current_app.config.get('PAGE_SIZE_MAX', 200)
+    limit = request.args.get('limit', default, type=int)
+    return max(1, min(limit, maximum))
+
+
+def _after(columns, values, descending):
+    """Build the keyset predicate selecting rows strictly after ``values``"""
+    clauses = []
+    for i, column in enumerate(columns):
+        equal = [columns[j] == values[j] for j in range(i)]
+        beyond = column < values[i] if descending else column > values[i]
+        clauses.append(and_(*equal, beyond))
+    return or_(*clauses)
+
+
+def paginate(query, columns, descending=False):
+    """Fetch one page of ``query`` ordered by ``columns``.
+
+    ``columns`` must form a unique sort key (e.g. ``(created_at, id)``).
+    Returns ``(rows, next_cursor)``; ``next_cursor`` is None on the last page.
+    """
+    limit = page_limit()
+    return finish_page(page_candidates(query, columns, limit, descending), columns, limit)
+
+
+def page_candidates(query, columns, limit, descending=False):
+    """The rows of the requested page plus one, to tell if there is a next page"""
+    cursor = request.args.get('cursor')
+    if cursor:
+        query = query.filter(_after(columns, decode_cursor(cursor, columns), descending))
+
+    order = [column.desc() if descending else column.asc() for column in columns]
+    return query.order_by(*order).limit(limit + 1).all()
+
+
+def finish_page(rows, columns, limit):
+    """Trim ``page_candidates`` rows to ``(rows, next_cursor)``"""
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor([getattr(last, column.key) for column in columns])
+
+    return rows, next_cursor
+
+
+def iterate_rows(query, columns, descending=False):
+    """Every row of ``query`` ordered by ``columns``, fetched in keyset batches.
+
+    Each batch of ``STREAM_BATCH_SIZE`` rows is a separate query, so eager
+    loads work per batch on any driver and no cursor stays open between
+    them. Only the current batch is held in memory.
+    """
+    batch_size = current_app.config.get('STREAM_BATCH_SIZE', 500)
+    order = [column.desc() if descending else column.asc() for column in columns]
+    values = None
+    while True:
+        batch_query = query if values is None else query.filter(_after(columns, values, descending))
+        rows = batch_query.order_by(*order).limit(batch_size).all()
+        yield from rows
+        if len(rows) < batch_size:
+            return
+        values = [getattr(rows[-1], column.key) for column in columns]
+
+
+def page_response(items, next_cursor):
+    """Standard envelope for paginated list responses"""
+    return {'items': items, 'next_cursor': next_cursor}
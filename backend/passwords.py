@@ -0,0 +1,153 @@
+"""
+Password hashing off the request thread
+
+bcrypt is deliberately slow (~250ms at cost 12), and run inline it pins a
+web worker's CPU for the whole time, so a login spike starves every other
+request. Hashing and verification run in a bounded process pool instead;
+request threads just wait on the result. When more than
+``PASSWORD_HASH_MAX_PENDING`` operations are already in flight (including
+ones whose caller gave up after ``PASSWORD_HASH_TIMEOUT``) new ones
+fail fast with ``PasswordHasherBusy`` (503) rather than queueing behind a
+backlog that will time out anyway.
+
+The cost comes from ``BCRYPT_LOG_ROUNDS``. Hashes made with a different
+cost are transparently rehashed at the next successful login.
+
+``PASSWORD_HASH_WORKERS`` sets the pool size (default: one per CPU);
+``0`` hashes inline, which is handy for scripts. ``PASSWORD_HASH_MAX_PENDING``
+defaults to four per worker.
+"""
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from flask import current_app
+
+import bcrypt
+
+# bcrypt only uses the first 72 bytes of a password
+MAX_PASSWORD_BYTES = 72
+
+
+class PasswordHasherBusy(RuntimeError):
+    """Raised when too many hash operations are already in flight"""
+
+
+def _encode(password):
+    return password.encode('utf-8')[:MAX_PASSWORD_BYTES]
+
+
+def hash_password_sync(password, rounds):
+    return bcrypt.hashpw(_encode(password), bcrypt.gensalt(rounds)).decode('utf-8')
+
+
+def check_password_sync(password_hash, password, rounds):
+    """Verify a password; returns ``(matches, new_hash)``.
+
+    ``new_hash`` is set when the password matched but was hashed with a
+    different cost than ``rounds``, so the caller can store it.
+    """
+    if not bcrypt.checkpw(_encode(password), password_hash.encode('utf-8')):
+        return False, None
+    if hash_rounds(password_hash) != rounds:
+        return True, hash_password_sync(password, rounds)
+    return True, None
+
+
+def hash_rounds(password_hash):
+    """Cost factor of a ``$2b$12$...`` hash"""
+    return int(password_hash.split('$')[2])
+
+
+class PasswordHasher:
+    """Runs bcrypt in a lazily started process pool with a cap on pending work"""
+
+    def __init__(self, rounds, workers, max_pending, timeout):
+        self.rounds = rounds
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.pending = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+        self._pool = None
+        self._pool_pid = None
+
+    def _get_pool(self):
+        # One pool per process: a forked worker must not reuse its parent's
+        if self._pool is None or self._pool_pid != os.getpid():
+            self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+            self._pool_pid = os.getpid()
+        return self._pool
+
+    def _run(self, func, *args):
+        if not self.workers:
+            return func(*args)
+
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                raise PasswordHasherBusy('Too many password operations in progress')
+            self.pending += 1
+            pool = self._get_pool()
+        future = None
+        try:
+            future = pool.submit(func, *args)
+            # The slot is held until the job ends, not just while we wait for it
+            future.add_done_callback(self._release)
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            raise PasswordHasherBusy('Password operation timed out')
+        except BrokenProcessPool:
+            # A pool process died; start a fresh pool on the next call
+            with self._lock:
+                self._pool = None
+            raise PasswordHasherBusy('Password workers restarting')
+        finally:
+            if future is None:
+                self._release()
+
+    def _release(self, future=None):
+        with self._lock:
+            self.pending -= 1
+
+    def hash(self, password):
+        return self._run(hash_password_sync, password, self.rounds)
+
+    def check(self, password_hash, password):
+        """``(matches, new_hash)``, see ``check_password_sync``"""
+        return self._run(check_password_sync, password_hash, password, self.rounds)
+
+    def stats(self):
+        return {'workers': self.workers, 'pending': self.pending, 'max_pending': self.max_pending,
+                'rejected': self.rejected, 'rounds': self.rounds}
+
+    def shutdown(self):
+        if self._pool is not None and self._pool_pid == os.getpid():
+            self._pool.shutdown()
+        self._pool = None
+
+
+def init_passwords(app):
+    """Create the password hasher for the application"""
+    workers = app.config.get('PASSWORD_HASH_WORKERS', os.cpu_count() or 1)
+    app.extensions['password_hasher'] = PasswordHasher(
+        rounds=app.config.get('BCRYPT_LOG_ROUNDS', 12),
+        workers=workers,
+        max_pending=app.config.get('PASSWORD_HASH_MAX_PENDING') or workers * 4,
+        timeout=app.config.get('PASSWORD_HASH_TIMEOUT', 10)
+    )
+
+
+def get_password_hasher():
+    return current_app.extensions['password_hasher']
+
+
+def hash_password(password):
+    return get_password_hasher().hash(password)
+
+
+def check_password(password_hash, password):
+    return get_password_hasher().check(password_hash, password)
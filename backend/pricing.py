@@ -0,0 +1,97 @@
+"""
+Server-side pricing of order lines
+
+Clients only send menu item ids and quantities. Prices, availability and
+the restaurant each item belongs to are read in one query, and the lines
+are written with one multi-row INSERT, so an order costs the same number
+of statements whether it has one line or five hundred.
+"""
+
+from models import db, MenuItem, Restaurant, OrderItem
+
+TAX_RATE = 0.08
+
+
+class InvalidOrder(ValueError):
+    """Raised when an order payload cannot be priced"""
+
+
+def _parse_lines(items):
+    """Validate the payload's ``items`` into ``(menu_item_id, quantity, customizations)``"""
+    if not isinstance(items, list) or not items:
+        raise InvalidOrder('Order must contain at least one item')
+
+    lines = []
+    for item in items:
+        if not isinstance(item, dict):
+            raise InvalidOrder('Each item must be an object')
+        menu_item_id = item.get('menu_item_id')
+        quantity = item.get('quantity')
+        if not isinstance(menu_item_id, int) or isinstance(menu_item_id, bool):
+            raise InvalidOrder('menu_item_id must be an integer')
+        if not isinstance(quantity, int) or isinstance(quantity, bool) or quantity < 1:
+            raise InvalidOrder('quantity must be a positive integer')
+        lines.append((menu_item_id, quantity, item.get('customizations', [])))
+    return lines
+
+
+def price_order(restaurant_id, items):
+    """Price an order payload against the catalog.
+
+    Returns ``(lines, totals)`` where ``lines`` are
+    ``(menu_item_id, quantity, unit_price, customizations)`` tuples and
+    ``totals`` holds ``subtotal``, ``delivery_fee``, ``tax`` and
+    ``total_amount``. Raises ``InvalidOrder`` for unknown or inactive
+    items and items from another restaurant.
+    """
+    parsed = _parse_lines(items)
+    menu_item_ids = {menu_item_id for menu_item_id, _, _ in parsed}
+
+    catalog = {
+        menu_item_id: (price, item_restaurant_id, delivery_fee)
+        for menu_item_id, price, item_restaurant_id, delivery_fee in db.session.query(
+            MenuItem.id, MenuItem.price, MenuItem.restaurant_id, Restaurant.delivery_fee
+        ).join(Restaurant, Restaurant.id == MenuItem.restaurant_id).filter(
+            MenuItem.id.in_(menu_item_ids),
+            MenuItem.active == True,
+            Restaurant.active == True
+        )
+    }
+
+    unavailable = sorted(menu_item_ids - catalog.keys())
+    if unavailable:
+        raise InvalidOrder(f'Menu items not available: {unavailable}')
+    if any(item_restaurant_id != restaurant_id for _, item_restaurant_id, _ in catalog.values()):
+        raise InvalidOrder('All items must come from the ordered restaurant')
+
+    lines = [
+        (menu_item_id, quantity, catalog[menu_item_id][0], customizations)
+        for menu_item_id, quantity, customizations in parsed
+    ]
+
+    subtotal = round(sum(unit_price * quantity for _, quantity, unit_price, _ in lines), 2)
+    delivery_fee = next(iter(catalog.values()))[2] or 0.0
+    tax = round(subtotal * TAX_RATE, 2)
+    totals = {
+        'subtotal': subtotal,
+        'delivery_fee': delivery_fee,
+        'tax': tax,
+        'total_amount': round(subtotal + delivery_fee + tax, 2)
+    }
+    return lines, totals
+
+
+def insert_order_lines(order_id, lines):
+    """Write all of an order's lines in a single multi-row INSERT.
+
+    Executed as an executemany of one cached statement, which SQLAlchemy
+    batches into multi-row VALUES without recompiling per order size.
+    """
+    db.session.execute(OrderItem.__table__.insert(), [{
+        'order_id': order_id,
+        'menu_item_id': menu_item_id,
+        'quantity': quantity,
+        'unit_price': unit_price,
+        'total_price': round(unit_price * quantity, 2),
+        'customizations': customizations
+    } for menu_item_id, quantity, unit_price, customizations in lines])
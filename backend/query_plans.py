@@ -0,0 +1,95 @@
+"""
+Check that route queries use an index
+
+``check_query_plans`` calls a list of routes through the test client,
+captures the statements each one runs and EXPLAINs them. A statement
+fails the check when it reads a whole table (SQLite ``SCAN <table>``,
+MySQL access type ``ALL`` or ``index``), so a dropped index or a new
+unindexed predicate shows up before it reaches production.
+
+``route_calls`` is the list of routes that are checked. Used by
+``python -m benchmarks.query_plans`` and ``tests/test_query_plans.py``.
+"""
+
+import re
+from sqlalchemy import event
+from models import db, User
+from identity import create_user_token
+
+# Statements that only the EXPLAIN check itself sends
+WRITE_PREFIXES = ('INSERT', 'SAVEPOINT', 'RELEASE', 'ROLLBACK', 'COMMIT', 'PRAGMA', 'EXPLAIN')
+SQLITE_SCAN = re.compile(r'^SCAN (?!CONSTANT ROW)(?!SUBQUERY)(\S+)')
+
+
+def route_calls(customer_id, customer_email, password, seller_id, restaurant_id, menu_item_id):
+    """(label, method, path, user id, json body) for each route to check"""
+    order = {'restaurant_id': restaurant_id, 'items': [{'menu_item_id': menu_item_id, 'quantity': 2}]}
+    return [
+        ('login', 'POST', '/api/auth/login', None, {'email': customer_email, 'password': password}),
+        ('restaurant list', 'GET', '/api/restaurants/?limit=10', None, None),
+        ('restaurant list, legacy', 'GET', '/api/restaurants/?legacy=1', None, None),
+        ('restaurant detail', 'GET', f'/api/restaurants/{restaurant_id}', None, None),
+        ('menu', 'GET', f'/api/restaurants/{restaurant_id}/menu?limit=10', None, None),
+        ('search', 'GET', '/api/restaurants/search?q=dish&category=thai', None, None),
+        ('search, dietary', 'GET', '/api/restaurants/search?dietary=vegan', None, None),
+        ('customer orders', 'GET', '/api/orders/?limit=20', customer_id, None),
+        ('seller orders', 'GET', '/api/orders/?limit=20', seller_id, None),
+        ('previous orders', 'GET', '/api/orders/previous', customer_id, None),
+        ('create order', 'POST', '/api/orders/', customer_id, order),
+        ('sales analytics', 'GET', '/api/analytics/sales', seller_id, None),
+        ('timeseries analytics', 'GET', '/api/analytics/timeseries?bucket=day', seller_id, None),
+        ('update menu item', 'PUT', f'/api/menu-items/{menu_item_id}', seller_id, {'price': 9.5}),
+    ]
+
+
+def capture_statements(app, calls):
+    """Call each route and return ``(label, statement, parameters)`` for what it ran"""
+    captured = []
+    current = {}
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and not statement.lstrip().upper().startswith(WRITE_PREFIXES):
+            captured.append((current['label'], statement, parameters))
+
+    client = app.test_client()
+    headers = {}
+    with app.app_context():
+        engine = db.engine
+        for user_id in {call[3] for call in calls} - {None}:
+            headers[user_id] = {'Authorization': f'Bearer {create_user_token(db.session.get(User, user_id))}'}
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        for label, method, path, user_id, body in calls:
+            current['label'] = label
+            response = client.open(path, method=method, json=body, headers=headers.get(user_id))
+            if response.status_code >= 400:
+                raise RuntimeError(f'{label}: {method} {path} returned {response.status_code}')
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+    return captured
+
+
+def full_scans(connection, statement, parameters):
+    """Tables a statement reads in full, according to the database's plan"""
+    dialect = connection.dialect.name
+    if dialect == 'sqlite':
+        plan = connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters).all()
+        return [row[-1] for row in plan if SQLITE_SCAN.match(row[-1])]
+    if dialect == 'mysql':
+        result = connection.exec_driver_sql(f'EXPLAIN {statement}', parameters)
+        columns = list(result.keys())
+        return [f"{row[columns.index('table')]} (type {row[columns.index('type')]})"
+                for row in result if row[columns.index('type')] in ('ALL', 'index')]
+    raise ValueError(f'No EXPLAIN check for {dialect}')
+
+
+def check_query_plans(app, calls):
+    """Call every route and EXPLAIN what ran; returns ``(statements checked, [(label, scans, statement)])``"""
+    captured = capture_statements(app, calls)
+    failures = []
+    with app.app_context(), db.engine.connect() as connection:
+        for label, statement, parameters in captured:
+            scans = full_scans(connection, statement, parameters)
+            if scans:
+                failures.append((label, scans, statement))
+    return len(captured), failures
@@ -0,0 +1,33 @@
+"""
+Incrementally maintained restaurant rating aggregate
+"""
+
+from sqlalchemy import update
+from models import db, Restaurant
+
+
+def record_rating(restaurant_id, rating, previous_rating=None):
+    """Fold one order rating into the restaurant's stored aggregate.
+
+    Runs as a single atomic UPDATE in the caller's transaction, so the
+    aggregate commits (or rolls back) together with the order's rating.
+    Re-rating an order passes ``previous_rating`` and only adjusts the sum.
+    """
+    delta_sum = rating - (previous_rating or 0)
+    delta_count = 0 if previous_rating else 1
+
+    new_sum = Restaurant.rating_sum + delta_sum
+    new_count = Restaurant.rating_count + delta_count
+
+    # ``rating`` is listed first: MySQL evaluates SET clauses left to right
+    # against already-updated values, other backends use the old row.
+    db.session.execute(
+        update(Restaurant)
+        .where(Restaurant.id == restaurant_id)
+        .ordered_values(
+            (Restaurant.rating, db.func.round(new_sum * 1.0 / new_count, 2)),
+            (Restaurant.rating_sum, new_sum),
+            (Restaurant.rating_count, new_count)
+        )
+        .execution_options(synchronize_session=False)
+    )
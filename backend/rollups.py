@@ -0,0 +1,138 @@
+"""
+Per-restaurant, per-day sales rollups
+
+Orders are folded into ``daily_sales`` (revenue and order count) and
+``daily_item_sales`` (per-dish quantity and line count) as they are
+created or change status, so analytics read a handful of rollup rows
+instead of scanning orders. Cancelled orders are excluded.
+"""
+
+from sqlalchemy import func
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from models import db, Order, OrderItem, ArchivedOrder, ArchivedOrderItem, DailySales, DailyItemSales, Restaurant
+
+EXCLUDED_STATUSES = ('cancelled',)
+
+
+def _upsert_increments(model, key_columns, rows):
+    """Insert rollup rows or add their increments to the existing ones.
+
+    Every column of ``rows`` not in ``key_columns`` is an increment. On
+    dialects with a native upsert all rows go through one cached statement.
+    """
+    if not rows:
+        return
+    table = model.__table__
+    increments = [column for column in rows[0] if column not in key_columns]
+    dialect = db.session.get_bind().dialect.name
+
+    if dialect == 'mysql':
+        statement = mysql.insert(table)
+        statement = statement.on_duplicate_key_update({
+            column: table.c[column] + statement.inserted[column] for column in increments
+        })
+    elif dialect in ('sqlite', 'postgresql'):
+        insert = sqlite.insert if dialect == 'sqlite' else postgresql.insert
+        statement = insert(table)
+        statement = statement.on_conflict_do_update(
+            index_elements=list(key_columns),
+            set_={column: table.c[column] + statement.excluded[column] for column in increments}
+        )
+    else:
+        for row in rows:
+            updated = db.session.query(model).filter_by(**{column: row[column] for column in key_columns}).update(
+                {getattr(model, column): getattr(model, column) + row[column] for column in increments},
+                synchronize_session=False
+            )
+            if not updated:
+                db.session.execute(table.insert().values(row))
+        return
+
+    db.session.execute(statement, rows)
+
+
+def apply_order(order, lines, sign=1):
+    """Add (``sign=1``) or remove (``sign=-1``) an order from the rollups.
+
+    ``lines`` is an iterable of ``(menu_item_id, quantity)`` pairs.
+    """
+    if order.created_at is None:
+        raise ValueError('Order must be flushed before it can be rolled up')
+    day = order.created_at.date()
+
+    _upsert_increments(DailySales, ('restaurant_id', 'day'), [{
+        'restaurant_id': order.restaurant_id,
+        'day': day,
+        'revenue': sign * order.total_amount,
+        'order_count': sign
+    }])
+
+    per_item = {}
+    for menu_item_id, quantity in lines:
+        item_quantity, item_lines = per_item.get(menu_item_id, (0, 0))
+        per_item[menu_item_id] = (item_quantity + quantity, item_lines + 1)
+
+    _upsert_increments(DailyItemSales, ('restaurant_id', 'day', 'menu_item_id'), [{
+        'restaurant_id': order.restaurant_id,
+        'day': day,
+        'menu_item_id': menu_item_id,
+        'quantity': sign * quantity,
+        'line_count': sign * line_count
+    } for menu_item_id, (quantity, line_count) in per_item.items()])
+
+
+def record_new_order(order, lines):
+    """Roll up a freshly created order in the caller's transaction"""
+    if order.status not in EXCLUDED_STATUSES:
+        apply_order(order, lines)
+
+
+def record_status_change(order, old_status):
+    """Adjust the rollups when an order moves into or out of an excluded status"""
+    was_counted = old_status not in EXCLUDED_STATUSES
+    is_counted = order.status not in EXCLUDED_STATUSES
+    if was_counted == is_counted:
+        return
+
+    lines = db.session.query(OrderItem.menu_item_id, OrderItem.quantity).filter_by(order_id=order.id).all()
+    apply_order(order, lines, sign=1 if is_counted else -1)
+
+
+def backfill_rollups(restaurant_ids=None):
+    """Rebuild rollups from the order tables, one restaurant per transaction"""
+    if restaurant_ids is None:
+        restaurant_ids = [restaurant_id for (restaurant_id,) in db.session.query(Restaurant.id)]
+
+    for restaurant_id in restaurant_ids:
+        DailySales.query.filter_by(restaurant_id=restaurant_id).delete()
+        DailyItemSales.query.filter_by(restaurant_id=restaurant_id).delete()
+
+        # Archived orders still count (see archive.py)
+        sources = ((Order, OrderItem), (ArchivedOrder, ArchivedOrderItem))
+        orders = db.union_all(*[
+            db.select(model.restaurant_id, model.created_at, model.total_amount, model.id)
+            .where(model.restaurant_id == restaurant_id, model.status.notin_(EXCLUDED_STATUSES))
+            for model, _ in sources
+        ]).subquery()
+        lines = db.union_all(*[
+            db.select(model.restaurant_id, model.created_at, line_model.menu_item_id, line_model.quantity, line_model.id)
+            .join(line_model, line_model.order_id == model.id)
+            .where(model.restaurant_id == restaurant_id, model.status.notin_(EXCLUDED_STATUSES))
+            for model, line_model in sources
+        ]).subquery()
+
+        order_day = func.date(orders.c.created_at)
+        db.session.execute(DailySales.__table__.insert().from_select(
+            ['restaurant_id', 'day', 'revenue', 'order_count'],
+            db.select(orders.c.restaurant_id, order_day, func.sum(orders.c.total_amount), func.count(orders.c.id))
+            .group_by(orders.c.restaurant_id, order_day)
+        ))
+        line_day = func.date(lines.c.created_at)
+        db.session.execute(DailyItemSales.__table__.insert().from_select(
+            ['restaurant_id', 'day', 'menu_item_id', 'quantity', 'line_count'],
+            db.select(lines.c.restaurant_id, line_day, lines.c.menu_item_id, func.sum(lines.c.quantity), func.count(lines.c.id))
+            .group_by(lines.c.restaurant_id, line_day, lines.c.menu_item_id)
+        ))
+        db.session.commit()
+
+    return len(restaurant_ids)
@@ -1,48 +1,72 @@
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from models import db, User, Restaurant, Order, OrderItem, MenuItem
-from datetime import datetime, timedelta
-from sqlalchemy import func
+from flask_jwt_extended import jwt_required
+from models import db, Order, ArchivedOrder, MenuItem, DailySales, DailyItemSales
+from identity import current_role, current_restaurant_id
+from routing import read_only
+from datetime import datetime, date, time, timedelta
+from sqlalchemy import func, union_all
+from rollups import EXCLUDED_STATUSES
+from archive import archive_covers
+from timeseries import BUCKET_UNITS, MAX_BUCKETS, bucket_count, epoch_seconds, fetch_order_arrays, bucket_series, weekday_hour_heatmap, order_value_stats
 
 analytics_bp = Blueprint('analytics', __name__)
 
+def parse_date_range(default_days=30):
+    """Read inclusive ``start``/``end`` dates from the query string"""
+    end_day = date.fromisoformat(request.args['end']) if request.args.get('end') else datetime.utcnow().date()
+    start_day = date.fromisoformat(request.args['start']) if request.args.get('start') else end_day - timedelta(days=default_days)
+    return start_day, end_day
+
 @analytics_bp.route('/sales', methods=['GET'])
 @jwt_required()
+@read_only
 def get_sales_analytics():
-    current_user_id = get_jwt_identity()
-    user = User.query.get(current_user_id)
-    
-    if user.role != 'seller':
+    if current_role() != 'seller':
         return jsonify({'error': 'Only sellers can access analytics'}), 403
     
-    restaurant = Restaurant.query.filter_by(owner_id=current_user_id).first()
-    if not restaurant:
+    restaurant_id = current_restaurant_id()
+    if restaurant_id is None:
         return jsonify({'error': 'No restaurant found'}), 404
     
-    # Get orders for the last 30 days
-    thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-    orders = Order.query.filter(
-        Order.restaurant_id == restaurant.id,
-        Order.created_at >= thirty_days_ago
-    ).all()
+    # Date range (inclusive), defaulting to the last 30 days
+    try:
+        start_day, end_day = parse_date_range()
+    except ValueError:
+        return jsonify({'error': 'Dates must be in YYYY-MM-DD format'}), 400
+    
+    if end_day < start_day:
+        return jsonify({'error': 'end must not be before start'}), 400
+    
+    # Totals from one rollup row per day
+    total_revenue, total_orders = db.session.query(
+        func.coalesce(func.sum(DailySales.revenue), 0.0),
+        func.coalesce(func.sum(DailySales.order_count), 0)
+    ).filter(
+        DailySales.restaurant_id == restaurant_id,
+        DailySales.day.between(start_day, end_day)
+    ).one()
     
-    total_revenue = sum(order.total_amount for order in orders)
-    total_orders = len(orders)
+    # Rollups accumulate float deltas; trim the drift to cents
+    total_revenue = round(total_revenue, 2)
     avg_order_value = total_revenue / total_orders if total_orders > 0 else 0
     
     # Get popular items
+    order_count = func.sum(DailyItemSales.line_count).label('order_count')
     popular_items = db.session.query(
-        MenuItem, func.count(OrderItem.id).label('order_count')
-    ).join(OrderItem).filter(
-        MenuItem.restaurant_id == restaurant.id
-    ).group_by(MenuItem.id).order_by(func.count(OrderItem.id).desc()).limit(5).all()
+        MenuItem.id, MenuItem.name, MenuItem.image, order_count
+    ).join(
+        DailyItemSales, DailyItemSales.menu_item_id == MenuItem.id
+    ).filter(
+        DailyItemSales.restaurant_id == restaurant_id,
+        DailyItemSales.day.between(start_day, end_day)
+    ).group_by(MenuItem.id, MenuItem.name, MenuItem.image).having(order_count > 0).order_by(order_count.desc()).limit(5).all()
     
     popular_items_data = []
-    for item, count in popular_items:
+    for item_id, name, image, count in popular_items:
         popular_items_data.append({
-            'id': item.id,
-            'name': item.name,
-            'image': item.image,
+            'id': item_id,
+            'name': name,
+            'image': image,
             'order_count': count
         })
     
@@ -50,5 +74,56 @@ def get_sales_analytics():
         'total_revenue': total_revenue,
         'total_orders': total_orders,
         'avg_order_value': avg_order_value,
-        'popular_items': popular_items_data
-    }), 200 
\ No newline at end of file
+        'popular_items': popular_items_data,
+        'start': start_day.isoformat(),
+        'end': end_day.isoformat()
+    }), 200
+
+@analytics_bp.route('/timeseries', methods=['GET'])
+@jwt_required()
+@read_only
+def get_timeseries_analytics():
+    if current_role() != 'seller':
+        return jsonify({'error': 'Only sellers can access analytics'}), 403
+    
+    restaurant_id = current_restaurant_id()
+    if restaurant_id is None:
+        return jsonify({'error': 'No restaurant found'}), 404
+    
+    try:
+        start_day, end_day = parse_date_range()
+    except ValueError:
+        return jsonify({'error': 'Dates must be in YYYY-MM-DD format'}), 400
+    
+    if end_day < start_day:
+        return jsonify({'error': 'end must not be before start'}), 400
+    
+    bucket = request.args.get('bucket', 'day')
+    if bucket not in BUCKET_UNITS:
+        return jsonify({'error': 'bucket must be one of: ' + ', '.join(BUCKET_UNITS)}), 400
+    
+    if bucket_count(start_day, end_day, bucket) > MAX_BUCKETS:
+        return jsonify({'error': f'Range too long: at most {MAX_BUCKETS} {bucket} buckets'}), 400
+    
+    # Two raw columns, no ORM objects
+    start_time = datetime.combine(start_day, time.min)
+    end_time = datetime.combine(end_day + timedelta(days=1), time.min)
+    order_values = [
+        db.select(epoch_seconds(model.created_at), model.total_amount).where(
+            model.restaurant_id == restaurant_id,
+            model.status.notin_(EXCLUDED_STATUSES),
+            model.created_at >= start_time,
+            model.created_at < end_time
+        )
+        for model in ((Order, ArchivedOrder) if archive_covers(start_time) else (Order,))
+    ]
+    times, values = fetch_order_arrays(union_all(*order_values) if len(order_values) > 1 else order_values[0])
+    
+    return jsonify({
+        'start': start_day.isoformat(),
+        'end': end_day.isoformat(),
+        'bucket': bucket,
+        'series': bucket_series(times, values, start_day, end_day, bucket),
+        'heatmap': weekday_hour_heatmap(times, values),
+        'order_value': order_value_stats(values)
+    }), 200
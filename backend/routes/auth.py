@@ -1,10 +1,9 @@
 from flask import Blueprint, request, jsonify
-from flask_bcrypt import Bcrypt
-from flask_jwt_extended import create_access_token
 from models import db, User
+from passwords import hash_password, check_password
+from identity import create_user_token
 
 auth_bp = Blueprint('auth', __name__)
-bcrypt = Bcrypt()
 
 @auth_bp.route('/register', methods=['POST'])
 def register():
@@ -16,7 +15,7 @@ def register():
     if User.query.filter_by(email=data['email']).first():
         return jsonify({'error': 'Email already registered'}), 409
     
-    password_hash = bcrypt.generate_password_hash(data['password']).decode('utf-8')
+    password_hash = hash_password(data['password'])
     
     user = User(
         email=data['email'],
@@ -30,7 +29,7 @@ def register():
     db.session.add(user)
     db.session.commit()
     
-    access_token = create_access_token(identity=user.id)
+    access_token = create_user_token(user)
     
     return jsonify({
         'message': 'User registered successfully',
@@ -52,10 +51,19 @@ def login():
     
     user = User.query.filter_by(email=data['email']).first()
     
-    if not user or not bcrypt.check_password_hash(user.password_hash, data['password']):
+    if not user:
         return jsonify({'error': 'Invalid email or password'}), 401
     
-    access_token = create_access_token(identity=user.id)
+    matches, new_hash = check_password(user.password_hash, data['password'])
+    if not matches:
+        return jsonify({'error': 'Invalid email or password'}), 401
+    
+    # Stored with an outdated cost: upgrade now that we have the password
+    if new_hash:
+        user.password_hash = new_hash
+        db.session.commit()
+    
+    access_token = create_user_token(user)
     
     return jsonify({
         'message': 'Login successful',
@@ -0,0 +1,64 @@
+from functools import wraps
+from flask import Blueprint, request, jsonify, current_app
+from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt_request_location
+from models import Restaurant
+from events import restaurant_channel, customer_channel, stream_channel, open_stream_slot
+from identity import owns_restaurant, create_stream_token, is_stream_token
+
+events_bp = Blueprint('events', __name__)
+
+def event_stream(channel):
+    """Server-sent events response for a channel, resuming after ``Last-Event-ID``"""
+    release = open_stream_slot()
+    if release is None:
+        return jsonify({'error': 'Too many open event streams, please retry'}), 503, {'Retry-After': '10'}
+    
+    # Browsers send the header when reconnecting; ?last_event_id= covers the first connection
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    
+    try:
+        response = current_app.response_class(stream_channel(channel, last_event_id), mimetype='text/event-stream')
+    except Exception:
+        release()
+        raise
+    # Runs when the stream ends or the client goes away
+    response.call_on_close(release)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # Disable nginx buffering
+    return response
+
+def stream_auth_required(view):
+    """EventSource cannot set headers: also accept a stream token (only) as ?jwt="""
+    @wraps(view)
+    @jwt_required(locations=['headers', 'query_string'])
+    def wrapper(*args, **kwargs):
+        if get_jwt_request_location() == 'query_string' and not is_stream_token():
+            return jsonify({'error': 'Pass a stream token from POST /api/events/token as ?jwt='}), 401
+        return view(*args, **kwargs)
+    return wrapper
+
+@events_bp.route('/token', methods=['POST'])
+@jwt_required()
+def stream_token():
+    # A leaked stream token must not be able to renew itself
+    if is_stream_token():
+        return jsonify({'error': 'Use an access token'}), 403
+    
+    return jsonify({
+        'token': create_stream_token(),
+        'expires_in': int(current_app.config['EVENTS_TOKEN_EXPIRES'].total_seconds())
+    }), 200
+
+@events_bp.route('/restaurants/<int:restaurant_id>', methods=['GET'])
+@stream_auth_required
+def restaurant_events(restaurant_id):
+    if not owns_restaurant(restaurant_id):
+        Restaurant.query.get_or_404(restaurant_id)
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    return event_stream(restaurant_channel(restaurant_id))
+
+@events_bp.route('/orders', methods=['GET'])
+@stream_auth_required
+def customer_events():
+    return event_stream(customer_channel(get_jwt_identity()))
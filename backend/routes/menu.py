@@ -1,40 +1,38 @@
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from models import db, MenuItem, Restaurant, User
+from flask_jwt_extended import jwt_required
+from models import db, MenuItem, Restaurant
+from pagination import paginate, page_response, legacy_requested
+from search import index_menu_item
+from dietary import update_dietary_index
+from cache import cached_restaurant_payload, invalidate_restaurant
+from serializers import requested_shape, menu_item_rows, serialize_menu_items
+from identity import owns_restaurant
+from routing import read_only
+from menu_import import import_menu, bulk_update_menu, is_sku_conflict, InvalidImport
+from sqlalchemy.exc import IntegrityError
 
 menu_bp = Blueprint('menu', __name__)
 
 @menu_bp.route('/restaurants/<int:restaurant_id>/menu', methods=['GET'])
+@read_only
 def get_menu_items(restaurant_id):
-    menu_items = MenuItem.query.filter_by(restaurant_id=restaurant_id, active=True).all()
-    
-    menu_items_data = []
-    for item in menu_items:
-        item_data = {
-            'id': item.id,
-            'name': item.name,
-            'description': item.description,
-            'price': item.price,
-            'category': item.category,
-            'image': item.image,
-            'dietaryTags': item.dietary_tags or [],
-            'allergens': item.allergens or [],
-            'nutritionalInfo': item.nutritional_info or {},
-            'spiceLevel': item.spice_level,
-            'isPopular': item.is_popular,
-            'preparationTime': item.preparation_time
-        }
-        menu_items_data.append(item_data)
+    return cached_restaurant_payload(restaurant_id, 'menu', lambda: build_menu_payload(restaurant_id))
+
+def build_menu_payload(restaurant_id):
+    shape = requested_shape()
+    menu_items_query = menu_item_rows(shape).filter(MenuItem.restaurant_id == restaurant_id, MenuItem.active == True)
     
-    return jsonify(menu_items_data), 200
+    if legacy_requested():
+        return serialize_menu_items(menu_items_query.order_by(MenuItem.id).all(), shape)
+    
+    menu_items, next_cursor = paginate(menu_items_query, (MenuItem.id,))
+    return page_response(serialize_menu_items(menu_items, shape), next_cursor)
 
 @menu_bp.route('/restaurants/<int:restaurant_id>/menu', methods=['POST'])
 @jwt_required()
 def create_menu_item(restaurant_id):
-    current_user_id = get_jwt_identity()
-    restaurant = Restaurant.query.get_or_404(restaurant_id)
-    
-    if restaurant.owner_id != current_user_id:
+    if not owns_restaurant(restaurant_id):
+        Restaurant.query.get_or_404(restaurant_id)
         return jsonify({'error': 'Unauthorized'}), 403
     
     data = request.get_json()
@@ -55,7 +53,11 @@ def create_menu_item(restaurant_id):
     )
     
     db.session.add(menu_item)
+    db.session.flush()
+    index_menu_item(menu_item)
+    update_dietary_index(menu_item)
     db.session.commit()
+    invalidate_restaurant(menu_item.restaurant_id)
     
     return jsonify({
         'message': 'Menu item created successfully',
@@ -67,14 +69,54 @@ def create_menu_item(restaurant_id):
         }
     }), 201
 
+@menu_bp.route('/restaurants/<int:restaurant_id>/menu/import', methods=['POST'])
+@jwt_required()
+def import_menu_items(restaurant_id):
+    if not owns_restaurant(restaurant_id):
+        Restaurant.query.get_or_404(restaurant_id)
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    # The body is read as it is parsed: don't let anything buffer it first
+    return run_bulk_write(restaurant_id, lambda: import_menu(restaurant_id, request.stream, request.mimetype))
+
+@menu_bp.route('/restaurants/<int:restaurant_id>/menu', methods=['PATCH'])
+@jwt_required()
+def bulk_update_menu_items(restaurant_id):
+    if not owns_restaurant(restaurant_id):
+        Restaurant.query.get_or_404(restaurant_id)
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    data = request.get_json(silent=True) or {}
+    return run_bulk_write(restaurant_id, lambda: bulk_update_menu(restaurant_id, data.get('items')))
+
+def run_bulk_write(restaurant_id, write):
+    """Run a bulk write and commit it, or report why nothing was written"""
+    try:
+        report, summary = write()
+        if not summary['errors']:
+            db.session.commit()
+    except InvalidImport as error:
+        db.session.rollback()
+        return jsonify({'error': str(error)}), 400
+    except IntegrityError as error:
+        db.session.rollback()
+        if not is_sku_conflict(error):
+            raise
+        # Another import created one of these SKUs first
+        return jsonify({'error': 'Menu changed during the import, please retry'}), 409
+    
+    if summary['errors']:
+        db.session.rollback()
+        return jsonify({'error': f"{summary['errors']} invalid rows, nothing was saved", **summary, 'rows': report}), 400
+    invalidate_restaurant(restaurant_id)
+    return jsonify({**summary, 'rows': report}), 200
+
 @menu_bp.route('/menu-items/<int:item_id>', methods=['PUT'])
 @jwt_required()
 def update_menu_item(item_id):
-    current_user_id = get_jwt_identity()
     menu_item = MenuItem.query.get_or_404(item_id)
-    restaurant = Restaurant.query.get(menu_item.restaurant_id)
     
-    if restaurant.owner_id != current_user_id:
+    if not owns_restaurant(menu_item.restaurant_id):
         return jsonify({'error': 'Unauthorized'}), 403
     
     data = request.get_json()
@@ -92,21 +134,25 @@ def update_menu_item(item_id):
     menu_item.is_popular = data.get('is_popular', menu_item.is_popular)
     menu_item.active = data.get('active', menu_item.active)
     
+    index_menu_item(menu_item)
+    update_dietary_index(menu_item)
     db.session.commit()
+    invalidate_restaurant(menu_item.restaurant_id)
     
     return jsonify({'message': 'Menu item updated successfully'}), 200
 
 @menu_bp.route('/menu-items/<int:item_id>', methods=['DELETE'])
 @jwt_required()
 def delete_menu_item(item_id):
-    current_user_id = get_jwt_identity()
     menu_item = MenuItem.query.get_or_404(item_id)
-    restaurant = Restaurant.query.get(menu_item.restaurant_id)
     
-    if restaurant.owner_id != current_user_id:
+    if not owns_restaurant(menu_item.restaurant_id):
         return jsonify({'error': 'Unauthorized'}), 403
     
     menu_item.active = False
+    index_menu_item(menu_item)
+    update_dietary_index(menu_item)
     db.session.commit()
+    invalidate_restaurant(menu_item.restaurant_id)
     
     return jsonify({'message': 'Menu item deleted successfully'}), 200 
\ No newline at end of file
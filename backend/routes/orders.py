@@ -1,7 +1,19 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from models import db, Order, OrderItem, User, Restaurant, MenuItem
+from models import db, Order, OrderItem, ArchivedOrder, ArchivedOrderItem, Restaurant, MenuItem
+from pagination import page_response, legacy_requested
+from archive import paginate_orders, latest_orders, iterate_orders
+from json_provider import JSONArray, stream_json_array
+from ratings import record_rating
+from rollups import record_new_order, record_status_change
+from cache import invalidate_restaurant
+from pricing import price_order, insert_order_lines, InvalidOrder
+from order_numbers import next_order_number
+from events import order_event_data, publish_order_event
+from identity import current_role, current_user_name, current_restaurant_id, owns_restaurant
 from datetime import datetime
+from functools import partial
+from sqlalchemy.orm import selectinload
 
 orders_bp = Blueprint('orders', __name__)
 
@@ -9,136 +21,173 @@ orders_bp = Blueprint('orders', __name__)
 @jwt_required()
 def create_order():
     current_user_id = get_jwt_identity()
-    data = request.get_json()
-    
-    # Generate order number
-    order_number = f"ORD-{datetime.now().strftime('%Y%m%d%H%M%S')}"
+    data = request.get_json() or {}
+    restaurant_id = data.get('restaurant_id')
     
-    # Calculate totals
-    subtotal = sum(item['price'] * item['quantity'] for item in data['items'])
-    delivery_fee = data.get('delivery_fee', 0.0)
-    tax = subtotal * 0.08  # 8% tax
-    total_amount = subtotal + delivery_fee + tax
+    # Prices come from the catalog, never from the client
+    try:
+        lines, totals = price_order(restaurant_id, data.get('items'))
+    except InvalidOrder as error:
+        return jsonify({'error': str(error)}), 400
     
     order = Order(
-        order_number=order_number,
+        order_number=next_order_number(),
         customer_id=current_user_id,
-        restaurant_id=data['restaurant_id'],
-        total_amount=total_amount,
+        restaurant_id=restaurant_id,
         delivery_address=data.get('delivery_address'),
-        delivery_fee=delivery_fee,
-        tax=tax,
-        subtotal=subtotal,
-        notes=data.get('notes')
+        notes=data.get('notes'),
+        **totals
     )
     
     db.session.add(order)
     db.session.flush()  # Get the order ID
     
-    # Create order items
-    for item_data in data['items']:
-        order_item = OrderItem(
-            order_id=order.id,
-            menu_item_id=item_data['menu_item_id'],
-            quantity=item_data['quantity'],
-            unit_price=item_data['price'],
-            total_price=item_data['price'] * item_data['quantity'],
-            customizations=item_data.get('customizations', [])
-        )
-        db.session.add(order_item)
-    
+    insert_order_lines(order.id, lines)
+    record_new_order(order, [(menu_item_id, quantity) for menu_item_id, quantity, _, _ in lines])
+    
+    # Read before commit expires the instance, saving a reload query
+    order_data = {
+        'id': order.id,
+        'order_number': order.order_number,
+        'total_amount': order.total_amount,
+        'status': order.status
+    }
+    event_data = order_event_data(order)
     db.session.commit()
+    publish_order_event('order_created', event_data)
     
     return jsonify({
         'message': 'Order created successfully',
-        'order': {
-            'id': order.id,
-            'order_number': order.order_number,
-            'total_amount': order.total_amount,
-            'status': order.status
-        }
+        'order': order_data
     }), 201
 
 @orders_bp.route('/', methods=['GET'])
 @jwt_required()
 def get_orders():
     current_user_id = get_jwt_identity()
-    user = User.query.get(current_user_id)
+    role = current_role()
     
-    if user.role == 'customer':
-        orders = Order.query.filter_by(customer_id=current_user_id).order_by(Order.created_at.desc()).all()
+    if role == 'customer':
+        orders_query, archived_query = order_queries(customer_id=current_user_id)
+        customer_name = current_user_name()
     else:  # seller
-        restaurant = Restaurant.query.filter_by(owner_id=current_user_id).first()
-        if not restaurant:
-            return jsonify([]), 200
-        orders = Order.query.filter_by(restaurant_id=restaurant.id).order_by(Order.created_at.desc()).all()
+        restaurant_id = current_restaurant_id()
+        if restaurant_id is None:
+            return jsonify([] if legacy_requested() else page_response([], None)), 200
+        orders_query, archived_query = order_queries(restaurant_id=restaurant_id)
+        customer_name = 'Customer'
     
-    orders_data = []
-    for order in orders:
-        # Get order items
-        order_items = OrderItem.query.filter_by(order_id=order.id).all()
-        items_data = []
-        for item in order_items:
-            items_data.append({
-                'id': item.menu_item.id,
-                'name': item.menu_item.name,
-                'quantity': item.quantity,
-                'unit_price': item.unit_price,
-                'total_price': item.total_price,
-                'customizations': item.customizations or []
-            })
-        
-        order_data = {
-            'id': order.id,
-            'order_number': order.order_number,
-            'customer': user.name if user.role == 'customer' else 'Customer',
-            'items': items_data,
-            'total': order.total_amount,
-            'status': order.status,
-            'time': order.created_at.strftime('%Y-%m-%d %H:%M'),
-            'delivery_address': order.delivery_address,
-            'notes': order.notes
-        }
-        orders_data.append(order_data)
+    serialize = partial(order_summary, customer_name=customer_name)
     
-    return jsonify(orders_data), 200
+    # The full history can be large: stream it instead of building a list
+    if legacy_requested():
+        return stream_json_array(JSONArray(iterate_orders(orders_query, archived_query), serialize))
+    
+    orders, next_cursor = paginate_orders(orders_query, archived_query)
+    return jsonify(page_response([serialize(order) for order in orders], next_cursor)), 200
+
+def order_queries(with_restaurant=False, **filters):
+    """Matching orders in the hot table and in the archive (see archive.py).
+    
+    Line items and their menu items are batch-loaded: one query per level
+    instead of one per order / per line.
+    """
+    queries = []
+    for model, line_model in ((Order, OrderItem), (ArchivedOrder, ArchivedOrderItem)):
+        options = [selectinload(model.order_items).selectinload(line_model.menu_item).load_only(MenuItem.id, MenuItem.name)]
+        if with_restaurant:
+            options.append(selectinload(model.restaurant).load_only(Restaurant.id, Restaurant.name))
+        queries.append(model.query.options(*options).filter_by(**filters))
+    return queries
+
+def order_summary(order, customer_name):
+    items_data = []
+    for item in order.order_items:
+        items_data.append({
+            'id': item.menu_item.id,
+            'name': item.menu_item.name,
+            'quantity': item.quantity,
+            'unit_price': item.unit_price,
+            'total_price': item.total_price,
+            'customizations': item.customizations or []
+        })
+    
+    return {
+        'id': order.id,
+        'order_number': order.order_number,
+        'customer': customer_name,
+        'items': items_data,
+        'total': order.total_amount,
+        'status': order.status,
+        'time': order.created_at.strftime('%Y-%m-%d %H:%M'),
+        'delivery_address': order.delivery_address,
+        'notes': order.notes
+    }
 
 @orders_bp.route('/<int:order_id>/status', methods=['PUT'])
 @jwt_required()
 def update_order_status(order_id):
-    current_user_id = get_jwt_identity()
-    user = User.query.get(current_user_id)
-    
-    if user.role != 'seller':
+    if current_role() != 'seller':
         return jsonify({'error': 'Only sellers can update order status'}), 403
     
     order = Order.query.get_or_404(order_id)
-    restaurant = Restaurant.query.get(order.restaurant_id)
     
-    if restaurant.owner_id != current_user_id:
+    if not owns_restaurant(order.restaurant_id):
         return jsonify({'error': 'Unauthorized'}), 403
     
     data = request.get_json()
+    old_status = order.status
     order.status = data['status']
     order.updated_at = datetime.utcnow()
     
+    record_status_change(order, old_status)
+    event_data = order_event_data(order)
     db.session.commit()
+    publish_order_event('order_status', event_data)
     
     return jsonify({'message': 'Order status updated successfully'}), 200
 
+@orders_bp.route('/<int:order_id>/rating', methods=['PUT'])
+@jwt_required()
+def rate_order(order_id):
+    current_user_id = get_jwt_identity()
+    order = Order.query.get_or_404(order_id)
+    
+    if order.customer_id != current_user_id:
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    if order.status != 'delivered':
+        return jsonify({'error': 'Only delivered orders can be rated'}), 400
+    
+    data = request.get_json()
+    rating = data.get('rating') if data else None
+    
+    if not isinstance(rating, int) or isinstance(rating, bool) or not 1 <= rating <= 5:
+        return jsonify({'error': 'Rating must be an integer from 1 to 5'}), 400
+    
+    previous_rating = order.rating
+    order.rating = rating
+    order.rated_at = datetime.utcnow()
+    
+    # Same transaction as the order update
+    record_rating(order.restaurant_id, rating, previous_rating)
+    db.session.commit()
+    invalidate_restaurant(order.restaurant_id)
+    
+    return jsonify({'message': 'Order rated successfully'}), 200
+
 @orders_bp.route('/previous', methods=['GET'])
 @jwt_required()
 def get_previous_orders():
     current_user_id = get_jwt_identity()
     
     # Get user's previous orders with items
-    orders = Order.query.filter_by(customer_id=current_user_id).order_by(Order.created_at.desc()).limit(10).all()
+    orders = latest_orders(*order_queries(with_restaurant=True, customer_id=current_user_id), 10)
     
     previous_orders = []
     for order in orders:
-        order_items = OrderItem.query.filter_by(order_id=order.id).all()
         items_data = []
-        for item in order_items:
+        for item in order.order_items:
             items_data.append({
                 'id': item.menu_item.id,
                 'name': item.menu_item.name,
@@ -1,85 +1,56 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, abort
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from models import db, Restaurant, MenuItem, User
+from pagination import paginate, page_response, legacy_requested, iterate_rows
+from json_provider import JSONArray
+from search import index_restaurant, search_restaurant_ids
+from dietary import offers_any
+from cache import cached_restaurant_payload, cached_restaurant_list, invalidate_restaurant
+from identity import current_role, create_user_token, invalidate_identity
+from routing import read_only
+from serializers import restaurant_rows, menu_item_rows, restaurant_card, requested_shape, serialize_restaurants, serialize_menu_items
 
 restaurants_bp = Blueprint('restaurants', __name__)
 
 @restaurants_bp.route('/', methods=['GET'])
+@read_only
 def get_restaurants():
-    restaurants = Restaurant.query.filter_by(active=True).all()
-    
-    restaurant_list = []
-    for restaurant in restaurants:
-        # Calculate average rating from orders
-        ratings = [order.rating for order in restaurant.orders if hasattr(order, 'rating') and order.rating]
-        avg_rating = sum(ratings) / len(ratings) if ratings else 0.0
-        
-        restaurant_data = {
-            'id': restaurant.id,
-            'name': restaurant.name,
-            'description': restaurant.description,
-            'cuisine': restaurant.cuisine,
-            'address': restaurant.address,
-            'rating': avg_rating,
-            'delivery_fee': restaurant.delivery_fee,
-            'delivery_time': restaurant.delivery_time,
-            'featured': restaurant.featured,
-            'image': '🍕',  # Default emoji
-            'category': restaurant.cuisine.lower() if restaurant.cuisine else 'general',
-            'dietaryOptions': []  # Will be populated from menu items
-        }
-        restaurant_list.append(restaurant_data)
+    return cached_restaurant_list('list', build_restaurant_list)
+
+def build_restaurant_list():
+    restaurants_query = restaurant_rows().filter(Restaurant.active == True)
+    
+    if legacy_requested():
+        return JSONArray(iterate_rows(restaurants_query, (Restaurant.id,)), restaurant_card)
     
-    return jsonify(restaurant_list), 200
+    restaurants, next_cursor = paginate(restaurants_query, (Restaurant.id,))
+    return page_response(serialize_restaurants(restaurants), next_cursor)
 
 @restaurants_bp.route('/<int:restaurant_id>', methods=['GET'])
+@read_only
 def get_restaurant(restaurant_id):
-    restaurant = Restaurant.query.get_or_404(restaurant_id)
-    
-    # Get menu items
-    menu_items = MenuItem.query.filter_by(restaurant_id=restaurant_id, active=True).all()
-    
-    menu_items_data = []
-    for item in menu_items:
-        item_data = {
-            'id': item.id,
-            'name': item.name,
-            'description': item.description,
-            'price': item.price,
-            'category': item.category,
-            'image': item.image,
-            'dietaryTags': item.dietary_tags or [],
-            'allergens': item.allergens or [],
-            'nutritionalInfo': item.nutritional_info or {},
-            'spiceLevel': item.spice_level,
-            'isPopular': item.is_popular,
-            'preparationTime': item.preparation_time
-        }
-        menu_items_data.append(item_data)
-    
-    restaurant_data = {
-        'id': restaurant.id,
-        'name': restaurant.name,
-        'description': restaurant.description,
-        'cuisine': restaurant.cuisine,
-        'address': restaurant.address,
-        'rating': restaurant.rating,
-        'delivery_fee': restaurant.delivery_fee,
-        'delivery_time': restaurant.delivery_time,
-        'featured': restaurant.featured,
-        'image': '🍕',
-        'menu_items': menu_items_data
-    }
-    
-    return jsonify(restaurant_data), 200
+    return cached_restaurant_payload(restaurant_id, 'detail', lambda: build_restaurant_payload(restaurant_id))
+
+def build_restaurant_payload(restaurant_id):
+    restaurant = restaurant_rows().filter(Restaurant.id == restaurant_id).first()
+    if restaurant is None:
+        abort(404)
+    
+    shape = requested_shape()
+    menu_items = menu_item_rows(shape).filter(
+        MenuItem.restaurant_id == restaurant_id, MenuItem.active == True
+    ).order_by(MenuItem.id).all()
+    
+    restaurant_data = restaurant_card(restaurant)
+    restaurant_data['menu_items'] = serialize_menu_items(menu_items, shape)
+    return restaurant_data
 
 @restaurants_bp.route('/', methods=['POST'])
 @jwt_required()
 def create_restaurant():
     current_user_id = get_jwt_identity()
-    user = User.query.get(current_user_id)
     
-    if user.role != 'seller':
+    if current_role() != 'seller':
         return jsonify({'error': 'Only sellers can create restaurants'}), 403
     
     data = request.get_json()
@@ -97,10 +68,16 @@ def create_restaurant():
     )
     
     db.session.add(restaurant)
+    db.session.flush()
+    index_restaurant(restaurant)
     db.session.commit()
+    invalidate_restaurant(restaurant.id)
+    invalidate_identity(current_user_id)
     
     return jsonify({
         'message': 'Restaurant created successfully',
+        # Fresh token whose claims include the new restaurant
+        'access_token': create_user_token(User.query.get(current_user_id)),
         'restaurant': {
             'id': restaurant.id,
             'name': restaurant.name,
@@ -110,53 +87,29 @@ def create_restaurant():
     }), 201
 
 @restaurants_bp.route('/search', methods=['GET'])
+@read_only
 def search_restaurants():
     query = request.args.get('q', '')
     category = request.args.get('category', '')
     dietary_preferences = request.args.getlist('dietary')
     
-    restaurants_query = Restaurant.query.filter_by(active=True)
+    restaurants_query = restaurant_rows().filter(Restaurant.active == True)
     
     if query:
-        restaurants_query = restaurants_query.filter(
-            Restaurant.name.ilike(f'%{query}%') | 
-            Restaurant.cuisine.ilike(f'%{query}%')
-        )
+        # Ranked lookup in the inverted index over restaurant and dish text
+        scores = dict(search_restaurant_ids(query))
+        restaurants_query = restaurants_query.filter(Restaurant.id.in_(scores.keys()))
     
     if category and category != 'all':
         restaurants_query = restaurants_query.filter(Restaurant.cuisine.ilike(f'%{category}%'))
     
+    # Restaurants offering at least one of the requested dietary options
+    if dietary_preferences:
+        restaurants_query = restaurants_query.filter(offers_any(dietary_preferences))
+    
     restaurants = restaurants_query.all()
     
-    # Filter by dietary preferences if specified
-    if dietary_preferences:
-        filtered_restaurants = []
-        for restaurant in restaurants:
-            menu_items = MenuItem.query.filter_by(restaurant_id=restaurant.id, active=True).all()
-            restaurant_dietary_tags = set()
-            for item in menu_items:
-                if item.dietary_tags:
-                    restaurant_dietary_tags.update(item.dietary_tags)
-            
-            if any(pref in restaurant_dietary_tags for pref in dietary_preferences):
-                filtered_restaurants.append(restaurant)
-        restaurants = filtered_restaurants
-    
-    restaurant_list = []
-    for restaurant in restaurants:
-        restaurant_data = {
-            'id': restaurant.id,
-            'name': restaurant.name,
-            'description': restaurant.description,
-            'cuisine': restaurant.cuisine,
-            'address': restaurant.address,
-            'rating': restaurant.rating,
-            'delivery_fee': restaurant.delivery_fee,
-            'delivery_time': restaurant.delivery_time,
-            'featured': restaurant.featured,
-            'image': '🍕',
-            'category': restaurant.cuisine.lower() if restaurant.cuisine else 'general'
-        }
-        restaurant_list.append(restaurant_data)
+    if query:
+        restaurants.sort(key=lambda restaurant: (-scores[restaurant.id], restaurant.id))
     
-    return jsonify(restaurant_list), 200 
\ No newline at end of file
+    return jsonify(serialize_restaurants(restaurants)), 200
\ No newline at end of file
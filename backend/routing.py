@@ -0,0 +1,80 @@
+"""
+Read/write routing between the primary database and a read replica
+
+When ``DATABASE_REPLICA_URL`` is set it becomes the ``replica`` bind.
+Views decorated with ``@read_only`` run their queries against it; all
+other requests, and any flush, use the primary.
+
+Read-your-writes: a successful write request sets a short-lived cookie,
+and while it is present the client's read-only requests stay on the
+primary, so users see their own changes even if the replica lags. The
+window is ``REPLICA_STICKY_SECONDS``.
+"""
+
+import time
+from contextlib import contextmanager
+from functools import wraps
+from flask import g, request, current_app, has_app_context
+from flask_sqlalchemy.session import Session
+
+REPLICA_BIND = 'replica'
+STICKY_COOKIE = 'db_primary_until'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class RoutingSession(Session):
+    """Session that sends queries to the replica bind while a request asks for it"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and has_app_context() and g.get('db_use_replica'):
+            replica = self._db.engines.get(REPLICA_BIND)
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def replica_configured():
+    return REPLICA_BIND in current_app.config.get('SQLALCHEMY_BINDS', {})
+
+
+def sticky_to_primary():
+    """Whether this client wrote recently enough to need the primary"""
+    try:
+        return float(request.cookies.get(STICKY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+def read_only(view):
+    """Run a view's queries on the replica, unless the client just wrote"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        g.db_use_replica = replica_configured() and not sticky_to_primary()
+        return view(*args, **kwargs)
+    return wrapper
+
+
+@contextmanager
+def use_primary():
+    """Force the primary inside a read-only view"""
+    previous = g.get('db_use_replica')
+    g.db_use_replica = False
+    try:
+        yield
+    finally:
+        g.db_use_replica = previous
+
+
+def mark_write(response):
+    """``after_request`` hook: pin the client to the primary after a successful write"""
+    if request.method not in SAFE_METHODS and response.status_code < 400 and replica_configured():
+        seconds = current_app.config.get('REPLICA_STICKY_SECONDS', 5)
+        response.set_cookie(STICKY_COOKIE, str(time.time() + seconds), max_age=seconds,
+                            httponly=True, samesite='Lax')
+    return response
+
+
+def init_routing(app):
+    """Add the read-your-writes hook when a replica is configured"""
+    if REPLICA_BIND in app.config.get('SQLALCHEMY_BINDS', {}):
+        app.after_request(mark_write)
@@ -1,10 +1,13 @@
 #!/usr/bin/env python3
 """
-Run script for SavorySync Flask Backend
+Run script for SavorySync Flask Backend (development server)
+
+For production use Gunicorn: gunicorn -c gunicorn.conf.py wsgi:app
 """
 
+import os
 from app import create_app
 
 if __name__ == '__main__':
     app = create_app()
-    app.run(debug=True, host='0.0.0.0', port=5000) 
\ No newline at end of file
+    app.run(debug=os.getenv('FLASK_DEBUG') == '1', host='0.0.0.0', port=5000) 
\ No newline at end of file
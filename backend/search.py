@@ -0,0 +1,255 @@
+"""
+Full-text search index for restaurants and menu items
+
+Text is tokenized into lowercase words and stored in an inverted index
+keyed by term, so lookups are index range scans instead of the
+leading-wildcard ``ILIKE`` table scans they replace. The last query word
+is matched as a prefix to support search-as-you-type.
+
+Two backends are available, selected with ``SEARCH_BACKEND``:
+
+- ``terms`` (default): a ``search_term`` table that works on MySQL and SQLite
+- ``fts5``: an SQLite FTS5 virtual table ranked with bm25, for local use;
+  all query words must match within a single restaurant or dish
+"""
+
+import re
+from flask import current_app
+from sqlalchemy import bindparam, case, func, text
+from models import db, SearchTerm, Restaurant, MenuItem
+
+TOKEN_PATTERN = re.compile(r'\w+', re.UNICODE)
+MAX_TERM_LENGTH = 50
+
+# Relative weight of a match in each field
+RESTAURANT_FIELDS = (('name', 3), ('cuisine', 2), ('description', 1))
+MENU_ITEM_FIELDS = (('name', 2), ('category', 1), ('description', 1))
+
+
+def tokenize(value):
+    """Split text into lowercase search terms"""
+    if not value:
+        return []
+    return [token[:MAX_TERM_LENGTH] for token in TOKEN_PATTERN.findall(value.lower())]
+
+
+def weighted_terms(entity, fields):
+    """Map each distinct term of an entity to its highest field weight"""
+    terms = {}
+    for field, weight in fields:
+        for term in tokenize(getattr(entity, field)):
+            terms[term] = max(terms.get(term, 0), weight)
+    return terms
+
+
+class TermTableIndex:
+    """Inverted index stored in the ``search_term`` table"""
+
+    def insert(self, entries):
+        rows = [
+            {
+                'term': term,
+                'entity_type': entity_type,
+                'entity_id': entity_id,
+                'restaurant_id': restaurant_id,
+                'weight': weight
+            }
+            for entity_type, entity_id, restaurant_id, terms in entries
+            for term, weight in terms.items()
+        ]
+        if rows:
+            db.session.execute(SearchTerm.__table__.insert(), rows)
+
+    def remove(self, entity_type, entity_id):
+        self.remove_many(entity_type, [entity_id])
+
+    def remove_many(self, entity_type, entity_ids):
+        db.session.execute(
+            SearchTerm.__table__.delete().where(
+                SearchTerm.entity_type == entity_type,
+                SearchTerm.entity_id.in_(entity_ids)
+            )
+        )
+
+    def clear(self):
+        db.session.execute(SearchTerm.__table__.delete())
+
+    def search(self, tokens, limit):
+        conditions = [SearchTerm.term == token for token in tokens[:-1]]
+        # Prefix match as a plain range so every backend can use the index
+        # (SQLite will not use one for a case-insensitive LIKE).
+        prefix = tokens[-1]
+        upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+        conditions.append(db.and_(SearchTerm.term >= prefix, SearchTerm.term < upper))
+
+        # A restaurant matches when every query word hits its own text or
+        # one of its dishes; rank by the summed field weights.
+        matched = [func.max(case((condition, 1), else_=0)) for condition in conditions]
+        score = func.sum(SearchTerm.weight).label('score')
+
+        rows = db.session.query(SearchTerm.restaurant_id, score).filter(
+            db.or_(*conditions)
+        ).group_by(SearchTerm.restaurant_id).having(
+            sum(matched) == len(conditions)
+        ).order_by(score.desc(), SearchTerm.restaurant_id).limit(limit).all()
+
+        return [(restaurant_id, float(score)) for restaurant_id, score in rows]
+
+
+class Fts5Index:
+    """SQLite FTS5 virtual table ranked with bm25"""
+
+    TABLE = 'search_fts'
+    ENTITY_TYPES = {'restaurant': 0, 'menu_item': 1}
+
+    def __init__(self):
+        self._created = set()
+
+    def _ensure_table(self):
+        engine = db.engine
+        if engine.url in self._created:
+            return
+        db.session.execute(text(
+            f'CREATE VIRTUAL TABLE IF NOT EXISTS {self.TABLE} USING fts5('
+            "name, body, restaurant_id UNINDEXED, tokenize = 'unicode61')"
+        ))
+        self._created.add(engine.url)
+
+    def _rowid(self, entity_type, entity_id):
+        # Encode the entity in the rowid so updates and deletes are keyed lookups
+        return entity_id * len(self.ENTITY_TYPES) + self.ENTITY_TYPES[entity_type]
+
+    def insert(self, entries):
+        self._ensure_table()
+        rows = [
+            {
+                'name': ' '.join(term for term, weight in terms.items() if weight > 1),
+                'body': ' '.join(term for term, weight in terms.items() if weight <= 1),
+                'rowid': self._rowid(entity_type, entity_id),
+                'restaurant_id': restaurant_id
+            }
+            for entity_type, entity_id, restaurant_id, terms in entries
+            if terms
+        ]
+        if rows:
+            db.session.execute(text(
+                f'INSERT INTO {self.TABLE} (rowid, name, body, restaurant_id) '
+                'VALUES (:rowid, :name, :body, :restaurant_id)'
+            ), rows)
+
+    def remove(self, entity_type, entity_id):
+        self.remove_many(entity_type, [entity_id])
+
+    def remove_many(self, entity_type, entity_ids):
+        self._ensure_table()
+        db.session.execute(
+            text(f'DELETE FROM {self.TABLE} WHERE rowid IN :rowids').bindparams(bindparam('rowids', expanding=True)),
+            {'rowids': [self._rowid(entity_type, entity_id) for entity_id in entity_ids]}
+        )
+
+    def clear(self):
+        self._ensure_table()
+        db.session.execute(text(f'DELETE FROM {self.TABLE}'))
+
+    def search(self, tokens, limit):
+        self._ensure_table()
+        match = ' '.join(f'"{token}"' for token in tokens) + '*'
+        # LIMIT -1 stops SQLite flattening the subquery: bm25() is not
+        # allowed directly inside an aggregate.
+        rows = db.session.execute(text(
+            'SELECT restaurant_id, MIN(score) AS score FROM ('
+            f'SELECT restaurant_id, bm25({self.TABLE}, 3.0, 1.0) AS score '
+            f'FROM {self.TABLE} WHERE {self.TABLE} MATCH :match LIMIT -1'
+            ') GROUP BY restaurant_id ORDER BY score, restaurant_id LIMIT :limit'
+        ), {'match': match, 'limit': -1 if limit is None else limit}).all()
+
+        # bm25 is lower-is-better; flip it so callers can sort descending
+        return [(restaurant_id, -score) for restaurant_id, score in rows]
+
+
+BACKENDS = {
+    'terms': TermTableIndex,
+    'fts5': Fts5Index
+}
+
+
+def _restaurant_entry(restaurant):
+    return ('restaurant', restaurant.id, restaurant.id, weighted_terms(restaurant, RESTAURANT_FIELDS))
+
+
+def _menu_item_entry(menu_item):
+    return ('menu_item', menu_item.id, menu_item.restaurant_id, weighted_terms(menu_item, MENU_ITEM_FIELDS))
+
+
+def get_search_index():
+    """Return the configured search backend for the current app"""
+    index = current_app.extensions.get('search_index')
+    if index is None:
+        backend = current_app.config.get('SEARCH_BACKEND', 'terms')
+        index = current_app.extensions['search_index'] = BACKENDS[backend]()
+    return index
+
+
+def index_restaurant(restaurant):
+    """Add or refresh a restaurant in the search index"""
+    index = get_search_index()
+    index.remove('restaurant', restaurant.id)
+    index.insert([_restaurant_entry(restaurant)])
+
+
+def index_menu_item(menu_item):
+    """Add, refresh or drop a menu item depending on whether it is active"""
+    index = get_search_index()
+    index.remove('menu_item', menu_item.id)
+    if menu_item.active is not False:
+        index.insert([_menu_item_entry(menu_item)])
+
+
+def index_menu_items(menu_items):
+    """Bulk ``index_menu_item``: one delete and one insert for the whole list"""
+    if not menu_items:
+        return
+    index = get_search_index()
+    index.remove_many('menu_item', [menu_item.id for menu_item in menu_items])
+    index.insert([_menu_item_entry(menu_item) for menu_item in menu_items if menu_item.active is not False])
+
+
+def search_restaurant_ids(query, limit=None):
+    """Return ``[(restaurant_id, score), ...]`` best match first.
+
+    Every match by default: callers that filter the restaurants afterwards
+    (active, cuisine, dietary) must not cut the list short first.
+    """
+    tokens = tokenize(query)
+    if not tokens:
+        return []
+    return get_search_index().search(tokens, limit)
+
+
+def _in_batches(query, column, batch_size):
+    """Walk a query in primary-key order, one bounded batch at a time"""
+    last_id = 0
+    while True:
+        batch = query.filter(column > last_id).order_by(column).limit(batch_size).all()
+        if not batch:
+            return
+        yield batch
+        last_id = batch[-1].id
+
+
+def rebuild_search_index(batch_size=1000):
+    """Re-index every restaurant and active menu item from scratch"""
+    index = get_search_index()
+    index.clear()
+
+    count = 0
+    for batch in _in_batches(Restaurant.query, Restaurant.id, batch_size):
+        index.insert([_restaurant_entry(restaurant) for restaurant in batch])
+        count += len(batch)
+    for batch in _in_batches(MenuItem.query.filter_by(active=True), MenuItem.id, batch_size):
+        index.insert([_menu_item_entry(menu_item) for menu_item in batch])
+        count += len(batch)
+        db.session.expunge_all()
+
+    db.session.commit()
+    return count
@@ -0,0 +1,351 @@
+"""
+Synthetic, production-shaped datasets for performance work
+
+``seed_dataset`` generates sellers and their restaurants, menus, customers
+and an order history, and streams them into the primary database. The
+same seed and sizes always produce the same data. The shape is meant to
+reproduce production hot spots, not just volume:
+
+- restaurant popularity, customer activity and dish popularity within a
+  menu are all heavily skewed (a few restaurants, regulars and dishes
+  take most orders);
+- order volume grows over the period, peaks at weekends and around
+  lunch and dinner; recent orders are still in flight, about 3% are
+  cancelled.
+
+Orders are generated one day at a time, in time order, so ids follow
+``created_at`` as they do in production. Each day is written with
+driver-level ``executemany`` in batches of ``batch_size`` rows and
+committed, so memory stays flat however many orders are requested. The
+day's ``daily_sales`` and ``daily_item_sales`` rollups and the dietary
+masks are written alongside; the search index is rebuilt at the end.
+
+Seeded users share the password ``SEED_PASSWORD``.
+"""
+
+import json
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import func
+
+from models import db, User, Restaurant, MenuItem, Order, OrderItem, DailySales, DailyItemSales
+from dietary import DIETARY_TAGS, TAG_BITS
+from order_numbers import EPOCH, PREFIX, MAX_WORKER_ID, SEQUENCE_BITS, WORKER_BITS
+from passwords import hash_password_sync
+from pricing import TAX_RATE
+from rollups import EXCLUDED_STATUSES
+from search import rebuild_search_index
+
+SEED_PASSWORD = 'seeded-password'
+
+# Seeded order numbers use the last worker id; keep it out of ORDER_WORKER_ID_BASE ranges
+SEED_WORKER_ID = MAX_WORKER_ID
+
+CUISINES = ('Italian', 'Chinese', 'American', 'Mexican', 'Indian', 'Japanese', 'Thai',
+            'Mediterranean', 'Korean', 'Vietnamese', 'French', 'Middle Eastern')
+CUISINE_WEIGHTS = (18, 14, 16, 12, 9, 8, 6, 5, 4, 3, 2, 3)
+NAME_WORDS = ('Golden', 'Little', 'Urban', 'Royal', 'Blue', 'Happy', 'Rustic', 'Spicy', 'Green',
+              'Lucky', 'Corner', 'Harbor', 'Sunset', 'Garden', 'Old Town', 'Red')
+NAME_PLACES = ('Kitchen', 'Bistro', 'Grill', 'House', 'Table', 'Cafe', 'Diner', 'Eatery', 'Spot', 'Bar')
+DISHES = ('Pizza', 'Pasta', 'Noodles', 'Curry', 'Burger', 'Tacos', 'Salad', 'Soup', 'Rice Bowl',
+          'Sandwich', 'Dumplings', 'Wrap', 'Ramen', 'Sushi Roll', 'Stir Fry', 'Platter')
+DISH_WORDS = ('Classic', 'Spicy', 'Garlic', 'Smoky', 'Crispy', 'Grilled', 'House', 'Lemon',
+              'Chili', 'Herb', 'Sesame', 'Truffle', 'Honey', 'Coconut', 'Ginger', 'BBQ')
+CATEGORIES = ('Mains', 'Starters', 'Sides', 'Desserts', 'Drinks', 'Specials')
+SPICE_LEVELS = ('mild', 'medium', 'hot')
+ALLERGENS = ('dairy', 'gluten', 'nuts', 'soy', 'eggs', 'shellfish')
+
+# Share of a day's orders placed in each hour (UTC): lunch and dinner peaks
+HOUR_WEIGHTS = np.array([1, 0.5, 0.3, 0.2, 0.2, 0.3, 0.8, 1.5, 2, 2.5, 3, 6,
+                         9, 7, 4, 3, 3.5, 6, 10, 11, 8, 5, 3, 1.8])
+IN_FLIGHT_STATUSES = ('pending', 'preparing', 'ready')
+CANCELLED_SHARE = 0.03
+IN_FLIGHT_SECONDS = 2 * 3600
+
+
+def _cdf(weights):
+    weights = np.asarray(weights, dtype=np.float64)
+    cdf = np.cumsum(weights)
+    return cdf / cdf[-1]
+
+
+def _zipf_weights(count, exponent, rng):
+    """Power-law weights over ``count`` entities in random order"""
+    weights = 1.0 / np.arange(1, count + 1) ** exponent
+    rng.shuffle(weights)
+    return weights
+
+
+def _timestamp(value):
+    return value.strftime('%Y-%m-%d %H:%M:%S.%f')
+
+
+def _next_id(model):
+    return (db.session.query(func.max(model.id)).scalar() or 0) + 1
+
+
+class BulkWriter:
+    """Writes rows as tuples through the DB-API ``executemany`` of one connection"""
+
+    def __init__(self, connection, batch_size):
+        self.connection = connection
+        self.batch_size = batch_size
+        self.marker = '?' if connection.dialect.paramstyle == 'qmark' else '%s'
+        self.quote = connection.dialect.identifier_preparer.quote
+        self.counts = {}
+
+    def insert(self, table, columns, rows):
+        """Insert an iterable of tuples in batches; returns the row count"""
+        sql = (f'INSERT INTO {self.quote(table.name)} ({", ".join(self.quote(column) for column in columns)}) '
+               f'VALUES ({", ".join([self.marker] * len(columns))})')
+        count = 0
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                self.connection.exec_driver_sql(sql, batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            self.connection.exec_driver_sql(sql, batch)
+            count += len(batch)
+        self.counts[table.name] = self.counts.get(table.name, 0) + count
+        return count
+
+    def commit(self):
+        self.connection.commit()
+
+
+def _seed_catalog(writer, rngs, restaurants, menu_items, password_hash, now):
+    """Sellers, restaurants and menus; returns the arrays order generation needs"""
+    rng = rngs['catalog']
+    user_id = _next_id(User)
+    restaurant_id = _next_id(Restaurant)
+    item_id = _next_id(MenuItem)
+    created_at = _timestamp(now)
+
+    writer.insert(User.__table__, ('id', 'email', 'password_hash', 'name', 'role', 'created_at'), (
+        (user_id + index, f'seller-{user_id + index}@example.com', password_hash,
+         f'Seller {user_id + index}', 'seller', created_at)
+        for index in range(restaurants)
+    ))
+
+    # Menu sizes vary around the mean; a few restaurants are inactive
+    menu_sizes = np.clip(rng.poisson(menu_items, restaurants), 5, None)
+    cuisines = np.searchsorted(_cdf(CUISINE_WEIGHTS), rng.random(restaurants))
+    delivery_fees = np.round(rng.choice([0.0, 0.99, 1.99, 2.49, 2.99, 3.99], restaurants), 2)
+    active = rng.random(restaurants) >= 0.03
+    item_starts = np.concatenate(([0], np.cumsum(menu_sizes)[:-1]))
+    total_items = int(menu_sizes.sum())
+
+    prices = np.round(rng.lognormal(np.log(13), 0.45, total_items), 2).clip(1.5, 90)
+    item_masks = np.zeros(total_items, dtype=np.int64)
+    for bit in TAG_BITS.values():
+        item_masks |= np.where(rng.random(total_items) < 0.12, bit, 0)
+    item_active = rng.random(total_items) >= 0.05
+    item_restaurants = np.repeat(np.arange(restaurants), menu_sizes)
+
+    restaurant_masks = np.zeros(restaurants, dtype=np.int64)
+    np.bitwise_or.at(restaurant_masks, item_restaurants[item_active], item_masks[item_active])
+
+    rating_counts = rng.poisson(80, restaurants)
+    rating_sums = np.round(rating_counts * rng.uniform(3.4, 4.9, restaurants)).astype(np.int64)
+
+    def restaurant_rows():
+        for index in range(restaurants):
+            words = rng.integers(0, len(NAME_WORDS)), rng.integers(0, len(NAME_PLACES))
+            count, total = int(rating_counts[index]), int(rating_sums[index])
+            yield (restaurant_id + index, f'{NAME_WORDS[words[0]]} {CUISINES[cuisines[index]]} {NAME_PLACES[words[1]]}',
+                   f'{CUISINES[cuisines[index]]} food, seeded restaurant {index}', CUISINES[cuisines[index]],
+                   f'{index + 1} Seed Street', round(total / count, 2) if count else 0.0, count, total,
+                   float(delivery_fees[index]), f'{20 + index % 4 * 5}-{35 + index % 4 * 5} min', index % 25 == 0,
+                   bool(active[index]), int(restaurant_masks[index]), user_id + index, created_at)
+
+    writer.insert(Restaurant.__table__, (
+        'id', 'name', 'description', 'cuisine', 'address', 'rating', 'rating_count', 'rating_sum', 'delivery_fee',
+        'delivery_time', 'featured', 'active', 'dietary_mask', 'owner_id', 'created_at'
+    ), restaurant_rows())
+
+    def menu_item_rows():
+        words = rng.integers(0, len(DISH_WORDS), total_items)
+        dishes = rng.integers(0, len(DISHES), total_items)
+        categories = rng.integers(0, len(CATEGORIES), total_items)
+        spice = rng.integers(0, len(SPICE_LEVELS), total_items)
+        allergens = rng.integers(0, len(ALLERGENS), total_items)
+        prep = rng.integers(5, 40, total_items)
+        calories = rng.integers(150, 1100, total_items)
+        for index in range(total_items):
+            mask = int(item_masks[index])
+            tags = [tag for tag in DIETARY_TAGS if mask & TAG_BITS[tag]]
+            yield (item_id + index, f'{DISH_WORDS[words[index]]} {DISHES[dishes[index]]}', 'Seeded dish',
+                   float(prices[index]), CATEGORIES[categories[index]], '🍽️', json.dumps(tags), mask,
+                   json.dumps([ALLERGENS[allergens[index]]]), json.dumps({'calories': int(calories[index])}),
+                   SPICE_LEVELS[spice[index]], int(prep[index]), index - int(item_starts[item_restaurants[index]]) < 3,
+                   bool(item_active[index]), restaurant_id + int(item_restaurants[index]), created_at)
+
+    writer.insert(MenuItem.__table__, (
+        'id', 'name', 'description', 'price', 'category', 'image', 'dietary_tags', 'dietary_mask', 'allergens',
+        'nutritional_info', 'spice_level', 'preparation_time', 'is_popular', 'active', 'restaurant_id', 'created_at'
+    ), menu_item_rows())
+    writer.commit()
+
+    return {
+        'restaurant_ids': restaurant_id + np.arange(restaurants),
+        'restaurant_weights': np.where(active, _zipf_weights(restaurants, 1.1, rng), 0.0),
+        'delivery_fees': delivery_fees,
+        'item_starts': item_starts,
+        'menu_sizes': menu_sizes,
+        'item_ids': item_id + np.arange(total_items),
+        'item_restaurants': item_restaurants,
+        'prices': prices
+    }
+
+
+def _seed_customers(writer, customers, password_hash, now):
+    """Customer accounts; returns their ids"""
+    user_id = _next_id(User)
+    created_at = _timestamp(now)
+    writer.insert(User.__table__, ('id', 'email', 'password_hash', 'name', 'role', 'address', 'created_at'), (
+        (user_id + index, f'customer-{user_id + index}@example.com', password_hash,
+         f'Customer {user_id + index}', 'customer', f'{index % 900 + 1} Customer Lane', created_at)
+        for index in range(customers)
+    ))
+    writer.commit()
+    return user_id + np.arange(customers)
+
+
+def _orders_per_day(rng, orders, start, days):
+    """Split ``orders`` over the days: growing volume with weekend peaks"""
+    growth = np.linspace(1.0, 2.0, days)
+    weekend = np.array([1.35 if (start + timedelta(days=day)).weekday() >= 4 else 1.0 for day in range(days)])
+    return rng.multinomial(orders, _cdf(growth * weekend) - np.concatenate(([0], _cdf(growth * weekend)[:-1])))
+
+
+def _seed_day(writer, rng, catalog, customer_ids, customer_cdf, restaurant_cdf, day_start, count,
+              order_id, line_id, end):
+    """Generate and write one day of orders, lines and rollups; returns the next ids"""
+    # When: hour from the daily curve, sorted so ids follow time
+    seconds = np.sort((np.searchsorted(_cdf(HOUR_WEIGHTS), rng.random(count)) * 3600
+                       + rng.random(count) * 3600))
+    created = [day_start + timedelta(seconds=float(value)) for value in seconds]
+    epoch_ms = ((day_start - EPOCH.replace(tzinfo=None)).total_seconds() + seconds) * 1000
+    epoch_ms = epoch_ms.astype(np.int64)
+
+    # Who: skewed restaurants and customers
+    restaurants = np.searchsorted(restaurant_cdf, rng.random(count))
+    customers = customer_ids[np.searchsorted(customer_cdf, rng.random(count))]
+
+    # What: 1-8 lines, skewed towards the top of each menu
+    line_counts = np.minimum(rng.geometric(0.45, count), 8)
+    line_orders = np.repeat(np.arange(count), line_counts)
+    line_restaurants = restaurants[line_orders]
+    ranks = (catalog['menu_sizes'][line_restaurants] * rng.random(len(line_orders)) ** 2.5).astype(np.int64)
+    line_items = catalog['item_starts'][line_restaurants] + ranks
+    quantities = 1 + (rng.random(len(line_orders)) < 0.2) + (rng.random(len(line_orders)) < 0.05)
+    unit_prices = catalog['prices'][line_items]
+    line_totals = np.round(unit_prices * quantities, 2)
+
+    subtotals = np.round(np.bincount(line_orders, weights=line_totals, minlength=count), 2)
+    taxes = np.round(subtotals * TAX_RATE, 2)
+    fees = catalog['delivery_fees'][restaurants]
+    totals = np.round(subtotals + taxes + fees, 2)
+
+    # Status: delivered, unless cancelled or still in flight at ``end``
+    statuses = np.full(count, 'delivered', dtype=object)
+    in_flight = (end - day_start).total_seconds() - seconds < IN_FLIGHT_SECONDS
+    statuses[in_flight] = rng.choice(IN_FLIGHT_STATUSES, int(in_flight.sum()))
+    statuses[rng.random(count) < CANCELLED_SHARE] = 'cancelled'
+
+    order_ids = order_id + np.arange(count)
+    worker = SEED_WORKER_ID << SEQUENCE_BITS
+    restaurant_ids = catalog['restaurant_ids'][restaurants]
+    timestamps = [_timestamp(value) for value in created]
+
+    writer.insert(Order.__table__, (
+        'id', 'order_number', 'customer_id', 'restaurant_id', 'status', 'total_amount', 'delivery_address',
+        'delivery_fee', 'tax', 'subtotal', 'created_at', 'updated_at'
+    ), zip(
+        order_ids.tolist(),
+        (f'{PREFIX}{(ms << (WORKER_BITS + SEQUENCE_BITS)) | worker | (index & 0xFFF):016X}'
+         for index, ms in zip(order_ids.tolist(), epoch_ms.tolist())),
+        customers.tolist(), restaurant_ids.tolist(), statuses.tolist(), totals.tolist(),
+        (f'{customer % 900 + 1} Customer Lane' for customer in customers.tolist()),
+        fees.tolist(), taxes.tolist(), subtotals.tolist(), timestamps, timestamps
+    ))
+    writer.insert(OrderItem.__table__, (
+        'id', 'order_id', 'menu_item_id', 'quantity', 'unit_price', 'total_price'
+    ), zip(
+        (line_id + np.arange(len(line_orders))).tolist(), order_ids[line_orders].tolist(),
+        catalog['item_ids'][line_items].tolist(), quantities.tolist(), unit_prices.tolist(), line_totals.tolist()
+    ))
+
+    # The day's rollups, exactly what rollups.backfill_rollups would compute
+    counted = ~np.isin(statuses, EXCLUDED_STATUSES)
+    day = day_start.strftime('%Y-%m-%d')
+    sales_restaurants, inverse = np.unique(restaurants[counted], return_inverse=True)
+    revenue = np.bincount(inverse, weights=totals[counted])
+    order_counts = np.bincount(inverse)
+    writer.insert(DailySales.__table__, ('restaurant_id', 'day', 'revenue', 'order_count'), zip(
+        catalog['restaurant_ids'][sales_restaurants].tolist(), [day] * len(sales_restaurants),
+        np.round(revenue, 2).tolist(), order_counts.tolist()
+    ))
+    counted_lines = counted[line_orders]
+    sold_items, inverse = np.unique(line_items[counted_lines], return_inverse=True)
+    item_quantities = np.bincount(inverse, weights=quantities[counted_lines]).astype(np.int64)
+    writer.insert(DailyItemSales.__table__, ('restaurant_id', 'day', 'menu_item_id', 'quantity', 'line_count'), zip(
+        catalog['restaurant_ids'][catalog['item_restaurants'][sold_items]].tolist(),
+        [day] * len(sold_items), catalog['item_ids'][sold_items].tolist(),
+        item_quantities.tolist(), np.bincount(inverse).tolist()
+    ))
+    writer.commit()
+    return order_id + count, line_id + len(line_orders)
+
+
+def seed_dataset(restaurants=2000, menu_items=150, customers=200000, orders=1000000, days=365,
+                 seed=42, batch_size=20000, rounds=4, report=print):
+    """Generate and load a dataset; returns row counts per table.
+
+    ``menu_items`` is the mean menu size. ``rounds`` is the bcrypt cost of
+    the shared seeded password hash. ``report`` receives progress lines.
+    """
+    # Whole days up to midnight UTC, so no order is in the future
+    end = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    start = end - timedelta(days=days)
+    if start < EPOCH.replace(tzinfo=None):
+        raise ValueError(f'Seeded orders must start after {EPOCH.date()}, use fewer days')
+
+    sequence = np.random.SeedSequence(seed)
+    rngs = dict(zip(('catalog', 'customers', 'orders'), (np.random.default_rng(child) for child in sequence.spawn(3))))
+    password_hash = hash_password_sync(SEED_PASSWORD, rounds)
+    started = time.perf_counter()
+
+    with db.engine.connect() as connection:
+        writer = BulkWriter(connection, batch_size)
+        catalog = _seed_catalog(writer, rngs, restaurants, menu_items, password_hash, start)
+        report(f'catalog: {restaurants} restaurants, {len(catalog["item_ids"])} menu items '
+               f'({time.perf_counter() - started:.1f}s)')
+
+        customer_ids = _seed_customers(writer, customers, password_hash, start)
+        customer_cdf = _cdf(_zipf_weights(customers, 0.8, rngs['customers']))
+        restaurant_cdf = _cdf(catalog['restaurant_weights'])
+        report(f'customers: {customers} ({time.perf_counter() - started:.1f}s)')
+
+        order_rng = rngs['orders']
+        order_id, line_id = _next_id(Order), _next_id(OrderItem)
+        for day, count in enumerate(_orders_per_day(order_rng, orders, start, days)):
+            if not count:
+                continue
+            day_start = start + timedelta(days=day)
+            order_id, line_id = _seed_day(writer, order_rng, catalog, customer_ids, customer_cdf, restaurant_cdf,
+                                          day_start, int(count), order_id, line_id, end)
+            if day % 30 == 0 or day == days - 1:
+                elapsed = time.perf_counter() - started
+                report(f'orders: {day_start.date()} {writer.counts["order"]} orders, '
+                       f'{writer.counts["order_item"]} lines ({elapsed:.1f}s)')
+
+    report('rebuilding search index')
+    rebuild_search_index()
+    report(f'done in {time.perf_counter() - started:.1f}s')
+    return writer.counts
@@ -0,0 +1,120 @@
+"""
+Shared serializers for catalog entities
+
+Queries select only the columns a shape needs and return plain row
+tuples, so listings never hydrate ORM objects (or the identity map) and
+card views never load the large ``nutritional_info`` / ``allergens`` JSON.
+
+Shapes:
+
+- ``card``: what list and search views render
+- ``detail``: everything the restaurant and menu pages show
+"""
+
+from flask import request
+from models import db, Restaurant, MenuItem
+from dietary import mask_to_tags
+
+SHAPES = ('card', 'detail')
+
+RESTAURANT_COLUMNS = (
+    Restaurant.id,
+    Restaurant.name,
+    Restaurant.description,
+    Restaurant.cuisine,
+    Restaurant.address,
+    Restaurant.rating,
+    Restaurant.delivery_fee,
+    Restaurant.delivery_time,
+    Restaurant.featured,
+    Restaurant.dietary_mask
+)
+
+MENU_ITEM_COLUMNS = {
+    'card': (
+        MenuItem.id,
+        MenuItem.name,
+        MenuItem.description,
+        MenuItem.price,
+        MenuItem.category,
+        MenuItem.image,
+        MenuItem.dietary_tags,
+        MenuItem.spice_level,
+        MenuItem.is_popular,
+        MenuItem.preparation_time
+    )
+}
+MENU_ITEM_COLUMNS['detail'] = MENU_ITEM_COLUMNS['card'] + (MenuItem.allergens, MenuItem.nutritional_info)
+
+
+def requested_shape(default='detail'):
+    """Shape asked for with ``?view=card|detail``"""
+    view = request.args.get('view', default)
+    return view if view in SHAPES else default
+
+
+def restaurant_rows():
+    """Query of restaurant row tuples"""
+    return db.session.query(*RESTAURANT_COLUMNS)
+
+
+def menu_item_rows(shape='detail'):
+    """Query of menu item row tuples for a shape"""
+    return db.session.query(*MENU_ITEM_COLUMNS[shape])
+
+
+# Rows are unpacked positionally, in column order; that is noticeably
+# cheaper than attribute lookups on each row at menu sizes.
+
+def restaurant_card(row):
+    id, name, description, cuisine, address, rating, delivery_fee, delivery_time, featured, dietary_mask = row
+    return {
+        'id': id,
+        'name': name,
+        'description': description,
+        'cuisine': cuisine,
+        'address': address,
+        'rating': rating,
+        'delivery_fee': delivery_fee,
+        'delivery_time': delivery_time,
+        'featured': featured,
+        'image': '🍕',  # Default emoji
+        'category': cuisine.lower() if cuisine else 'general',
+        'dietaryOptions': mask_to_tags(dietary_mask)
+    }
+
+
+def menu_item_card(row):
+    id, name, description, price, category, image, dietary_tags, spice_level, is_popular, preparation_time = row[:10]
+    return {
+        'id': id,
+        'name': name,
+        'description': description,
+        'price': price,
+        'category': category,
+        'image': image,
+        'dietaryTags': dietary_tags or [],
+        'spiceLevel': spice_level,
+        'isPopular': is_popular,
+        'preparationTime': preparation_time
+    }
+
+
+def menu_item_detail(row):
+    data = menu_item_card(row)
+    allergens, nutritional_info = row[10:]
+    data['allergens'] = allergens or []
+    data['nutritionalInfo'] = nutritional_info or {}
+    return data
+
+
+MENU_ITEM_SERIALIZERS = {'card': menu_item_card, 'detail': menu_item_detail}
+
+
+def serialize_restaurants(rows):
+    return [restaurant_card(row) for row in rows]
+
+
+def serialize_menu_items(rows, shape='detail'):
+    serialize = MENU_ITEM_SERIALIZERS[shape]
+    return [serialize(row) for row in rows]
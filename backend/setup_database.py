@@ -1,6 +1,10 @@
 import mysql.connector
 from mysql.connector import Error
+import json
 import os
+from types import SimpleNamespace
+from dietary import tags_to_mask
+from search import weighted_terms, RESTAURANT_FIELDS, MENU_ITEM_FIELDS
 
 def setup_database():
     """Setup MySQL database for SavorySync"""
@@ -34,6 +38,7 @@ def setup_database():
             
             # Insert sample data
             insert_sample_data(cursor)
+            index_sample_data(cursor)
             
             connection.commit()
             print("Database setup completed successfully!")
@@ -72,12 +77,17 @@ def create_tables(cursor):
             address TEXT,
             phone VARCHAR(20),
             rating FLOAT DEFAULT 0.0,
+            rating_count INT NOT NULL DEFAULT 0,
+            rating_sum INT NOT NULL DEFAULT 0,
             delivery_fee FLOAT DEFAULT 0.0,
             delivery_time VARCHAR(20),
             featured BOOLEAN DEFAULT FALSE,
             active BOOLEAN DEFAULT TRUE,
+            dietary_mask INT NOT NULL DEFAULT 0,
             owner_id INT NOT NULL,
             created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            INDEX ix_restaurant_owner (owner_id),
+            INDEX ix_restaurant_active (active),
             FOREIGN KEY (owner_id) REFERENCES user(id)
         )
     """)
@@ -92,14 +102,18 @@ def create_tables(cursor):
             category VARCHAR(50),
             image VARCHAR(255),
             dietary_tags JSON,
+            dietary_mask INT NOT NULL DEFAULT 0,
             allergens JSON,
             nutritional_info JSON,
             spice_level VARCHAR(20),
             preparation_time INT,
             is_popular BOOLEAN DEFAULT FALSE,
             active BOOLEAN DEFAULT TRUE,
+            sku VARCHAR(64),
             restaurant_id INT NOT NULL,
             created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            INDEX ix_menu_item_restaurant_active (restaurant_id, active),
+            UNIQUE INDEX uq_menu_item_restaurant_sku (restaurant_id, sku),
             FOREIGN KEY (restaurant_id) REFERENCES restaurant(id)
         )
     """)
@@ -118,8 +132,12 @@ def create_tables(cursor):
             tax FLOAT DEFAULT 0.0,
             subtotal FLOAT NOT NULL,
             notes TEXT,
+            rating INT,
+            rated_at DATETIME,
             created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
             updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            INDEX ix_order_restaurant_created (restaurant_id, created_at),
+            INDEX ix_order_customer_created (customer_id, created_at),
             FOREIGN KEY (customer_id) REFERENCES user(id),
             FOREIGN KEY (restaurant_id) REFERENCES restaurant(id)
         )
@@ -135,11 +153,101 @@ def create_tables(cursor):
             unit_price FLOAT NOT NULL,
             total_price FLOAT NOT NULL,
             customizations JSON,
+            INDEX ix_order_item_order (order_id),
             FOREIGN KEY (order_id) REFERENCES `order`(id),
             FOREIGN KEY (menu_item_id) REFERENCES menu_item(id)
         )
     """)
     
+    # Archived orders and their lines (see archive.py)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS order_archive (
+            id INT PRIMARY KEY,
+            order_number VARCHAR(20) NOT NULL,
+            customer_id INT NOT NULL,
+            restaurant_id INT NOT NULL,
+            status VARCHAR(20),
+            total_amount FLOAT NOT NULL,
+            delivery_address TEXT,
+            delivery_fee FLOAT,
+            tax FLOAT,
+            subtotal FLOAT NOT NULL,
+            notes TEXT,
+            rating INT,
+            rated_at DATETIME,
+            created_at DATETIME,
+            updated_at DATETIME,
+            INDEX ix_order_archive_restaurant_created (restaurant_id, created_at),
+            INDEX ix_order_archive_customer_created (customer_id, created_at),
+            INDEX ix_order_archive_created (created_at),
+            FOREIGN KEY (customer_id) REFERENCES user(id),
+            FOREIGN KEY (restaurant_id) REFERENCES restaurant(id)
+        )
+    """)
+    
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS order_item_archive (
+            id INT PRIMARY KEY,
+            order_id INT NOT NULL,
+            menu_item_id INT NOT NULL,
+            quantity INT NOT NULL,
+            unit_price FLOAT NOT NULL,
+            total_price FLOAT NOT NULL,
+            customizations JSON,
+            INDEX ix_order_item_archive_order (order_id),
+            FOREIGN KEY (order_id) REFERENCES order_archive(id),
+            FOREIGN KEY (menu_item_id) REFERENCES menu_item(id)
+        )
+    """)
+    
+    # Sales rollup tables (see rollups.py)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS daily_sales (
+            restaurant_id INT NOT NULL,
+            day DATE NOT NULL,
+            revenue FLOAT NOT NULL DEFAULT 0.0,
+            order_count INT NOT NULL DEFAULT 0,
+            PRIMARY KEY (restaurant_id, day),
+            FOREIGN KEY (restaurant_id) REFERENCES restaurant(id)
+        )
+    """)
+    
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS daily_item_sales (
+            restaurant_id INT NOT NULL,
+            day DATE NOT NULL,
+            menu_item_id INT NOT NULL,
+            quantity INT NOT NULL DEFAULT 0,
+            line_count INT NOT NULL DEFAULT 0,
+            PRIMARY KEY (restaurant_id, day, menu_item_id),
+            FOREIGN KEY (restaurant_id) REFERENCES restaurant(id),
+            FOREIGN KEY (menu_item_id) REFERENCES menu_item(id)
+        )
+    """)
+    
+    # Search index table (see search.py)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS search_term (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            term VARCHAR(50) NOT NULL,
+            entity_type VARCHAR(20) NOT NULL,
+            entity_id INT NOT NULL,
+            restaurant_id INT NOT NULL,
+            weight INT NOT NULL DEFAULT 1,
+            INDEX ix_search_term_term (term, restaurant_id, weight),
+            INDEX ix_search_term_entity (entity_type, entity_id)
+        )
+    """)
+    
+    # Applied schema migrations (see migrations.py)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migration (
+            version VARCHAR(50) PRIMARY KEY,
+            description VARCHAR(255) NOT NULL,
+            applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    
     print("All tables created successfully!")
 
 def insert_sample_data(cursor):
@@ -182,12 +290,49 @@ def insert_sample_data(cursor):
         ("French Fries", "Crispy golden fries", 4.99, "Sides", "🍟", '["vegetarian", "vegan"]', '[]', '{"calories": 220, "protein": 3, "carbs": 28, "fat": 10}', "mild", 8, False, 3)
     ]
     
+    # Each item's dietary mask goes in with its tags (see dietary.py)
+    menu_items_data = [item + (tags_to_mask(json.loads(item[5])),) for item in menu_items_data]
+    
     cursor.executemany("""
-        INSERT IGNORE INTO menu_item (name, description, price, category, image, dietary_tags, allergens, nutritional_info, spice_level, preparation_time, is_popular, restaurant_id)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        INSERT IGNORE INTO menu_item (name, description, price, category, image, dietary_tags, allergens, nutritional_info, spice_level, preparation_time, is_popular, restaurant_id, dietary_mask)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
     """, menu_items_data)
     
+    # Restaurant masks are the union over their active items
+    cursor.execute("""
+        UPDATE restaurant SET dietary_mask = (
+            SELECT COALESCE(BIT_OR(menu_item.dietary_mask), 0) FROM menu_item
+            WHERE menu_item.restaurant_id = restaurant.id AND menu_item.active
+        )
+    """)
+    
     print("Sample data inserted successfully!")
 
+def index_sample_data(cursor):
+    """Rebuild the search index over every restaurant and active menu item"""
+    
+    entries = []
+    cursor.execute("SELECT id, name, cuisine, description FROM restaurant")
+    for row in cursor.fetchall():
+        restaurant = SimpleNamespace(**dict(zip(('id', 'name', 'cuisine', 'description'), row)))
+        entries.append(('restaurant', restaurant.id, restaurant.id, weighted_terms(restaurant, RESTAURANT_FIELDS)))
+    
+    cursor.execute("SELECT id, restaurant_id, name, category, description FROM menu_item WHERE active")
+    for row in cursor.fetchall():
+        menu_item = SimpleNamespace(**dict(zip(('id', 'restaurant_id', 'name', 'category', 'description'), row)))
+        entries.append(('menu_item', menu_item.id, menu_item.restaurant_id, weighted_terms(menu_item, MENU_ITEM_FIELDS)))
+    
+    cursor.execute("DELETE FROM search_term")
+    cursor.executemany("""
+        INSERT INTO search_term (term, entity_type, entity_id, restaurant_id, weight)
+        VALUES (%s, %s, %s, %s, %s)
+    """, [
+        (term, entity_type, entity_id, restaurant_id, weight)
+        for entity_type, entity_id, restaurant_id, terms in entries
+        for term, weight in terms.items()
+    ])
+    
+    print(f"Search index built for {len(entries)} restaurants and menu items")
+
 if __name__ == "__main__":
     setup_database() 
\ No newline at end of file
@@ -0,0 +1,66 @@
+"""
+Order archiving: old finished orders move to the archive with their ids,
+listings still show them, and ids are never handed out twice.
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from archive import archive_orders
+from models import db, Order, ArchivedOrder
+
+OLD = datetime.utcnow() - timedelta(days=200)
+
+
+@pytest.fixture
+def shop(make_user, make_restaurant, seed_menu):
+    """A customer and one restaurant with a dish; returns their ids"""
+    restaurant = make_restaurant()
+    return {'customer': make_user('customer'), 'restaurant': restaurant,
+            'dish': seed_menu(restaurant, name='Pad Thai')[0]}
+
+
+@pytest.fixture
+def add_order(shop, place_order):
+    """``add_order(status, created_at)``: the customer's new order of the dish"""
+    def add(status, created_at):
+        return place_order(shop['customer'], shop['restaurant'], [shop['dish']], status=status, created_at=created_at)
+
+    return add
+
+
+def archive(app):
+    with app.app_context():
+        return archive_orders(older_than_days=100, pause=0, report=lambda message: None)
+
+
+def table_ids(app):
+    with app.app_context():
+        return ({order_id for (order_id,) in db.session.query(Order.id)},
+                {order_id for (order_id,) in db.session.query(ArchivedOrder.id)})
+
+
+def test_only_old_finished_orders_move(app, client, shop, add_order, login_headers):
+    delivered = add_order('delivered', OLD)
+    cancelled = add_order('cancelled', OLD)
+    pending = add_order('pending', OLD)
+    recent = add_order('delivered', datetime.utcnow())
+
+    assert archive(app) == 2
+    assert table_ids(app) == ({pending, recent}, {delivered, cancelled})
+
+    response = client.get('/api/orders/?legacy=1', headers=login_headers(shop['customer']))
+    orders = response.get_json()
+    assert [order['id'] for order in orders] == [recent, pending, cancelled, delivered]
+    assert all(order['items'][0]['name'] == 'Pad Thai' for order in orders)
+
+
+def test_highest_ids_stay_so_they_are_not_reused(app, add_order):
+    old_ids = [add_order('delivered', OLD) for _ in range(3)]
+
+    assert archive(app) == 2
+    assert table_ids(app) == ({old_ids[-1]}, set(old_ids[:-1]))
+
+    new_id = add_order('pending', datetime.utcnow())
+    assert new_id not in old_ids
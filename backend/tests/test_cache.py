@@ -0,0 +1,81 @@
+"""
+Payload cache: writes bump the version so the next read rebuilds, and
+conditional GETs are answered with 304 from the cached validators.
+"""
+
+import pytest
+
+from cache import MemoryCache, PayloadCache, CachedPayload, pack, unpack
+
+
+@pytest.fixture
+def cache(app):
+    """An in-memory payload cache for the test (the suite runs with ``CACHE_BACKEND=none``)"""
+    previous = app.extensions['payload_cache']
+    app.extensions['payload_cache'] = PayloadCache(MemoryCache(1024 * 1024))
+    yield app.extensions['payload_cache']
+    app.extensions['payload_cache'] = previous
+
+
+@pytest.fixture
+def menu(make_user, make_restaurant, seed_menu):
+    seller = make_user('seller')
+    restaurant = make_restaurant(seller)
+    return {'seller': seller, 'restaurant': restaurant, 'dishes': seed_menu(restaurant, 2)}
+
+
+def dish_prices(response):
+    return [item['price'] for item in response.get_json()['menu_items']]
+
+
+def test_write_bumps_the_version_so_the_next_read_rebuilds(client, cache, menu, login_headers):
+    path = f"/api/restaurants/{menu['restaurant']}"
+    assert dish_prices(client.get(path)) == [5.0, 6.0]
+    assert dish_prices(client.get(path)) == [5.0, 6.0]
+    assert (cache.misses, cache.hits) == (1, 1)
+
+    response = client.put(f"/api/menu-items/{menu['dishes'][0]}", headers=login_headers(menu['seller']), json={'price': 7.5})
+    assert response.status_code == 200
+
+    assert dish_prices(client.get(path)) == [7.5, 6.0]
+    assert (cache.misses, cache.hits) == (2, 1)
+
+
+def test_restaurant_writes_bump_the_list(client, cache, menu, login_headers):
+    assert client.get('/api/restaurants/').status_code == 200
+    client.put(f"/api/menu-items/{menu['dishes'][0]}", headers=login_headers(menu['seller']), json={'price': 7.5})
+
+    assert client.get('/api/restaurants/').status_code == 200
+    assert (cache.misses, cache.hits) == (2, 0)
+
+
+def test_matching_validators_get_304_without_a_body(client, cache, menu):
+    path = f"/api/restaurants/{menu['restaurant']}"
+    first = client.get(path)
+    etag, last_modified = first.headers['ETag'], first.headers['Last-Modified']
+
+    for headers in ({'If-None-Match': etag}, {'If-Modified-Since': last_modified}):
+        response = client.get(path, headers=headers)
+        assert response.status_code == 304
+        assert response.get_data() == b''
+        assert response.headers['ETag'] == etag
+
+    # If-None-Match wins over If-Modified-Since
+    response = client.get(path, headers={'If-None-Match': '"stale"', 'If-Modified-Since': last_modified})
+    assert response.status_code == 200
+    assert response.get_data() == first.get_data()
+
+
+def test_validators_change_after_a_write(client, cache, menu, login_headers):
+    path = f"/api/restaurants/{menu['restaurant']}"
+    etag = client.get(path).headers['ETag']
+    client.put(f"/api/menu-items/{menu['dishes'][0]}", headers=login_headers(menu['seller']), json={'price': 7.5})
+
+    response = client.get(path, headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+
+def test_entries_round_trip_through_bytes():
+    payload = CachedPayload('abc123', 1700000000, b'{"id":1}\n', {'gzip': b'\x1f\x8b compressed'})
+    assert unpack(pack(payload)) == payload
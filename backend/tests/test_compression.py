@@ -0,0 +1,45 @@
+"""
+Response compression: negotiated from Accept-Encoding, with its own ETag
+"""
+
+import gzip
+
+import pytest
+
+
+@pytest.fixture
+def restaurants(make_user, make_restaurant):
+    """Enough restaurants for the listing to pass COMPRESSION_MIN_BYTES"""
+    seller = make_user('seller')
+    for _ in range(40):
+        make_restaurant(seller, cuisine='Thai')
+
+
+def test_gzip_body_decodes_to_identity_body(client, restaurants):
+    plain = client.get('/api/restaurants/')
+    compressed = client.get('/api/restaurants/', headers={'Accept-Encoding': 'gzip'})
+
+    assert plain.content_encoding is None
+    assert compressed.content_encoding == 'gzip'
+    assert 'Accept-Encoding' in compressed.vary
+    assert gzip.decompress(compressed.get_data()) == plain.get_data()
+    assert compressed.get_etag()[0] == f'{plain.get_etag()[0]}-gzip'
+
+
+def test_uncached_responses_are_compressed_too(client, restaurants):
+    plain = client.get('/api/restaurants/search?category=thai')
+    compressed = client.get('/api/restaurants/search?category=thai', headers={'Accept-Encoding': 'gzip'})
+
+    assert compressed.content_encoding == 'gzip'
+    assert gzip.decompress(compressed.get_data()) == plain.get_data()
+
+
+def test_refused_encoding_is_not_used(client, restaurants):
+    response = client.get('/api/restaurants/', headers={'Accept-Encoding': 'gzip;q=0, identity'})
+    assert response.content_encoding is None
+
+
+def test_small_bodies_are_sent_as_they_are(client):
+    response = client.get('/api/health', headers={'Accept-Encoding': 'gzip'})
+    assert response.content_encoding is None
+    assert response.get_json()['status'] == 'healthy'
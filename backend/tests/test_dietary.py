@@ -0,0 +1,38 @@
+"""
+Dietary filtering: known tags go through the restaurant masks, other tags
+fall back to the dishes' JSON tags.
+"""
+
+import pytest
+
+from dietary import rebuild_dietary_index
+
+
+@pytest.fixture
+def kitchens(app, make_restaurant, seed_menu):
+    """Three restaurants: one vegan dish, one 'healthy' dish, one inactive 'healthy' dish"""
+    seed_menu(make_restaurant(name='Green'), dietary_tags=['vegan'])
+    seed_menu(make_restaurant(name='Fit'), dietary_tags=['healthy'])
+    seed_menu(make_restaurant(name='Closed'), dietary_tags=['healthy'], active=False)
+    with app.app_context():
+        rebuild_dietary_index()
+
+
+def search_names(client, *tags):
+    query = '&'.join(f'dietary={tag}' for tag in tags)
+    response = client.get(f'/api/restaurants/search?{query}')
+    assert response.status_code == 200
+    return sorted(restaurant['name'] for restaurant in response.get_json())
+
+
+def test_known_tag_uses_mask(client, kitchens):
+    assert search_names(client, 'vegan') == ['Green']
+
+
+def test_unknown_tag_matches_active_dishes(client, kitchens):
+    assert search_names(client, 'healthy') == ['Fit']
+
+
+def test_known_and_unknown_tags_match_either(client, kitchens):
+    assert search_names(client, 'vegan', 'healthy') == ['Fit', 'Green']
+    assert search_names(client, 'paleo') == []
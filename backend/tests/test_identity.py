@@ -0,0 +1,108 @@
+"""
+Identity claims and the identity cache: changes to a user's role or
+restaurants, and deleted users, catch up with their tokens within the TTL.
+"""
+
+import re
+import types
+
+import pytest
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event
+
+import identity
+from models import db, User, Restaurant
+
+TTL = 300
+IDENTITY_TABLES = re.compile(r'\bFROM "?(user|restaurant)"?(\s|$)')
+
+
+@pytest.fixture
+def clock(app, monkeypatch):
+    """A fake monotonic clock for the identity cache; ``clock.advance(seconds)``"""
+    now = [1000.0]
+    monkeypatch.setattr(identity, 'time', types.SimpleNamespace(monotonic=lambda: now[0]))
+    app.extensions['identity_cache'] = identity.IdentityCache(TTL, 1000)
+    return types.SimpleNamespace(advance=lambda seconds: now.__setitem__(0, now[0] + seconds))
+
+
+def bare_headers(app, user_id):
+    """A token without claims, as issued before they existed"""
+    with app.app_context():
+        return {'Authorization': f'Bearer {create_access_token(identity=user_id)}'}
+
+
+def update(app, model, row_id, **values):
+    with app.app_context():
+        db.session.query(model).filter(model.id == row_id).update(values)
+        db.session.commit()
+
+
+def test_role_change_is_seen_after_the_ttl(app, client, clock, make_user, login_headers):
+    user = make_user('customer')
+    with_claims = login_headers(user)
+    without_claims = bare_headers(app, user)
+    assert client.get('/api/analytics/sales', headers=without_claims).status_code == 403
+
+    update(app, User, user, role='seller')
+    assert client.get('/api/analytics/sales', headers=without_claims).status_code == 403
+    assert client.get('/api/analytics/sales', headers=with_claims).status_code == 403
+
+    clock.advance(TTL + 1)
+    # A seller without a restaurant, and a token claiming the old role
+    assert client.get('/api/analytics/sales', headers=without_claims).status_code == 404
+    assert client.get('/api/analytics/sales', headers=with_claims).status_code == 401
+
+
+def test_ownership_change_is_seen_after_the_ttl(app, client, clock, make_user, make_restaurant, seed_menu, login_headers):
+    previous_owner, new_owner = make_user('seller'), make_user('seller')
+    restaurant = make_restaurant(previous_owner)
+    dish = seed_menu(restaurant)[0]
+    previous_headers, new_headers = login_headers(previous_owner), login_headers(new_owner)
+
+    def set_price(headers, price):
+        return client.put(f'/api/menu-items/{dish}', headers=headers, json={'price': price}).status_code
+
+    update(app, Restaurant, restaurant, owner_id=new_owner)
+    # A cached "not an owner" is confirmed against the database: the new owner gets in at once
+    assert set_price(new_headers, 6.0) == 200
+    assert set_price(previous_headers, 7.0) == 200
+
+    clock.advance(TTL + 1)
+    assert set_price(previous_headers, 7.0) == 401
+    assert set_price(new_headers, 8.0) == 200
+
+
+def test_token_of_a_deleted_user_is_rejected(app, client, clock, make_user, login_headers):
+    user = make_user('customer')
+    headers = login_headers(user)
+    assert client.get('/api/orders/', headers=headers).status_code == 200
+
+    with app.app_context():
+        db.session.delete(db.session.get(User, user))
+        db.session.commit()
+    clock.advance(TTL + 1)
+
+    response = client.get('/api/orders/', headers=headers)
+    assert response.status_code == 401
+    assert 'error' in response.get_json()
+
+
+def test_claims_answer_without_user_or_restaurant_queries(app, client, make_user, make_restaurant, login_headers):
+    seller = make_user('seller')
+    make_restaurant(seller)
+    headers = login_headers(seller)
+    with app.app_context():
+        engine = db.engine
+    lookups = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if IDENTITY_TABLES.search(statement):
+            lookups.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        assert client.get('/api/analytics/sales', headers=headers).status_code == 200
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+    assert lookups == []
@@ -0,0 +1,50 @@
+"""
+JSON encoding: the orjson provider writes what Flask's would, and arrays
+are streamed in chunks that join up to the same document.
+"""
+
+import json
+from datetime import datetime
+from decimal import Decimal
+
+from flask.json.provider import DefaultJSONProvider
+
+import json_provider
+from json_provider import JSONArray, OrjsonProvider, encode_json_array, iter_json_array
+
+PAYLOAD = {
+    'total': Decimal('12.50'),
+    'created_at': datetime(2024, 3, 1, 18, 30, 5),
+    'items': [{'name': 'Pad Thai', 'price': 11.5, 'tags': ['vegan'], 'spice': None}],
+    'active': True,
+    'count': 3
+}
+
+
+def test_orjson_matches_default_provider(app):
+    compact = {'separators': (',', ':')}
+    assert OrjsonProvider(app).dumps(PAYLOAD) == DefaultJSONProvider(app).dumps(PAYLOAD, **compact)
+
+
+def test_streamed_array_joins_to_one_document(app, monkeypatch):
+    monkeypatch.setattr(json_provider, 'STREAM_CHUNK_BYTES', 100)
+    array = JSONArray(range(40), lambda number: {'number': number, 'name': f'Dish {number}'})
+    with app.test_request_context():
+        chunks = list(iter_json_array(array))
+        body = encode_json_array(array)
+
+    assert len(chunks) > 1
+    assert b''.join(chunks) == body
+    assert json.loads(body) == [{'number': number, 'name': f'Dish {number}'} for number in range(40)]
+
+
+def test_legacy_listing_streams_every_row(client, make_user, make_restaurant):
+    seller = make_user('seller')
+    for index in range(120):
+        make_restaurant(seller, name=f'Kitchen {index}')
+
+    response = client.get('/api/restaurants/?legacy=1')
+    assert response.status_code == 200
+    assert [restaurant['name'] for restaurant in response.get_json()] == [f'Kitchen {index}' for index in range(120)]
+    paged = client.get('/api/restaurants/').get_json()
+    assert paged['items'] == response.get_json()[:len(paged['items'])]
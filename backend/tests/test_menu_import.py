@@ -0,0 +1,96 @@
+"""
+Bulk menu import and updates: upsert by SKU, all or nothing
+"""
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from menu_import import is_sku_conflict
+from models import db, MenuItem
+
+
+@pytest.fixture
+def kitchen(make_user, make_restaurant):
+    """A seller and their restaurant, plus a customer; returns their ids"""
+    seller = make_user('seller')
+    return {'seller': seller, 'customer': make_user('customer'), 'restaurant': make_restaurant(seller)}
+
+
+def menu(app, restaurant_id):
+    with app.app_context():
+        return {item.sku: (item.name, item.price, item.active)
+                for item in MenuItem.query.filter_by(restaurant_id=restaurant_id)}
+
+
+def test_json_import_creates_then_updates_by_sku(app, client, kitchen, login_headers):
+    headers = login_headers(kitchen['seller'])
+    path = f"/api/restaurants/{kitchen['restaurant']}/menu/import"
+
+    response = client.post(path, headers=headers, json=[
+        {'sku': 'PT-1', 'name': 'Pad Thai', 'price': 11.5, 'dietary_tags': ['vegan']},
+        {'sku': 'GC-1', 'name': 'Green Curry', 'price': 12}
+    ])
+    assert response.status_code == 200
+    assert response.get_json()['created'] == 2
+
+    response = client.post(path, headers=headers, json=[{'sku': 'PT-1', 'price': 10}])
+    assert response.status_code == 200
+    assert [row['status'] for row in response.get_json()['rows']] == ['updated']
+    assert menu(app, kitchen['restaurant']) == {'PT-1': ('Pad Thai', 10.0, True), 'GC-1': ('Green Curry', 12.0, True)}
+
+
+def test_csv_import(app, client, kitchen, login_headers):
+    body = 'sku,name,price,dietary_tags,active\nPT-1,Pad Thai,11.5,vegan|gluten-free,true\nGC-1,Green Curry,12,,false\n'
+    response = client.post(f"/api/restaurants/{kitchen['restaurant']}/menu/import",
+                           headers=login_headers(kitchen['seller']), data=body, content_type='text/csv')
+    assert response.status_code == 200
+    assert menu(app, kitchen['restaurant']) == {'PT-1': ('Pad Thai', 11.5, True), 'GC-1': ('Green Curry', 12.0, False)}
+
+
+@pytest.mark.parametrize('price', ['nan', 'inf', '-1', 'cheap'])
+def test_one_bad_row_rejects_the_import(app, client, kitchen, login_headers, price):
+    body = f'sku,name,price\nPT-1,Pad Thai,11.5\nGC-1,Green Curry,{price}\n'
+    response = client.post(f"/api/restaurants/{kitchen['restaurant']}/menu/import",
+                           headers=login_headers(kitchen['seller']), data=body, content_type='text/csv')
+    assert response.status_code == 400
+    assert [row['status'] for row in response.get_json()['rows']] == ['skipped', 'error']
+    assert menu(app, kitchen['restaurant']) == {}
+
+
+def test_bulk_update_by_sku(app, client, kitchen, login_headers):
+    headers = login_headers(kitchen['seller'])
+    client.post(f"/api/restaurants/{kitchen['restaurant']}/menu/import", headers=headers, json=[
+        {'sku': 'PT-1', 'name': 'Pad Thai', 'price': 11.5},
+        {'sku': 'GC-1', 'name': 'Green Curry', 'price': 12}
+    ])
+
+    response = client.patch(f"/api/restaurants/{kitchen['restaurant']}/menu", headers=headers, json={'items': [
+        {'sku': 'PT-1', 'price': 9.5},
+        {'sku': 'GC-1', 'active': False}
+    ]})
+    assert response.status_code == 200
+    assert menu(app, kitchen['restaurant']) == {'PT-1': ('Pad Thai', 9.5, True), 'GC-1': ('Green Curry', 12.0, False)}
+
+
+def test_only_the_owner_can_import(client, kitchen, login_headers):
+    response = client.post(f"/api/restaurants/{kitchen['restaurant']}/menu/import",
+                           headers=login_headers(kitchen['customer']), json=[{'sku': 'PT-1', 'name': 'Pad Thai', 'price': 1}])
+    assert response.status_code == 403
+
+
+def test_only_sku_clashes_count_as_conflicts(app, kitchen):
+    with app.app_context():
+        db.session.add(MenuItem(restaurant_id=kitchen['restaurant'], name='Pad Thai', price=11.5, sku='PT-1'))
+        db.session.commit()
+
+        db.session.add(MenuItem(restaurant_id=kitchen['restaurant'], name='Pad Thai again', price=11.5, sku='PT-1'))
+        with pytest.raises(IntegrityError) as clash:
+            db.session.flush()
+        db.session.rollback()
+        assert is_sku_conflict(clash.value)
+
+        db.session.add(MenuItem(restaurant_id=kitchen['restaurant'], name=None, price=11.5, sku='GC-1'))
+        with pytest.raises(IntegrityError) as missing_name:
+            db.session.flush()
+        db.session.rollback()
+        assert not is_sku_conflict(missing_name.value)
@@ -0,0 +1,71 @@
+"""
+Request metrics: failed statements, streamed responses, forked workers and who may read them
+"""
+
+import os
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from models import db
+
+
+def endpoint_queries(app, endpoint):
+    """(requests, statements) recorded so far for GET ``endpoint``"""
+    registry = app.extensions['metrics']
+    labels = (('worker', registry.worker), ('method', 'GET'), ('endpoint', endpoint))
+    _, count, total = registry.queries.values.get(labels, (None, 0, 0))
+    return count, total
+
+
+def test_failed_statement_leaves_no_start_time(app):
+    with app.app_context():
+        with db.engine.connect() as connection:
+            with pytest.raises(OperationalError):
+                connection.exec_driver_sql('SELECT * FROM no_such_table')
+            assert not connection.info.get('query_started')
+
+
+def test_streamed_response_counts_its_statements(app, client, make_user, login_headers, count_statements):
+    headers = login_headers(make_user('customer'))
+    requests_before, statements_before = endpoint_queries(app, '/api/orders/')
+
+    def call():
+        response = client.get('/api/orders/?legacy=1', headers=headers)
+        assert response.is_streamed
+        response.get_data()
+        response.close()
+
+    statements = count_statements(call)
+
+    requests_after, statements_after = endpoint_queries(app, '/api/orders/')
+    assert requests_after == requests_before + 1
+    assert statements_after - statements_before == statements > 0
+
+
+@pytest.mark.parametrize('path', ['/api/metrics', '/api/cache/stats'])
+def test_operational_endpoints_only_answer_allowed_networks(client, path):
+    assert client.get(path).status_code == 200
+    assert client.get(path, environ_base={'REMOTE_ADDR': '203.0.113.9'}).status_code == 403
+
+
+def test_forked_worker_labels_samples_with_its_own_pid(app, client):
+    # As under Gunicorn's preload_app: requests served before the fork, then a worker process
+    assert client.get('/api/health').status_code == 200
+    parent = str(os.getpid())
+    reader, writer = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        try:
+            client.get('/api/health')
+            os.write(writer, client.get('/api/metrics').get_data())
+        finally:
+            os._exit(0)
+    os.close(writer)
+    with os.fdopen(reader, 'rb') as pipe:
+        scraped = pipe.read().decode('utf-8')
+    os.waitpid(pid, 0)
+
+    assert f'worker="{pid}"' in scraped
+    assert f'worker="{parent}"' not in scraped
+    assert f'savory_http_requests_total{{worker="{pid}",method="GET",endpoint="/api/health",status="200"}} 1' in scraped
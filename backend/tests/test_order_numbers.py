@@ -0,0 +1,54 @@
+"""
+Order numbers stay unique and ordered per worker under concurrent creation
+from several processes sharing one database.
+"""
+
+import multiprocessing
+import time
+
+from app import create_app
+from identity import create_user_token
+from models import db, User, Order
+from order_numbers import init_order_numbers, parse_order_number
+
+PROCESSES = 4
+ORDERS_PER_PROCESS = 40
+
+
+def create_orders(worker_id, customer_id, restaurant_id, menu_item_id, count, start_at):
+    """Child process: its own app on the test database (the environment is inherited); returns the status codes"""
+    app = create_app()
+    app.config.update(TESTING=True)
+    init_order_numbers(app, worker_id)
+    with app.app_context():
+        headers = {'Authorization': f'Bearer {create_user_token(db.session.get(User, customer_id))}'}
+    client = app.test_client()
+    payload = {'restaurant_id': restaurant_id, 'items': [{'menu_item_id': menu_item_id, 'quantity': 1}]}
+
+    # Start together so the processes really overlap
+    time.sleep(max(0.0, start_at - time.time()))
+    return [client.post('/api/orders/', json=payload, headers=headers).status_code for _ in range(count)]
+
+
+def test_concurrent_order_numbers_are_unique_and_ordered(app, make_user, make_restaurant, seed_menu):
+    customer = make_user('customer')
+    restaurant = make_restaurant()
+    dish = seed_menu(restaurant)[0]
+
+    start_at = time.time() + 3
+    with multiprocessing.get_context('spawn').Pool(PROCESSES) as pool:
+        results = pool.starmap(create_orders, [
+            (worker_id, customer, restaurant, dish, ORDERS_PER_PROCESS, start_at) for worker_id in range(PROCESSES)
+        ])
+
+    assert [status for codes in results for status in codes] == [201] * PROCESSES * ORDERS_PER_PROCESS
+    with app.app_context():
+        numbers = [number for (number,) in db.session.query(Order.order_number).order_by(Order.id)]
+    assert len(numbers) == len(set(numbers)) == PROCESSES * ORDERS_PER_PROCESS
+
+    # Within one worker, insertion (id) order must match number order
+    by_worker = {}
+    for number in numbers:
+        by_worker.setdefault(parse_order_number(number)[1], []).append(number)
+    assert sorted(by_worker) == list(range(PROCESSES))
+    assert all(worker_numbers == sorted(worker_numbers) for worker_numbers in by_worker.values())
@@ -0,0 +1,95 @@
+"""
+Order listings load lines, menu items and restaurants in batches: the
+number of SQL statements must not grow with the number of orders.
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from archive import archive_orders
+from models import db, Order
+
+LINES_PER_ORDER = 3
+
+LISTINGS = [
+    ('customer page', '/api/orders/', 'customer'),
+    ('seller page', '/api/orders/', 'seller'),
+    ('customer legacy stream', '/api/orders/?legacy=1', 'customer'),
+    ('seller legacy stream', '/api/orders/?legacy=1', 'seller'),
+    ('previous orders', '/api/orders/previous', 'customer'),
+]
+
+
+@pytest.fixture
+def catalog(make_user, make_restaurant, seed_menu):
+    """A customer, and three restaurants with a menu each; the first one belongs to ``seller``"""
+    sellers = [make_user('seller') for _ in range(3)]
+    restaurants = [make_restaurant(seller) for seller in sellers]
+    return {
+        'customer': make_user('customer'),
+        'seller': sellers[0],
+        'restaurants': restaurants,
+        'menus': {restaurant: seed_menu(restaurant, 20) for restaurant in restaurants},
+        'orders': 0
+    }
+
+
+def add_orders(catalog, place_order, count):
+    """``count`` delivered orders by the customer, spread over the restaurants, each on different dishes"""
+    created = datetime.utcnow()
+    for number in range(catalog['orders'] + 1, catalog['orders'] + count + 1):
+        restaurant_id = catalog['restaurants'][(number - 1) % len(catalog['restaurants'])]
+        menu = catalog['menus'][restaurant_id]
+        place_order(catalog['customer'], restaurant_id,
+                    [menu[(number * LINES_PER_ORDER + line) % len(menu)] for line in range(LINES_PER_ORDER)],
+                    created_at=created + timedelta(minutes=number))
+    catalog['orders'] += count
+
+
+def listing_statements(client, count_statements, path, headers):
+    def call():
+        response = client.get(path, headers=headers)
+        assert response.status_code == 200
+        response.get_data()  # Streamed listings run their queries while being read
+
+    return count_statements(call)
+
+
+@pytest.mark.parametrize('label, path, role', LISTINGS, ids=[listing[0] for listing in LISTINGS])
+def test_listing_statements_do_not_grow_with_orders(client, catalog, place_order, login_headers, count_statements, label, path, role):
+    headers = login_headers(catalog[role])
+
+    add_orders(catalog, place_order, 1)
+    with_one = listing_statements(client, count_statements, path, headers)
+    add_orders(catalog, place_order, 29)
+    with_many = listing_statements(client, count_statements, path, headers)
+
+    assert with_many == with_one
+
+
+def archive_all_but_newest(app):
+    """Backdate every order except the newest and archive them; the newest stays hot"""
+    with app.app_context():
+        newest = db.session.query(db.func.max(Order.id)).scalar()
+        db.session.query(Order).filter(Order.id < newest).update(
+            {Order.created_at: datetime.utcnow() - timedelta(days=200)}, synchronize_session=False
+        )
+        db.session.commit()
+        archive_orders(older_than_days=100, pause=0, report=lambda message: None)
+
+
+@pytest.mark.parametrize('label, path, role', LISTINGS, ids=[listing[0] for listing in LISTINGS])
+def test_listing_statements_do_not_grow_with_archived_orders(app, client, catalog, place_order, login_headers, count_statements, label, path, role):
+    headers = login_headers(catalog[role])
+
+    add_orders(catalog, place_order, 2)
+    archive_all_but_newest(app)
+    with_one = listing_statements(client, count_statements, path, headers)
+    add_orders(catalog, place_order, 30)
+    archive_all_but_newest(app)
+    with_many = listing_statements(client, count_statements, path, headers)
+
+    with app.app_context():
+        assert db.session.query(Order).count() == 1
+    assert with_many == with_one
@@ -0,0 +1,28 @@
+"""
+Password hasher back-pressure: a timed-out job keeps its slot until it ends
+"""
+
+import time
+
+import pytest
+
+from passwords import PasswordHasher, PasswordHasherBusy
+
+
+def test_timed_out_hash_holds_its_slot_until_it_finishes():
+    hasher = PasswordHasher(rounds=14, workers=1, max_pending=1, timeout=0.05)
+    try:
+        with pytest.raises(PasswordHasherBusy, match='timed out'):
+            hasher.hash('correct horse battery staple')
+        assert hasher.pending == 1
+
+        with pytest.raises(PasswordHasherBusy, match='Too many'):
+            hasher.hash('another password')
+        assert hasher.rejected == 1
+
+        deadline = time.monotonic() + 60
+        while hasher.pending and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert hasher.pending == 0
+    finally:
+        hasher.shutdown()
@@ -0,0 +1,45 @@
+"""
+Every route's statements use an index: none of them reads a whole table
+(see ``query_plans.py`` for the routes that are checked).
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from dietary import rebuild_dietary_index
+from models import db, User
+from passwords import hash_password_sync
+from query_plans import route_calls, check_query_plans
+from rollups import backfill_rollups
+from search import rebuild_search_index
+
+PASSWORD = 'query plans'
+
+
+@pytest.fixture
+def plan_calls(app, make_user, make_restaurant, seed_menu, place_order):
+    """Sellers with a restaurant each (every fifth inactive), menus, a customer's order history; the routes to call"""
+    customer = make_user('customer', password_hash=hash_password_sync(PASSWORD, app.config['BCRYPT_LOG_ROUNDS']))
+    sellers = [make_user('seller') for _ in range(10)]
+    restaurants = [make_restaurant(seller, cuisine=('Italian', 'Thai', 'Mexican')[index % 3], active=index % 5 != 0)
+                   for index, seller in enumerate(sellers)]
+    menus = {restaurant: seed_menu(restaurant, 4, category='Main') + seed_menu(restaurant, 2, dietary_tags=['vegan'])
+             for restaurant in restaurants}
+    started = datetime.utcnow() - timedelta(days=30)
+    for index in range(60):
+        restaurant = restaurants[index % len(restaurants)]
+        place_order(customer, restaurant, menus[restaurant][:2], created_at=started + timedelta(hours=12 * index))
+    with app.app_context():
+        rebuild_search_index()
+        rebuild_dietary_index()
+        backfill_rollups()
+        email = db.session.get(User, customer).email
+    return route_calls(customer, email, PASSWORD, sellers[1], restaurants[1], menus[restaurants[1]][0])
+
+
+def test_route_queries_use_indexes(app, plan_calls):
+    checked, failures = check_query_plans(app, plan_calls)
+
+    assert checked > 0
+    assert [(label, scans, ' '.join(statement.split())) for label, scans, statement in failures] == []
@@ -0,0 +1,92 @@
+"""
+Order ratings: the restaurant's stored aggregate follows every rating,
+and only the customer of a delivered order can rate it.
+"""
+
+import pytest
+from sqlalchemy import event
+
+from models import db, Restaurant, Order
+
+
+@pytest.fixture
+def delivered(make_user, make_restaurant, seed_menu, place_order):
+    """A customer with three delivered orders and one pending order at the same restaurant"""
+    customer = make_user('customer')
+    restaurant = make_restaurant()
+    dish = seed_menu(restaurant)[0]
+    return {
+        'customer': customer,
+        'restaurant': restaurant,
+        'orders': [place_order(customer, restaurant, [dish]) for _ in range(3)],
+        'pending': place_order(customer, restaurant, [dish], status='pending')
+    }
+
+
+def rate(client, headers, order_id, rating):
+    return client.put(f'/api/orders/{order_id}/rating', headers=headers, json={'rating': rating})
+
+
+def aggregate(app, restaurant_id):
+    """Stored ``(rating, count, sum)`` next to the same figures computed from the orders"""
+    with app.app_context():
+        restaurant = db.session.get(Restaurant, restaurant_id)
+        count, total = db.session.query(db.func.count(Order.rating), db.func.sum(Order.rating)).filter(
+            Order.restaurant_id == restaurant_id
+        ).one()
+        return (restaurant.rating, restaurant.rating_count, restaurant.rating_sum), (round(total / count, 2), count, total)
+
+
+def test_aggregate_follows_ratings_and_re_ratings(app, client, delivered, login_headers):
+    headers = login_headers(delivered['customer'])
+    first, second, third = delivered['orders']
+
+    for order_id, rating in ((first, 5), (second, 4), (third, 4)):
+        assert rate(client, headers, order_id, rating).status_code == 200
+    stored, computed = aggregate(app, delivered['restaurant'])
+    assert stored == computed == (4.33, 3, 13)
+
+    # Rating the same order again replaces its rating instead of adding one
+    assert rate(client, headers, first, 1).status_code == 200
+    stored, computed = aggregate(app, delivered['restaurant'])
+    assert stored == computed == (3.0, 3, 9)
+
+
+def test_aggregate_is_one_update(app, client, delivered, login_headers):
+    headers = login_headers(delivered['customer'])
+    with app.app_context():
+        engine = db.engine
+    updates = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('UPDATE RESTAURANT'):
+            updates.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        assert rate(client, headers, delivered['orders'][0], 5).status_code == 200
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+    assert len(updates) == 1
+
+
+def test_only_delivered_orders_can_be_rated(app, client, delivered, login_headers):
+    response = rate(client, login_headers(delivered['customer']), delivered['pending'], 5)
+
+    assert response.status_code == 400
+    with app.app_context():
+        assert db.session.get(Restaurant, delivered['restaurant']).rating_count == 0
+
+
+def test_only_the_customer_can_rate(app, client, delivered, make_user, login_headers):
+    response = rate(client, login_headers(make_user('customer')), delivered['orders'][0], 5)
+
+    assert response.status_code == 403
+    with app.app_context():
+        assert db.session.get(Order, delivered['orders'][0]).rating is None
+        assert db.session.get(Restaurant, delivered['restaurant']).rating_count == 0
+
+
+@pytest.mark.parametrize('rating', [0, 6, 4.5, True, '5', None])
+def test_rating_must_be_one_to_five(client, delivered, login_headers, rating):
+    assert rate(client, login_headers(delivered['customer']), delivered['orders'][0], rating).status_code == 400
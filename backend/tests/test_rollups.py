@@ -0,0 +1,112 @@
+"""
+Sales rollups: the upserted per-day rows add up to the same figures as an
+aggregate over the orders, through creation, cancellation and backfill.
+"""
+
+import pytest
+
+from models import db, Order, OrderItem, DailySales, DailyItemSales
+from rollups import EXCLUDED_STATUSES, backfill_rollups
+
+
+@pytest.fixture
+def shop(make_user, make_restaurant, seed_menu):
+    seller = make_user('seller')
+    restaurant = make_restaurant(seller, delivery_fee=2.5)
+    return {'seller': seller, 'customer': make_user('customer'), 'restaurant': restaurant,
+            'dishes': seed_menu(restaurant, 3)}
+
+
+def order(client, headers, shop, *quantities):
+    """Place an order through the API, ``quantities[i]`` of dish ``i``; returns its id"""
+    items = [{'menu_item_id': dish, 'quantity': quantity} for dish, quantity in zip(shop['dishes'], quantities) if quantity]
+    response = client.post('/api/orders/', headers=headers, json={'restaurant_id': shop['restaurant'], 'items': items})
+    assert response.status_code == 201
+    return response.get_json()['order']['id']
+
+
+def rollup_rows(app, restaurant_id):
+    """``(daily sales, daily item sales)`` rows as sets, without the empty ones a reversal leaves"""
+    with app.app_context():
+        sales = {(str(day), round(revenue, 2), count) for day, revenue, count in db.session.query(
+            DailySales.day, DailySales.revenue, DailySales.order_count
+        ).filter(DailySales.restaurant_id == restaurant_id) if count}
+        items = {(str(day), dish, quantity, lines) for day, dish, quantity, lines in db.session.query(
+            DailyItemSales.day, DailyItemSales.menu_item_id, DailyItemSales.quantity, DailyItemSales.line_count
+        ).filter(DailyItemSales.restaurant_id == restaurant_id) if lines}
+        return sales, items
+
+
+def order_aggregates(app, restaurant_id):
+    """The same rows computed straight from ``order`` and ``order_item``"""
+    with app.app_context():
+        counted = (Order.restaurant_id == restaurant_id, Order.status.notin_(EXCLUDED_STATUSES))
+        day = db.func.date(Order.created_at)
+        sales = {(str(value_day), round(revenue, 2), count) for value_day, revenue, count in db.session.query(
+            day, db.func.sum(Order.total_amount), db.func.count(Order.id)
+        ).filter(*counted).group_by(day)}
+        items = {(str(value_day), dish, quantity, lines) for value_day, dish, quantity, lines in db.session.query(
+            day, OrderItem.menu_item_id, db.func.sum(OrderItem.quantity), db.func.count(OrderItem.id)
+        ).join(OrderItem, OrderItem.order_id == Order.id).filter(*counted).group_by(day, OrderItem.menu_item_id)}
+        return sales, items
+
+
+def test_upserts_add_up_across_orders(app, client, shop, login_headers):
+    headers = login_headers(shop['customer'])
+    order(client, headers, shop, 1, 2)
+    order(client, headers, shop, 3, 0, 1)
+    order(client, headers, shop, 0, 1, 1)
+
+    sales, items = rollup_rows(app, shop['restaurant'])
+    assert (sales, items) == order_aggregates(app, shop['restaurant'])
+    assert {count for _, _, count in sales} == {3}
+    assert sorted((dish, quantity, lines) for _, dish, quantity, lines in items) == [
+        (shop['dishes'][0], 4, 2), (shop['dishes'][1], 3, 2), (shop['dishes'][2], 2, 2)
+    ]
+
+
+def test_cancelling_reverses_and_reopening_restores(app, client, shop, login_headers):
+    customer = login_headers(shop['customer'])
+    seller = login_headers(shop['seller'])
+    order(client, customer, shop, 1, 1)
+    cancelled = order(client, customer, shop, 2, 0, 3)
+
+    assert client.put(f'/api/orders/{cancelled}/status', headers=seller, json={'status': 'cancelled'}).status_code == 200
+    assert rollup_rows(app, shop['restaurant']) == order_aggregates(app, shop['restaurant'])
+    with app.app_context():
+        assert db.session.query(db.func.sum(DailySales.order_count)).scalar() == 1
+
+    assert client.put(f'/api/orders/{cancelled}/status', headers=seller, json={'status': 'preparing'}).status_code == 200
+    assert rollup_rows(app, shop['restaurant']) == order_aggregates(app, shop['restaurant'])
+
+
+def test_backfill_rebuilds_the_same_rows(app, client, shop, login_headers):
+    headers = login_headers(shop['customer'])
+    order(client, headers, shop, 1, 2, 3)
+    order(client, headers, shop, 2)
+    incremental = rollup_rows(app, shop['restaurant'])
+
+    with app.app_context():
+        backfill_rollups([shop['restaurant']])
+    assert rollup_rows(app, shop['restaurant']) == incremental
+
+
+def test_sales_endpoint_matches_the_orders(app, client, shop, login_headers):
+    customer = login_headers(shop['customer'])
+    seller = login_headers(shop['seller'])
+    order(client, customer, shop, 1, 2)
+    order(client, customer, shop, 1)
+    cancelled = order(client, customer, shop, 0, 0, 5)
+    client.put(f'/api/orders/{cancelled}/status', headers=seller, json={'status': 'cancelled'})
+
+    response = client.get('/api/analytics/sales', headers=seller)
+    assert response.status_code == 200
+    sales = response.get_json()
+    with app.app_context():
+        revenue, count = db.session.query(db.func.sum(Order.total_amount), db.func.count(Order.id)).filter(
+            Order.restaurant_id == shop['restaurant'], Order.status.notin_(EXCLUDED_STATUSES)
+        ).one()
+    assert (sales['total_revenue'], sales['total_orders']) == (round(revenue, 2), count)
+    assert [(item['id'], item['order_count']) for item in sales['popular_items']] == [
+        (shop['dishes'][0], 2), (shop['dishes'][1], 1)
+    ]
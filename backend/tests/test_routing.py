@@ -0,0 +1,71 @@
+"""
+Read/write routing: read-only views use the replica bind, cache builds and
+writes use the primary, and a client that just wrote stays on the primary.
+
+The replica is a second SQLite file holding different rows, so every
+response shows which database answered it.
+"""
+
+import pytest
+from sqlalchemy import insert
+
+from app import create_app
+from cache import MemoryCache, PayloadCache
+from config import Config
+from models import db, User, Restaurant
+from routing import REPLICA_BIND, STICKY_COOKIE, mark_write
+
+
+@pytest.fixture
+def replica_app(app, tmp_path, monkeypatch):
+    """An app on the test database with a ``replica`` bind holding one restaurant of its own"""
+    monkeypatch.setattr(Config, 'SQLALCHEMY_BINDS', {REPLICA_BIND: f"sqlite:///{tmp_path / 'replica.db'}"})
+    replica_app = create_app()
+    replica_app.config.update(TESTING=True)
+    with replica_app.app_context():
+        replica = db.engines[REPLICA_BIND]
+        db.metadata.create_all(replica)
+        with replica.begin() as connection:
+            connection.execute(insert(User).values(id=1, email='replica@example.com', name='Replica', password_hash='x', role='seller'))
+            connection.execute(insert(Restaurant).values(owner_id=1, name='Replica Kitchen'))
+    return replica_app
+
+
+@pytest.fixture
+def primary_restaurant(make_restaurant):
+    return make_restaurant(name='Primary Kitchen')
+
+
+def restaurant_names(response):
+    assert response.status_code == 200
+    return [restaurant['name'] for restaurant in response.get_json()['items']]
+
+
+def test_read_only_views_use_the_replica(replica_app, primary_restaurant):
+    assert restaurant_names(replica_app.test_client().get('/api/restaurants/')) == ['Replica Kitchen']
+
+
+def test_cache_misses_build_from_the_primary(replica_app, primary_restaurant):
+    replica_app.extensions['payload_cache'] = PayloadCache(MemoryCache(1024 * 1024))
+    assert restaurant_names(replica_app.test_client().get('/api/restaurants/')) == ['Primary Kitchen']
+
+
+def test_a_write_keeps_the_client_on_the_primary(replica_app, primary_restaurant):
+    client = replica_app.test_client()
+    response = client.post('/api/auth/register', json={
+        'email': 'new@example.com', 'password': 'secret123', 'name': 'New', 'role': 'customer'
+    })
+    assert response.status_code == 201
+    assert client.get_cookie(STICKY_COOKIE) is not None
+    assert restaurant_names(client.get('/api/restaurants/')) == ['Primary Kitchen']
+
+    # Other clients, and failed writes, are not pinned
+    other = replica_app.test_client()
+    assert other.post('/api/auth/register', json={}).status_code == 400
+    assert other.get_cookie(STICKY_COOKIE) is None
+    assert restaurant_names(other.get('/api/restaurants/')) == ['Replica Kitchen']
+
+
+def test_sticky_hook_needs_a_replica(app, replica_app):
+    assert mark_write not in app.after_request_funcs.get(None, [])
+    assert mark_write in replica_app.after_request_funcs[None]
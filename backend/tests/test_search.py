@@ -0,0 +1,54 @@
+"""
+Search returns every matching restaurant that passes the filters, however
+many other restaurants match the words.
+"""
+
+import pytest
+
+from dietary import rebuild_dietary_index
+from search import rebuild_search_index
+
+
+@pytest.fixture(params=['terms', 'fts5'])
+def search_app(app, request):
+    app.config['SEARCH_BACKEND'] = request.param
+    app.extensions.pop('search_index', None)
+    yield app
+    app.config['SEARCH_BACKEND'] = 'terms'
+    app.extensions.pop('search_index', None)
+
+
+@pytest.fixture
+def add_restaurants(make_user, make_restaurant, seed_menu):
+    """``add_restaurants(count, cuisine, active=True, dish_tags=())``: ids of restaurants with one pizza slice each"""
+    owner = make_user('seller')
+
+    def add(count, cuisine, active=True, dish_tags=()):
+        restaurants = [make_restaurant(owner, name=f'Pizza {cuisine} {index}', cuisine=cuisine, active=active)
+                       for index in range(count)]
+        for restaurant in restaurants:
+            seed_menu(restaurant, name='Pizza slice', price=3, dietary_tags=list(dish_tags))
+        return restaurants
+
+    return add
+
+
+def search(client, query_string):
+    response = client.get(f'/api/restaurants/search?{query_string}')
+    assert response.status_code == 200
+    return {restaurant['id'] for restaurant in response.get_json()}
+
+
+def test_filters_apply_to_every_match(search_app, client, add_restaurants):
+    # More matches, ranked higher, than a fixed top-N would keep
+    add_restaurants(150, 'Italian')
+    add_restaurants(150, 'Thai', active=False)
+    thai = add_restaurants(5, 'Thai')
+    vegan = add_restaurants(3, 'Mexican', dish_tags=['vegan'])
+    with search_app.app_context():
+        rebuild_dietary_index()
+        rebuild_search_index()
+
+    assert search(client, 'q=pizza&category=thai') == set(thai)
+    assert search(client, 'q=pizza&dietary=vegan') == set(vegan)
+    assert len(search(client, 'q=pizza')) == 158
@@ -0,0 +1,44 @@
+"""
+Per-worker setup after a preforking server forks
+
+With the app preloaded in the master, every worker starts with copies of
+the master's connection pools and in-process caches. ``warm_worker``
+drops the inherited connections (sharing a socket between processes
+corrupts it), gives the worker its own order number id, opens a
+connection per database and fills the catalog cache, so the first real
+requests don't pay for any of it.
+"""
+
+import os
+import tempfile
+from models import db
+from order_numbers import claim_worker_id, init_order_numbers
+
+
+def warm_worker(app):
+    with app.app_context():
+        # Forget the master's connections without closing them under it
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+
+        worker_id = claim_worker_id(
+            app.config.get('ORDER_WORKER_LOCK_DIR') or os.path.join(tempfile.gettempdir(), 'savory-sync-workers'),
+            app.config.get('ORDER_WORKER_ID_BASE', 0),
+            app.config.get('ORDER_WORKER_ID_SLOTS', 64)
+        )
+        init_order_numbers(app, worker_id)
+
+        try:
+            for engine in db.engines.values():
+                with engine.connect() as connection:
+                    connection.exec_driver_sql('SELECT 1')
+        except Exception:
+            app.logger.exception('Could not open a database connection during warm-up')
+
+    client = app.test_client()
+    for path in app.config.get('WARMUP_PATHS', []):
+        response = client.get(path)
+        if response.status_code >= 400:
+            app.logger.warning('Warm-up request %s returned %s', path, response.status_code)
+
+    app.logger.info('Worker %s warm (order worker id %s)', os.getpid(), worker_id)